@@ -17,8 +17,10 @@ from OpenOversight.app.email_client import EmailClient
 from OpenOversight.app.filters import instantiate_filters
 from OpenOversight.app.models.config import config
 from OpenOversight.app.models.database import db
+from OpenOversight.app.models.database_cache import DB_CACHE
 from OpenOversight.app.models.users import AnonymousUser
 from OpenOversight.app.utils.constants import MEGABYTE
+from OpenOversight.app.utils.storage import init_image_storage
 
 
 bootstrap = Bootstrap5()
@@ -45,6 +47,8 @@ def create_app(config_name="default"):
     bootstrap.init_app(app)
     csrf.init_app(app)
     db.init_app(app)
+    DB_CACHE.init_app(app)
+    init_image_storage(app)
     with app.app_context():
         EmailClient()
     limiter.init_app(app)
@@ -60,6 +64,10 @@ def create_app(config_name="default"):
 
     app.register_blueprint(auth_blueprint, url_prefix="/auth")
 
+    from OpenOversight.app.api import api as api_blueprint
+
+    app.register_blueprint(api_blueprint, url_prefix="/api/v1")
+
     max_log_size = 10 * MEGABYTE  # start new log file after 10 MB
     num_logs_to_keep = 5
     file_handler = RotatingFileHandler(
@@ -127,10 +135,18 @@ def create_app(config_name="default"):
         add_department,
         add_job_title,
         advanced_csv_import,
+        backfill_image_variants_command,
         bulk_add_officers,
+        failed_face_crops,
+        find_duplicate_images,
+        ingest_uploads,
         link_images_to_department,
         link_officers_to_department,
         make_admin_user,
+        reconcile_leaderboard,
+        refresh_department_statistics_command,
+        refresh_sitemaps,
+        send_emails,
         use_original_image_for_faces,
     )
 
@@ -142,6 +158,14 @@ def create_app(config_name="default"):
     app.cli.add_command(add_job_title)
     app.cli.add_command(advanced_csv_import)
     app.cli.add_command(use_original_image_for_faces)
+    app.cli.add_command(refresh_sitemaps)
+    app.cli.add_command(refresh_department_statistics_command)
+    app.cli.add_command(reconcile_leaderboard)
+    app.cli.add_command(ingest_uploads)
+    app.cli.add_command(failed_face_crops)
+    app.cli.add_command(backfill_image_variants_command)
+    app.cli.add_command(find_duplicate_images)
+    app.cli.add_command(send_emails)
 
     @limiter.request_filter
     def _endpoint_whitelist():
@@ -0,0 +1,6 @@
+from flask import Blueprint
+
+
+api = Blueprint("api", __name__)
+
+from . import views  # noqa: F401, E402
@@ -0,0 +1,176 @@
+"""Department records served by the data API, and the columns each one exposes.
+
+Each field maps to one SQL expression, so only the columns of the requested fields
+are read, and tables are only joined when a requested field needs them.
+"""
+
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy.orm import Query, aliased
+from sqlalchemy.sql.elements import ColumnElement
+
+from OpenOversight.app.models.database import (
+    Assignment,
+    CurrentAssignment,
+    Incident,
+    Job,
+    Officer,
+    Salary,
+    Unit,
+    db,
+)
+from OpenOversight.app.utils.pagination import SortKey
+
+
+# Table joined to a resource, and the condition it is joined on
+Join = Tuple[Any, ColumnElement]
+
+
+class ApiField(NamedTuple):
+    column: Any
+    joins: Tuple[Join, ...] = ()
+
+
+class ApiResource(NamedTuple):
+    model: Any
+    fields: Dict[str, ApiField]
+    department_id: Any
+    # Joins needed to filter by department
+    joins: Tuple[Join, ...] = ()
+
+    @property
+    def sort_keys(self) -> List[SortKey]:
+        return [SortKey(self.model.id)]
+
+    def query(
+        self,
+        department_id: int,
+        field_names: Sequence[str],
+        since: Optional[datetime] = None,
+    ) -> Query:
+        """Select the given fields, and the id, of the department's records last
+        updated at or after `since`.
+        """
+        names = ["id", *(name for name in field_names if name != "id")]
+        query = db.session.query(
+            *(self.fields[name].column.label(name) for name in names)
+        ).select_from(self.model)
+        for target, onclause in self.joins:
+            query = query.join(target, onclause)
+        joined = set()
+        for name in names:
+            for target, onclause in self.fields[name].joins:
+                if target not in joined:
+                    joined.add(target)
+                    query = query.outerjoin(target, onclause)
+        query = query.filter(self.department_id == department_id)
+        if since is not None:
+            query = query.filter(self.model.last_updated_at >= since)
+        return query.order_by(self.model.id)
+
+
+def serialize_row(row) -> Dict[str, Any]:
+    record = row._asdict()
+    for name, value in record.items():
+        if isinstance(value, (date, datetime, time)):
+            record[name] = value.isoformat()
+        elif isinstance(value, Decimal):
+            record[name] = str(value)
+    return record
+
+
+def _tracked_fields(model) -> Dict[str, ApiField]:
+    return {
+        "created_at": ApiField(model.created_at),
+        "last_updated_at": ApiField(model.last_updated_at),
+    }
+
+
+current_assignment = aliased(Assignment, name="current_assignment")
+current_job = aliased(Job, name="current_job")
+CURRENT_ASSIGNMENT_JOINS: Tuple[Join, ...] = (
+    (CurrentAssignment, CurrentAssignment.officer_id == Officer.id),
+    (current_assignment, current_assignment.id == CurrentAssignment.assignment_id),
+)
+ASSIGNMENT_OFFICER_JOIN: Join = (Officer, Officer.id == Assignment.officer_id)
+SALARY_OFFICER_JOIN: Join = (Officer, Officer.id == Salary.officer_id)
+
+
+API_RESOURCES: Dict[str, ApiResource] = {
+    "officers": ApiResource(
+        Officer,
+        {
+            "id": ApiField(Officer.id),
+            "unique_internal_identifier": ApiField(Officer.unique_internal_identifier),
+            "last_name": ApiField(Officer.last_name),
+            "first_name": ApiField(Officer.first_name),
+            "middle_initial": ApiField(Officer.middle_initial),
+            "suffix": ApiField(Officer.suffix),
+            "gender": ApiField(Officer.gender),
+            "race": ApiField(Officer.race),
+            "birth_year": ApiField(Officer.birth_year),
+            "employment_date": ApiField(Officer.employment_date),
+            "badge_number": ApiField(
+                current_assignment.star_no, CURRENT_ASSIGNMENT_JOINS
+            ),
+            "job_title": ApiField(
+                current_job.job_title,
+                CURRENT_ASSIGNMENT_JOINS
+                + ((current_job, current_job.id == current_assignment.job_id),),
+            ),
+            **_tracked_fields(Officer),
+        },
+        Officer.department_id,
+    ),
+    "assignments": ApiResource(
+        Assignment,
+        {
+            "id": ApiField(Assignment.id),
+            "officer_id": ApiField(Assignment.officer_id),
+            "officer_unique_internal_identifier": ApiField(
+                Officer.unique_internal_identifier
+            ),
+            "badge_number": ApiField(Assignment.star_no),
+            "job_id": ApiField(Assignment.job_id),
+            "job_title": ApiField(Job.job_title, ((Job, Job.id == Assignment.job_id),)),
+            "unit_id": ApiField(Assignment.unit_id),
+            "unit_description": ApiField(
+                Unit.description, ((Unit, Unit.id == Assignment.unit_id),)
+            ),
+            "start_date": ApiField(Assignment.start_date),
+            "end_date": ApiField(Assignment.resign_date),
+            **_tracked_fields(Assignment),
+        },
+        Officer.department_id,
+        (ASSIGNMENT_OFFICER_JOIN,),
+    ),
+    "incidents": ApiResource(
+        Incident,
+        {
+            "id": ApiField(Incident.id),
+            "report_number": ApiField(Incident.report_number),
+            "date": ApiField(Incident.date),
+            "time": ApiField(Incident.time),
+            "description": ApiField(Incident.description),
+            "address_id": ApiField(Incident.address_id),
+            **_tracked_fields(Incident),
+        },
+        Incident.department_id,
+    ),
+    "salaries": ApiResource(
+        Salary,
+        {
+            "id": ApiField(Salary.id),
+            "officer_id": ApiField(Salary.officer_id),
+            "salary": ApiField(Salary.salary),
+            "overtime_pay": ApiField(Salary.overtime_pay),
+            "year": ApiField(Salary.year),
+            "is_fiscal_year": ApiField(Salary.is_fiscal_year),
+            **_tracked_fields(Salary),
+        },
+        Officer.department_id,
+        (SALARY_OFFICER_JOIN,),
+    ),
+}
@@ -0,0 +1,135 @@
+import json
+from datetime import datetime, timezone
+from http import HTTPMethod, HTTPStatus
+from typing import Iterator, List
+
+from flask import Response, jsonify, request, stream_with_context
+
+from OpenOversight.app import limiter
+from OpenOversight.app.api import api
+from OpenOversight.app.api.resources import API_RESOURCES, serialize_row
+from OpenOversight.app.models.database import Department, db
+from OpenOversight.app.utils.conditional import conditional_page
+from OpenOversight.app.utils.constants import (
+    API_MAX_PAGE_SIZE,
+    API_PAGE_SIZE,
+    API_STREAM_BATCH_SIZE,
+    MIMETYPE_JSON,
+    MIMETYPE_NDJSON,
+)
+from OpenOversight.app.utils.pagination import decode_cursor, keyset_paginate
+
+
+class ApiError(Exception):
+    def __init__(self, message: str, status: HTTPStatus = HTTPStatus.BAD_REQUEST):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+@api.errorhandler(ApiError)
+def handle_api_error(error: ApiError):
+    return jsonify(error=error.message), error.status
+
+
+def _departments(department_id: int, **kwargs):
+    return [department_id]
+
+
+def _field_names(resource_name: str) -> List[str]:
+    fields = API_RESOURCES[resource_name].fields
+    requested = request.args.get("fields")
+    if not requested:
+        return list(fields)
+    names = [name.strip() for name in requested.split(",") if name.strip()]
+    unknown = [name for name in names if name not in fields]
+    if unknown:
+        raise ApiError(f"Unknown fields: {', '.join(unknown)}")
+    return names
+
+
+def _since():
+    since = request.args.get("since")
+    if not since:
+        return None
+    try:
+        since = datetime.fromisoformat(since)
+    except ValueError:
+        raise ApiError("since must be an ISO 8601 date or time") from None
+    if since.tzinfo is None:
+        return since.replace(tzinfo=timezone.utc)
+    return since.astimezone(timezone.utc)
+
+
+def _wants_ndjson() -> bool:
+    if request.args.get("format") == "ndjson":
+        return True
+    return (
+        request.accept_mimetypes.best_match([MIMETYPE_JSON, MIMETYPE_NDJSON])
+        == MIMETYPE_NDJSON
+    )
+
+
+def _mimetype(department_id: int, **kwargs) -> str:
+    return MIMETYPE_NDJSON if _wants_ndjson() else MIMETYPE_JSON
+
+
+def _stream_ndjson(query) -> Response:
+    def _generate() -> Iterator[bytes]:
+        lines = []
+        for row in query.yield_per(API_STREAM_BATCH_SIZE):
+            lines.append(json.dumps(serialize_row(row)))
+            if len(lines) == API_STREAM_BATCH_SIZE:
+                yield ("\n".join(lines) + "\n").encode()
+                lines = []
+        if lines:
+            yield ("\n".join(lines) + "\n").encode()
+
+    return Response(stream_with_context(_generate()), mimetype=MIMETYPE_NDJSON)
+
+
+@api.route(
+    f"/departments/<int:department_id>/<any({', '.join(API_RESOURCES)}):resource>",
+    methods=[HTTPMethod.GET],
+)
+@conditional_page(_departments, per_viewer=False, variant=_mimetype, vary=("Accept",))
+@limiter.limit("60/minute")
+def department_records(department_id: int, resource: str):
+    """List the department's officers, assignments, incidents or salaries.
+
+    Only the comma-separated `fields` are returned, and the id, and only records
+    last updated at or after `since` if given. Pages are JSON objects, and the
+    `next_cursor` of each is passed back as `cursor` to get the next one. Clients
+    accepting NDJSON get every record instead, one JSON object per line.
+    """
+    field_names = _field_names(resource)
+    since = _since()
+    if db.session.get(Department, department_id) is None:
+        raise ApiError("This department does not exist.", HTTPStatus.NOT_FOUND)
+
+    api_resource = API_RESOURCES[resource]
+    query = api_resource.query(department_id, field_names, since=since)
+    if _wants_ndjson():
+        return _stream_ndjson(query)
+
+    limit = request.args.get("limit", API_PAGE_SIZE, type=int)
+    if limit < 1:
+        raise ApiError("limit must be a positive number")
+    cursor = request.args.get("cursor")
+    if cursor:
+        try:
+            decode_cursor(api_resource.sort_keys, cursor)
+        except ValueError:
+            raise ApiError("Invalid cursor") from None
+
+    page = keyset_paginate(
+        query,
+        api_resource.sort_keys,
+        min(limit, API_MAX_PAGE_SIZE),
+        cursor=cursor,
+        count=False,
+    )
+    return jsonify(
+        data=[serialize_row(row) for row in page.items],
+        next_cursor=page.next_cursor,
+    )
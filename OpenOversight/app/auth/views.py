@@ -115,7 +115,7 @@ def register():
             approved=False if current_app.config["APPROVE_REGISTRATIONS"] else True,
         )
         db.session.add(user)
-        db.session.commit()
+        db.session.flush()
         if current_app.config["APPROVE_REGISTRATIONS"]:
             admins = User.query.filter_by(is_administrator=True).all()
             for admin in admins:
@@ -132,6 +132,7 @@ def register():
                 ConfirmAccountEmail(user.email, user=user, token=token)
             )
             flash("A confirmation email has been sent to you.")
+        db.session.commit()
         return redirect(url_for("auth.login"))
     else:
         current_app.logger.info(form.errors)
@@ -149,6 +150,7 @@ def confirm(token):
             EmailClient.send_email(
                 ConfirmedUserEmail(admin.email, user=current_user, admin=admin)
             )
+        db.session.commit()
         flash("You have confirmed your account. Thanks!")
     else:
         flash("The confirmation link is invalid or has expired.")
@@ -162,6 +164,7 @@ def resend_confirmation():
     EmailClient.send_email(
         ConfirmAccountEmail(current_user.email, user=current_user, token=token)
     )
+    db.session.commit()
     flash("A new confirmation email has been sent to you.")
     return redirect(url_for("main.index"))
 
@@ -172,13 +175,12 @@ def change_password():
     form = ChangePasswordForm()
     if form.validate_on_submit():
         if current_user.verify_password(form.old_password.data):
-            current_user.password = form.password.data
-            db.session.add(current_user)
+            user = db.session.get(User, current_user.id)
+            user.password = form.password.data
+            db.session.add(user)
+            EmailClient.send_email(ChangePasswordEmail(user.email, user=user))
             db.session.commit()
             flash("Your password has been updated. Please log in again.")
-            EmailClient.send_email(
-                ChangePasswordEmail(current_user.email, user=current_user)
-            )
             return redirect(url_for("main.index"))
         else:
             flash("Invalid password.")
@@ -199,6 +201,7 @@ def password_reset_request():
             EmailClient.send_email(
                 ResetPasswordEmail(user.email, user=user, token=token)
             )
+            db.session.commit()
         flash("An email with instructions to reset your password has been sent to you.")
         return redirect(url_for("auth.login"))
     else:
@@ -236,6 +239,7 @@ def change_email_request():
             EmailClient.send_email(
                 ChangeEmailAddressEmail(new_email, user=current_user, token=token)
             )
+            db.session.commit()
             flash(
                 "An email with instructions to confirm your new email "
                 "address has been sent to you."
@@ -265,11 +269,12 @@ def change_dept():
     set_dynamic_default(form.dept_pref, current_user.dept_pref_rel)
 
     if form.validate_on_submit():
+        user = db.session.get(User, current_user.id)
         try:
-            current_user.dept_pref = form.dept_pref.data.id
+            user.dept_pref = form.dept_pref.data.id
         except AttributeError:
-            current_user.dept_pref = None
-        db.session.add(current_user)
+            user.dept_pref = None
+        db.session.add(user)
         db.session.commit()
         flash("Updated!")
         return redirect(url_for("main.index"))
@@ -358,5 +363,6 @@ def admin_resend_confirmation(user):
     else:
         token = user.generate_confirmation_token()
         EmailClient.send_email(ConfirmAccountEmail(user.email, user=user, token=token))
+        db.session.commit()
         flash(f"A new confirmation email has been sent to {user.email}.")
     return redirect(url_for("auth.get_users"))
@@ -1,16 +1,20 @@
 import csv
+import multiprocessing
 import sys
+import time
 from builtins import input
+from collections import defaultdict
 from datetime import date, datetime
 from decimal import Decimal
 from getpass import getpass
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
 
 import click
 import us
 from dateutil.parser import parse
 from flask import current_app
 from flask.cli import with_appcontext
+from sqlalchemy.orm.exc import MultipleResultsFound
 
 from OpenOversight.app.csv_imports import import_csv_files
 from OpenOversight.app.models.database import (
@@ -24,10 +28,23 @@ from OpenOversight.app.models.database import (
     Unit,
     User,
     db,
+    reconcile_user_contributions,
+    refresh_current_assignments,
+    refresh_department_statistics,
+)
+from OpenOversight.app.utils.cloud import backfill_image_hashes, backfill_image_variants
+from OpenOversight.app.utils.constants import (
+    BULK_ADD_PROGRESS_INTERVAL,
+    EMAIL_BATCH_SIZE,
+    ENCODING_UTF_8,
+    FACE_CROP_FAILED,
+    PHASH_MAX_DISTANCE,
 )
-from OpenOversight.app.utils.constants import ENCODING_UTF_8
-from OpenOversight.app.utils.db import get_officer
 from OpenOversight.app.utils.general import normalize_gender, prompt_yes_no, str_is_true
+from OpenOversight.app.utils.image_hash import near_duplicate_clusters
+from OpenOversight.app.utils.outbox import run_email_worker
+from OpenOversight.app.utils.sitemaps import refresh_sitemap_shards
+from OpenOversight.app.utils.uploads import retry_failed_faces, run_upload_worker
 
 
 @click.command()
@@ -183,6 +200,107 @@ class ImportLog:
         cls.created_officers = {}
 
 
+class OfficerLookup:
+    """Finds the existing officer for each row of a roster in memory.
+
+    The officers of a department are loaded in two queries the first time one
+    of its rows is seen, instead of querying for every row. Officers created or
+    updated by earlier rows are re-indexed with `refresh`.
+    """
+
+    def __init__(self):
+        self.loaded_departments = set()
+        self.by_unique_id: Dict[Tuple, List[Officer]] = defaultdict(list)
+        self.by_name: Dict[Tuple, List[Officer]] = defaultdict(list)
+        self.by_badge_and_name: Dict[Tuple, Officer] = {}
+        self._keys: Dict[int, List[Tuple[Dict, Tuple]]] = defaultdict(list)
+
+    def load_department(self, department_id: int) -> None:
+        if department_id in self.loaded_departments:
+            return
+        self.loaded_departments.add(department_id)
+
+        for officer in Officer.query.filter_by(department_id=department_id):
+            self._add(officer)
+        badges = (
+            db.session.query(Assignment.star_no, Officer)
+            .join(Officer, Assignment.base_officer)
+            .filter(
+                Officer.department_id == department_id, Assignment.star_no.isnot(None)
+            )
+            .order_by(Assignment.id)
+        )
+        for star_no, officer in badges:
+            self._add_badge(officer, star_no)
+
+    def _add(self, officer: Officer) -> None:
+        department_id = int(officer.department_id)
+        name = (department_id, officer.first_name, officer.last_name)
+        self.by_name[name].append(officer)
+        self._keys[officer.id].append((self.by_name, name))
+        if officer.unique_internal_identifier:
+            unique_id = (department_id, officer.unique_internal_identifier)
+            self.by_unique_id[unique_id].append(officer)
+            self._keys[officer.id].append((self.by_unique_id, unique_id))
+
+    def _add_badge(self, officer: Officer, star_no: str) -> None:
+        key = (
+            int(officer.department_id),
+            str(star_no),
+            officer.first_name,
+            officer.last_name,
+        )
+        if key not in self.by_badge_and_name:
+            self.by_badge_and_name[key] = officer
+            self._keys[officer.id].append((self.by_badge_and_name, key))
+
+    def refresh(self, officer: Officer, star_no: Optional[str] = None) -> None:
+        """Re-index an officer after a row created or updated it, possibly
+        changing their name or identifier or adding the badge `star_no`.
+        """
+        star_nos = [star_no] if star_no else []
+        for index, key in self._keys.pop(officer.id, []):
+            if index is self.by_badge_and_name:
+                star_nos.append(key[1])
+                if index.get(key) is officer:
+                    del index[key]
+            else:
+                index[key].remove(officer)
+        self._add(officer)
+        for star_no in star_nos:
+            self._add_badge(officer, star_no)
+
+    @staticmethod
+    def _one_or_none(officers: List[Officer]) -> Optional[Officer]:
+        if len(officers) > 1:
+            raise MultipleResultsFound(
+                "Multiple rows were found when one or none was required"
+            )
+        return officers[0] if officers else None
+
+    def by_unique_internal_identifier(
+        self, department_id: int, unique_internal_identifier: str
+    ) -> Optional[Officer]:
+        return self._one_or_none(
+            self.by_unique_id.get((department_id, unique_internal_identifier), [])
+        )
+
+    def by_first_and_last_name(
+        self, department_id: int, first_name: str, last_name: str
+    ) -> Optional[Officer]:
+        return self._one_or_none(
+            self.by_name.get((department_id, first_name, last_name), [])
+        )
+
+    def by_badge(
+        self, department_id: int, star_no: str, first_name: str, last_name: str
+    ) -> Optional[Officer]:
+        """Same as `utils.db.get_officer`."""
+        return self.by_badge_and_name.get(
+            (department_id, str(star_no), first_name, last_name)
+        )
+
+
 def row_has_data(row, required_fields, optional_fields):
     for field in required_fields:
         if field not in row or not row[field]:
@@ -302,6 +420,7 @@ def create_officer_from_row(row, department_id):
 
     process_assignment(row, officer, compare=False)
     process_salary(row, officer, compare=False)
+    return officer
 
 
 def is_equal(a, b):
@@ -534,7 +653,9 @@ def bulk_add_officers(
                 "officers"
             )
 
-        for row in csvfile:
+        lookup = OfficerLookup()
+        start_time = time.monotonic()
+        for row_count, row in enumerate(csvfile, start=1):
             department_id = row["department_id"]
             department = departments.get(department_id)
             if row["department_id"] not in departments:
@@ -543,6 +664,7 @@ def bulk_add_officers(
                     departments[department_id] = department
                 else:
                     raise Exception(f"Department ID {department_id} not found")
+            lookup.load_department(department.id)
 
             if not update_by_name:
                 # Check for existing officer based on unique ID or name/badge
@@ -550,13 +672,12 @@ def bulk_add_officers(
                     "unique_internal_identifier" in csvfile.fieldnames
                     and row["unique_internal_identifier"]
                 ):
-                    officer = Officer.query.filter_by(
-                        department_id=department_id,
-                        unique_internal_identifier=row["unique_internal_identifier"],
-                    ).one_or_none()
+                    officer = lookup.by_unique_internal_identifier(
+                        department.id, row["unique_internal_identifier"]
+                    )
                 elif "star_no" in csvfile.fieldnames and row["star_no"]:
-                    officer = get_officer(
-                        department_id,
+                    officer = lookup.by_badge(
+                        department.id,
                         row["star_no"],
                         row["first_name"],
                         row["last_name"],
@@ -567,16 +688,25 @@ def bulk_add_officers(
                         "missing badge number and unique identifier"
                     )
             else:
-                officer = Officer.query.filter_by(
-                    department_id=department_id,
-                    last_name=row["last_name"],
-                    first_name=row["first_name"],
-                ).one_or_none()
+                officer = lookup.by_first_and_last_name(
+                    department.id, row["first_name"], row["last_name"]
+                )
 
             if officer:
                 update_officer_from_row(row, officer, update_static_fields)
             elif not no_create:
-                create_officer_from_row(row, department_id)
+                officer = create_officer_from_row(row, department_id)
+            if officer:
+                lookup.refresh(officer, row.get("star_no"))
+
+            if row_count % BULK_ADD_PROGRESS_INTERVAL == 0:
+                elapsed = time.monotonic() - start_time
+                print(
+                    f"Processed {row_count} rows ({row_count / elapsed:.0f} rows/sec)"
+                )
+
+        for department_id in departments:
+            refresh_current_assignments(department_id=int(department_id))
 
         ImportLog.print_logs()
         if (
@@ -608,6 +738,11 @@ def bulk_add_officers(
 @click.option("--incidents-csv", type=click.Path(exists=True))
 @click.option("--force-create", is_flag=True, help="Only for development/testing!")
 @click.option("--overwrite-assignments", is_flag=True)
+@click.option(
+    "--bulk/--no-bulk",
+    default=None,
+    help="write officers, assignments and salaries in batches (default on PostgreSQL)",
+)
 @with_appcontext
 def advanced_csv_import(
     department_name,
@@ -619,6 +754,7 @@ def advanced_csv_import(
     incidents_csv,
     force_create,
     overwrite_assignments,
+    bulk,
 ):
     """
     Add or update officers, assignments, salaries, links and incidents from
@@ -643,6 +779,7 @@ def advanced_csv_import(
         incidents_csv,
         force_create,
         overwrite_assignments,
+        bulk,
     )
 
 
@@ -698,3 +835,156 @@ def use_original_image_for_faces():
     for face in faces:
         face.img_id = face.original_image_id
     db.session.commit()
+
+
+@click.command()
+@click.option(
+    "--base-url",
+    envvar="SITEMAP_BASE_URL",
+    required=True,
+    help="Public URL of the site, e.g. https://openoversight.com",
+)
+@with_appcontext
+def refresh_sitemaps(base_url):
+    """Rebuild the sitemap files of officers and incidents that changed."""
+    with current_app.test_request_context(base_url=base_url):
+        shards = refresh_sitemap_shards()
+    for shard in shards:
+        print(f"Rebuilt {shard.source} sitemap {shard.number} ({shard.url_count} URLs)")
+    print(f"Rebuilt {len(shards)} sitemap files")
+
+
+@click.command("refresh-department-statistics")
+@with_appcontext
+def refresh_department_statistics_command():
+    """Recompute the statistics of every department, e.g. after editing records
+    directly in the database.
+    """
+    refresh_department_statistics()
+    db.session.commit()
+    print("Refreshed department statistics")
+
+
+@click.command()
+@with_appcontext
+def reconcile_leaderboard():
+    """Recount the images and faces of every user and correct the leaderboard
+    counters that drifted.
+    """
+    corrected = reconcile_user_contributions()
+    db.session.commit()
+    print(f"Corrected the leaderboard counters of {corrected} users")
+
+
+@click.command("backfill-image-variants")
+@with_appcontext
+def backfill_image_variants_command():
+    """Create the downscaled variants of images uploaded before they existed."""
+    processed, failed = backfill_image_variants()
+    print(f"Created variants of {processed} images, {failed} failed")
+
+
+@click.command()
+@click.option(
+    "--max-distance",
+    type=click.IntRange(min=0, max=64),
+    default=PHASH_MAX_DISTANCE,
+    show_default=True,
+    help="Most bits the perceptual hashes of two near-duplicates differ by",
+)
+@with_appcontext
+def find_duplicate_images(max_distance):
+    """Hash images that have no perceptual hash and list near-duplicate images."""
+    hashed, failed = backfill_image_hashes()
+    print(f"Hashed {hashed} images, {failed} failed")
+    clusters = near_duplicate_clusters(max_distance)
+    for cluster in clusters:
+        print(f"Near-duplicate images: {', '.join(map(str, cluster))}")
+    print(f"Found {len(clusters)} groups of near-duplicate images")
+
+
+def _upload_worker_process(app, poll_interval, exit_when_empty):
+    with app.app_context():
+        run_upload_worker(poll_interval, exit_when_empty=exit_when_empty)
+
+
+@click.command()
+@click.option("--processes", type=click.IntRange(min=1), default=1, show_default=True)
+@click.option(
+    "--poll-interval",
+    type=float,
+    default=1.0,
+    show_default=True,
+    help="Seconds to wait between checks for new uploads",
+)
+@click.option(
+    "--exit-when-empty", is_flag=True, help="Stop once there are no pending uploads"
+)
+@with_appcontext
+def ingest_uploads(processes, poll_interval, exit_when_empty):
+    """Process uploaded images and face crops in a pool of worker processes."""
+    if processes == 1:
+        processed = run_upload_worker(poll_interval, exit_when_empty=exit_when_empty)
+        print(f"Processed {processed} uploads and face crops")
+        return
+
+    app = current_app._get_current_object()
+    # Each worker opens its own database connections
+    db.engine.dispose()
+    context = multiprocessing.get_context("fork")
+    workers = [
+        context.Process(
+            target=_upload_worker_process,
+            args=(app, poll_interval, exit_when_empty),
+        )
+        for _ in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+
+@click.command()
+@click.option("--retry", is_flag=True, help="Queue the failed crops to be tried again")
+@with_appcontext
+def failed_face_crops(retry):
+    """List the faces that could not be cropped, which show the whole photo."""
+    faces = (
+        Face.query.filter(Face.crop_status == FACE_CROP_FAILED).order_by(Face.id).all()
+    )
+    for face in faces:
+        print(
+            f"Face {face.id} of officer {face.officer_id} "
+            f"in image {face.original_image_id}"
+        )
+    print(f"Found {len(faces)} failed face crops")
+    if retry:
+        print(f"Queued {retry_failed_faces()} face crops to be tried again")
+
+
+@click.command()
+@click.option(
+    "--poll-interval",
+    type=float,
+    default=5.0,
+    show_default=True,
+    help="Seconds to wait between checks for queued emails",
+)
+@click.option(
+    "--batch-size",
+    type=click.IntRange(min=1),
+    default=EMAIL_BATCH_SIZE,
+    show_default=True,
+    help="Emails to send over one connection",
+)
+@click.option(
+    "--exit-when-empty", is_flag=True, help="Stop once no queued emails are due"
+)
+@with_appcontext
+def send_emails(poll_interval, batch_size, exit_when_empty):
+    """Send the emails queued by the web server, retrying failed ones."""
+    sent = run_email_worker(
+        poll_interval, batch_size=batch_size, exit_when_empty=exit_when_empty
+    )
+    print(f"Sent {sent} emails")
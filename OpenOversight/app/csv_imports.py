@@ -1,9 +1,10 @@
 import csv
 from contextlib import contextmanager
-from typing import Dict, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
-from sqlalchemy import sql
+from sqlalchemy import insert, sql, update
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm.attributes import set_committed_value
 
 from OpenOversight.app.models.database import (
     Assignment,
@@ -14,9 +15,15 @@ from OpenOversight.app.models.database import (
     Officer,
     Salary,
     Unit,
+    User,
     db,
+    refresh_current_assignments,
+    refresh_department_statistics,
 )
 from OpenOversight.app.models.database_imports import (
+    ASSIGNMENT_FIELD_PARSERS,
+    OFFICER_FIELD_PARSERS,
+    SALARY_FIELD_PARSERS,
     create_assignment_from_dict,
     create_incident_from_dict,
     create_link_from_dict,
@@ -29,9 +36,33 @@ from OpenOversight.app.models.database_imports import (
     update_link_from_dict,
     update_officer_from_dict,
     update_salary_from_dict,
+    values_from_dict,
 )
 
 
+OFFICER_OPTIONAL_FIELDS = [
+    "last_name",
+    "first_name",
+    "middle_initial",
+    "suffix",
+    "race",
+    "gender",
+    "employment_date",
+    "birth_year",
+    "unique_internal_identifier",
+    "department_name",
+    "department_state",
+    # the following are unused, but allowed since they are included in the
+    # csv output
+    "badge_number",
+    "unique_identifier",
+    "job_title",
+    "most_recent_salary",
+    "last_employment_date",
+    "last_employment_notice",
+]
+
+
 def _create_or_update_model(
     row,
     existing_model_lookup,
@@ -95,36 +126,20 @@ def _handle_officers_csv(
     department_id: int,
     id_to_officer,
     force_create,
+    bulk=False,
 ) -> Dict[str, Officer]:
     new_officers = {}
     counter = 0
+    writer = (
+        _BulkWriter(Officer, OFFICER_FIELD_PARSERS, returning=True) if bulk else None
+    )
     with _csv_reader(officers_csv) as csv_reader:
         _check_provided_fields(
             csv_reader,
             required_fields=["id", "department_name", "department_state"]
             if not force_create
             else ["id"],
-            optional_fields=[
-                "last_name",
-                "first_name",
-                "middle_initial",
-                "suffix",
-                "race",
-                "gender",
-                "employment_date",
-                "birth_year",
-                "unique_internal_identifier",
-                "department_name",
-                "department_state",
-                # the following are unused, but allowed since they are included in the
-                # csv output
-                "badge_number",
-                "unique_identifier",
-                "job_title",
-                "most_recent_salary",
-                "last_employment_date",
-                "last_employment_notice",
-            ],
+            optional_fields=OFFICER_OPTIONAL_FIELDS,
             csv_name="officers",
         )
 
@@ -137,31 +152,112 @@ def _handle_officers_csv(
             connection_id = row["id"]
             if row["id"].startswith("#"):
                 row["id"] = ""
-            officer = _create_or_update_model(
-                row=row,
-                existing_model_lookup=id_to_officer,
-                create_method=create_officer_from_dict,
-                update_method=update_officer_from_dict,
-                force_create=force_create,
-                model=Officer,
-            )
-            if connection_id is not None:
+            if writer:
+                officer = writer.add(row, id_to_officer, key=connection_id)
+            else:
+                officer = _create_or_update_model(
+                    row=row,
+                    existing_model_lookup=id_to_officer,
+                    create_method=create_officer_from_dict,
+                    update_method=update_officer_from_dict,
+                    force_create=force_create,
+                    model=Officer,
+                )
+            if connection_id is not None and officer is not None:
                 new_officers[connection_id] = officer
             counter += 1
             if counter % 1000 == 0:
                 print(f"Processed {counter} officers.")
+    if writer:
+        new_officers.update(writer.write())
     print(f"Done with officers. Processed {counter} rows.")
     return new_officers
 
 
+def _bulk_insert(model, rows: List[Dict[str, Any]], returning: bool = False):
+    """Insert rows in multi-row INSERT batches, returning the new objects in
+    the same order if asked to.
+    """
+    if not rows:
+        return []
+    if returning:
+        return db.session.scalars(
+            insert(model).returning(model, sort_by_parameter_order=True), rows
+        ).all()
+    db.session.execute(insert(model), rows)
+    return []
+
+
+def _bulk_update(model, updates: List[Tuple[Any, Dict[str, Any]]]) -> None:
+    """Update existing objects with batched UPDATE statements by primary key,
+    then apply the same values to the already loaded objects.
+    """
+    if not updates:
+        return
+    db.session.execute(
+        update(model), [{"id": obj.id, **values} for obj, values in updates]
+    )
+    for obj, values in updates:
+        for key, value in values.items():
+            set_committed_value(obj, key, value)
+
+
+class _BulkWriter:
+    """Collects the rows of a csv to write them in batches at the end, instead
+    of creating or updating one object at a time like `_create_or_update_model`.
+    """
+
+    def __init__(self, model, field_parsers, returning: bool = False):
+        self.model = model
+        self.field_parsers = field_parsers
+        self.returning = returning
+        self.admin_id = User.query.filter_by(is_administrator=True).first().id
+        self.new_rows: List[Dict[str, Any]] = []
+        self.new_keys: List[Any] = []
+        self.updates: List[Tuple[Any, Dict[str, Any]]] = []
+
+    def add(self, row, existing_model_lookup, always_create=False, key=None):
+        """Queue the row, returning the existing object it updates if any."""
+        if always_create or not row["id"]:
+            self.new_rows.append(
+                {
+                    **values_from_dict(row, self.field_parsers),
+                    "created_by": self.admin_id,
+                    "last_updated_by": self.admin_id,
+                }
+            )
+            self.new_keys.append(key)
+            return None
+
+        existing = existing_model_lookup[int(row["id"])]
+        values = values_from_dict(row, self.field_parsers, only_given=True)
+        values["last_updated_by"] = self.admin_id
+        self.updates.append((existing, values))
+        return existing
+
+    def write(self) -> Dict[Any, Any]:
+        """Write the queued rows, returning the created objects by key if
+        `returning` is set.
+        """
+        _bulk_update(self.model, self.updates)
+        created = _bulk_insert(self.model, self.new_rows, returning=self.returning)
+        print(
+            f"Created {len(self.new_rows)} and updated {len(self.updates)} "
+            f"{self.model.__tablename__}."
+        )
+        return dict(zip(self.new_keys, created))
+
+
 def _handle_assignments_csv(
     assignments_csv: str,
     department_id: int,
     all_officers: Dict[str, Officer],
     force_create: bool,
     overwrite_assignments: bool,
+    bulk: bool = False,
 ) -> None:
     counter = 0
+    writer = _BulkWriter(Assignment, ASSIGNMENT_FIELD_PARSERS) if bulk else None
     with _csv_reader(assignments_csv) as csv_reader:
         field_names = csv_reader.fieldnames
         if "start_date" in field_names:
@@ -287,18 +383,23 @@ def _handle_assignments_csv(
 
             row["job_id"] = job_id
             row["officer_id"] = officer.id
-            _create_or_update_model(
-                row=row,
-                existing_model_lookup=id_to_assignment,
-                create_method=create_assignment_from_dict,
-                update_method=update_assignment_from_dict,
-                force_create=force_create,
-                model=Assignment,
-                always_create=overwrite_assignments,
-            )
+            if writer:
+                writer.add(row, id_to_assignment, always_create=overwrite_assignments)
+            else:
+                _create_or_update_model(
+                    row=row,
+                    existing_model_lookup=id_to_assignment,
+                    create_method=create_assignment_from_dict,
+                    update_method=update_assignment_from_dict,
+                    force_create=force_create,
+                    model=Assignment,
+                    always_create=overwrite_assignments,
+                )
             counter += 1
             if counter % 1000 == 0:
                 print(f"Processed {counter} assignments.")
+    if writer:
+        writer.write()
     print(f"Done with assignments. Processed {counter} rows.")
 
 
@@ -307,8 +408,10 @@ def _handle_salaries(
     department_id: int,
     all_officers: Dict[str, Officer],
     force_create: bool,
+    bulk: bool = False,
 ) -> None:
     counter = 0
+    writer = _BulkWriter(Salary, SALARY_FIELD_PARSERS) if bulk else None
     with _csv_reader(salaries_csv) as csv_reader:
         _check_provided_fields(
             csv_reader,
@@ -329,17 +432,22 @@ def _handle_salaries(
                     f"Officer with id {row['officer_id']} does not exist (in this department)"
                 )
             row["officer_id"] = officer.id
-            _create_or_update_model(
-                row=row,
-                existing_model_lookup=id_to_salary,
-                create_method=create_salary_from_dict,
-                update_method=update_salary_from_dict,
-                force_create=force_create,
-                model=Salary,
-            )
+            if writer:
+                writer.add(row, id_to_salary)
+            else:
+                _create_or_update_model(
+                    row=row,
+                    existing_model_lookup=id_to_salary,
+                    create_method=create_salary_from_dict,
+                    update_method=update_salary_from_dict,
+                    force_create=force_create,
+                    model=Salary,
+                )
             counter += 1
             if counter % 1000 == 0:
                 print(f"Processed {counter} salaries.")
+    if writer:
+        writer.write()
     print(f"Done with salaries. Processed {counter} rows.")
 
 
@@ -485,7 +593,20 @@ def import_csv_files(
     incidents_csv: Optional[str],
     force_create: bool = False,
     overwrite_assignments: bool = False,
+    bulk: Optional[bool] = None,
 ):
+    """Import the csv files into the department.
+
+    With `bulk`, officers, assignments and salaries are written in batched
+    INSERT and UPDATE statements after each csv has been parsed, rather than
+    one row at a time. It defaults to on for PostgreSQL, and cannot be combined
+    with `force_create`.
+    """
+    if bulk is None:
+        bulk = db.session.get_bind().dialect.name == "postgresql" and not force_create
+    if bulk and force_create:
+        raise Exception("Bulk imports cannot be combined with force create.")
+
     department = Department.query.filter_by(
         name=department_name, state=department_state
     ).one_or_none()
@@ -508,6 +629,7 @@ def import_csv_files(
             department_id,
             id_to_officer,
             force_create,
+            bulk,
         )
         all_officers.update(new_officers)
 
@@ -518,10 +640,12 @@ def import_csv_files(
             all_officers,
             force_create,
             overwrite_assignments,
+            bulk,
         )
+        refresh_current_assignments(department_id=department_id)
 
     if salaries_csv is not None:
-        _handle_salaries(salaries_csv, department_id, all_officers, force_create)
+        _handle_salaries(salaries_csv, department_id, all_officers, force_create, bulk)
 
     if incidents_csv is not None or links_csv is not None:
         existing_incidents = Incident.query.filter_by(department_id=department_id).all()
@@ -545,6 +669,8 @@ def import_csv_files(
             links_csv, department_id, all_officers, all_incidents, force_create
         )
 
+    # Bulk writes bypass the session, so they are not tracked by the statistics
+    refresh_department_statistics([department_id])
     db.session.commit()
     print("All committed.")
 
@@ -1,14 +1,15 @@
 import base64
 import os.path
 from abc import ABC, abstractmethod
-from threading import Thread
-from typing import Optional, Self
+from contextlib import contextmanager
+from typing import Iterator, Optional, Self
 
 from flask import current_app
-from flask_mail import Mail, Message
+from flask_mail import Connection, Mail, Message
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
 
+from OpenOversight.app.models.database import OutgoingEmail, db
 from OpenOversight.app.models.emails import Email
 from OpenOversight.app.utils.constants import (
     KEY_MAIL_PORT,
@@ -34,6 +35,11 @@ class EmailProvider(ABC):
     def send_email(self, email: Email):
         """Send an email with this email provider."""
 
+    @contextmanager
+    def connect(self) -> Iterator[None]:
+        """Reuse one connection for the emails sent until the block exits."""
+        yield
+
 
 class GmailEmailProvider(EmailProvider):
     """Sends email through Gmail using the Google API client."""
@@ -65,6 +71,8 @@ class GmailEmailProvider(EmailProvider):
 class SMTPEmailProvider(EmailProvider):
     """Sends email with SMTP using Flask-Mail."""
 
+    connection: Optional[Connection] = None
+
     def start(self):
         self.mail = Mail(current_app)
 
@@ -85,17 +93,20 @@ class SMTPEmailProvider(EmailProvider):
         msg.body = email.body
         msg.html = email.html
 
-        thread = Thread(
-            target=SMTPEmailProvider.send_async_email,
-            args=[self.mail, app, msg],
-        )
+        if self.connection is not None:
+            self.connection.send(msg)
+        else:
+            self.mail.send(msg)
         current_app.logger.info("Sent email.")
-        thread.start()
 
-    @staticmethod
-    def send_async_email(mail: Mail, app, msg: Message):
-        with app.app_context():
-            mail.send(msg)
+    @contextmanager
+    def connect(self) -> Iterator[None]:
+        with self.mail.connect() as connection:
+            self.connection = connection
+            try:
+                yield
+            finally:
+                self.connection = None
 
 
 class SimulatedEmailProvider(EmailProvider):
@@ -156,6 +167,31 @@ class EmailClient:
 
     @classmethod
     def send_email(cls, email: Email):
+        """
+        Queue the email from the parameter list, to be delivered by
+        `flask send-emails` once the current database session is committed.
+
+        :param email: the specific email to be delivered
+        """
+        db.session.add(
+            OutgoingEmail(
+                receiver=email.receiver,
+                subject=email.subject,
+                body=email.body,
+                html=email.html,
+            )
+        )
+        current_app.logger.info("Queued email: %s", email.subject)
+
+    @classmethod
+    def connect(cls):
+        """Reuse one connection of the provider for the emails delivered in the
+        block.
+        """
+        return cls._provider.connect()
+
+    @classmethod
+    def deliver(cls, email: Email):
         """
         Deliver the email from the parameter list using the Singleton client.
 
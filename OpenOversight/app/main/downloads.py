@@ -1,10 +1,20 @@
 import csv
 import io
-from datetime import date
+import zlib
 from http import HTTPStatus
-from typing import Any, Callable, Dict, List, TypeVar
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    TypeVar,
+)
 
-from flask import Response, abort
+from flask import Response, abort, request, stream_with_context
 from sqlalchemy.orm import Query
 
 from OpenOversight.app.models.database import (
@@ -16,13 +26,35 @@ from OpenOversight.app.models.database import (
     Officer,
     Salary,
     db,
+    get_department_version,
+)
+from OpenOversight.app.models.database_cache import (
+    DB_CACHE,
+    get_database_cache_entry,
+    put_database_cache_entry,
 )
+from OpenOversight.app.utils.constants import (
+    CSV_CHUNK_SIZE,
+    CSV_QUERY_BATCH_SIZE,
+    ENCODING_UTF_8,
+)
+
+
+# Produce a gzip container rather than a raw zlib stream
+GZIP_WBITS = 16 + zlib.MAX_WBITS
 
 
 T = TypeVar("T")
 _Record = Dict[str, Any]
 
 
+class CsvPayload(NamedTuple):
+    """A rendered, gzip-compressed CSV file ready to be served."""
+
+    filename: str
+    data: bytes
+
+
 ########################################################################################
 # Check util methods
 ########################################################################################
@@ -45,24 +77,124 @@ def make_downloadable_csv(
     csv_suffix: str,
     field_names: List[str],
     record_maker: Callable[[T], _Record],
+    cache_key: str,
 ) -> Response:
+    """Serve the department's CSV from the cache, or stream it from the query.
+
+    On a cache miss the rows are fetched in batches and sent as they are
+    written, and the compressed CSV is cached once the stream completes, unless
+    it is too large for the cache or the department changed in the meantime.
+    """
+    cache_params = (Department(id=department_id), cache_key)
+    payload = get_database_cache_entry(*cache_params)
+    if payload is not None:
+        return make_csv_response(payload)
+
     department = db.session.get(Department, department_id)
     if not department:
         abort(HTTPStatus.NOT_FOUND)
 
+    dept_name = department.name.replace(" ", "_")
+    csv_name = dept_name + f"_{csv_suffix}.csv"
+    # Read before the rows, so a commit made while they are streamed, whose cache
+    # invalidation the finished stream would otherwise undo, is noticed
+    version = get_department_version(department_id)
+
+    def _cache_payload(data: bytes) -> None:
+        if get_department_version(department_id) == version:
+            put_database_cache_entry(*cache_params, CsvPayload(csv_name, data))
+
+    rows = stream_csv(
+        query.yield_per(CSV_QUERY_BATCH_SIZE),
+        field_names,
+        record_maker,
+        on_complete=_cache_payload,
+        max_compressed_size=DB_CACHE.maxsize,
+    )
+    csv_headers = {"Content-disposition": "attachment; filename=" + csv_name}
+    return Response(stream_with_context(rows), mimetype="text/csv", headers=csv_headers)
+
+
+def stream_csv(
+    rows: Iterable[T],
+    field_names: List[str],
+    record_maker: Callable[[T], _Record],
+    on_complete: Optional[Callable[[bytes], None]] = None,
+    chunk_size: int = CSV_CHUNK_SIZE,
+    max_compressed_size: Optional[int] = None,
+) -> Iterator[bytes]:
+    """Yield the encoded CSV in chunks of roughly `chunk_size` bytes.
+
+    The output is gzip-compressed alongside the stream and handed to
+    `on_complete` once every row has been written. Compressed output growing
+    past `max_compressed_size` is dropped instead, and `on_complete` not called.
+    """
+    compressor = zlib.compressobj(wbits=GZIP_WBITS) if on_complete else None
+    compressed: List[bytes] = []
+    compressed_size = 0
+
     csv_output = io.StringIO()
     csv_writer = csv.DictWriter(csv_output, fieldnames=field_names)
     csv_writer.writeheader()
 
-    for entity in query:
-        record = record_maker(entity)
-        csv_writer.writerow(record)
+    def _flush() -> bytes:
+        nonlocal compressor, compressed_size
+        chunk = csv_output.getvalue().encode(ENCODING_UTF_8)
+        csv_output.seek(0)
+        csv_output.truncate()
+        if compressor is not None:
+            compressed.append(compressor.compress(chunk))
+            compressed_size += len(compressed[-1])
+            if (
+                max_compressed_size is not None
+                and compressed_size > max_compressed_size
+            ):
+                compressor = None
+                compressed.clear()
+        return chunk
 
-    dept_name = department.name.replace(" ", "_")
-    csv_name = dept_name + f"_{csv_suffix}.csv"
+    for entity in rows:
+        csv_writer.writerow(record_maker(entity))
+        if csv_output.tell() >= chunk_size:
+            yield _flush()
+
+    yield _flush()
+    if compressor is None or on_complete is None:
+        return
+    compressed.append(compressor.flush())
+    if max_compressed_size is None or (
+        compressed_size + len(compressed[-1]) <= max_compressed_size
+    ):
+        on_complete(b"".join(compressed))
 
-    csv_headers = {"Content-disposition": "attachment; filename=" + csv_name}
-    return Response(csv_output.getvalue(), mimetype="text/csv", headers=csv_headers)
+
+def decompress_csv(data: bytes, chunk_size: int = CSV_CHUNK_SIZE) -> Iterator[bytes]:
+    """Yield the gzip-compressed CSV decompressed, in chunks of at most
+    `chunk_size` bytes.
+    """
+    decompressor = zlib.decompressobj(wbits=GZIP_WBITS)
+    for start in range(0, len(data), chunk_size):
+        pending = data[start : start + chunk_size]
+        while pending:
+            chunk = decompressor.decompress(pending, chunk_size)
+            if chunk:
+                yield chunk
+            pending = decompressor.unconsumed_tail
+    if chunk := decompressor.flush():
+        yield chunk
+
+
+def make_csv_response(payload: CsvPayload) -> Response:
+    csv_headers = {
+        "Content-disposition": "attachment; filename=" + payload.filename,
+        "Vary": "Accept-Encoding",
+    }
+    if "gzip" in request.accept_encodings:
+        csv_headers["Content-Encoding"] = "gzip"
+        return Response(payload.data, mimetype="text/csv", headers=csv_headers)
+    return Response(
+        decompress_csv(payload.data), mimetype="text/csv", headers=csv_headers
+    )
 
 
 ########################################################################################
@@ -84,15 +216,12 @@ def salary_record_maker(salary: Salary) -> _Record:
 
 
 def officer_record_maker(officer: Officer) -> _Record:
-    if officer.assignments:
-        most_recent_assignment = max(
-            officer.assignments, key=lambda a: a.start_date or date.min
-        )
+    most_recent_assignment = officer.current_assignment
+    if most_recent_assignment:
         most_recent_title = most_recent_assignment.job and check_output(
             most_recent_assignment.job.job_title
         )
     else:
-        most_recent_assignment = None
         most_recent_title = None
     if officer.salaries:
         most_recent_salary = max(officer.salaries, key=lambda s: s.year)
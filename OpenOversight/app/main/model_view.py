@@ -20,10 +20,10 @@ from OpenOversight.app.utils.constants import (
     KEY_DEPT_ALL_INCIDENTS,
     KEY_DEPT_ALL_LINKS,
     KEY_DEPT_ALL_NOTES,
-    KEY_DEPT_INCIDENTS_LAST_UPDATED,
 )
 from OpenOversight.app.utils.db import add_department_query
 from OpenOversight.app.utils.forms import set_dynamic_default
+from OpenOversight.app.utils.pagination import SortKey, keyset_paginate
 
 
 class ModelView(MethodView):
@@ -40,19 +40,18 @@ class ModelView(MethodView):
         if obj_id is None:
             page = int(request.args.get("page", 1))
 
+            sort_keys = [SortKey(self.model.id, descending=self.descending)]
             if self.order_by:
-                if not self.descending:
-                    objects = self.model.query.order_by(
-                        getattr(self.model, self.order_by)
-                    ).paginate(page=page, per_page=self.per_page, error_out=False)
-                else:
-                    objects = self.model.query.order_by(
-                        getattr(self.model, self.order_by).desc()
-                    ).paginate(page=page, per_page=self.per_page, error_out=False)
-            else:
-                objects = self.model.query.paginate(
-                    page=page, per_page=self.per_page, error_out=False
+                sort_keys.insert(
+                    0, SortKey(getattr(self.model, self.order_by), self.descending)
                 )
+            objects = keyset_paginate(
+                self.model.query,
+                sort_keys,
+                per_page=self.per_page,
+                cursor=request.args.get("cursor"),
+                page=page,
+            )
 
             return render_template(
                 f"{self.model_name}_list.html",
@@ -89,7 +88,7 @@ class ModelView(MethodView):
             match self.model.__name__:
                 case Incident.__name__:
                     Department(id=new_obj.department_id).remove_database_cache_entries(
-                        [KEY_DEPT_INCIDENTS_LAST_UPDATED, KEY_DEPT_ALL_INCIDENTS],
+                        [KEY_DEPT_ALL_INCIDENTS],
                     )
                 case Note.__name__:
                     officer = Officer.query.filter_by(
@@ -172,7 +171,7 @@ class ModelView(MethodView):
             match self.model.__name__:
                 case Incident.__name__:
                     Department(id=obj.department_id).remove_database_cache_entries(
-                        [KEY_DEPT_INCIDENTS_LAST_UPDATED, KEY_DEPT_ALL_INCIDENTS],
+                        [KEY_DEPT_ALL_INCIDENTS],
                     )
                 case Note.__name__:
                     officer = Officer.query.filter_by(
@@ -22,7 +22,7 @@ from flask_login import current_user, login_required, login_user
 from flask_wtf import FlaskForm
 from sqlalchemy import select
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import contains_eager, joinedload, selectinload
+from sqlalchemy.orm import contains_eager, joinedload, selectinload, with_expression
 from sqlalchemy.orm.exc import NoResultFound
 
 from OpenOversight.app import limiter, sitemap
@@ -70,28 +70,28 @@ from OpenOversight.app.models.database import (
     Note,
     Officer,
     Salary,
+    SitemapShard,
     Unit,
+    UploadJob,
     User,
     db,
 )
-from OpenOversight.app.models.database_cache import (
-    get_database_cache_entry,
-    put_database_cache_entry,
-)
 from OpenOversight.app.utils.auth import ac_or_admin_required, admin_required
 from OpenOversight.app.utils.choices import AGE_CHOICES, GENDER_CHOICES, RACE_CHOICES
-from OpenOversight.app.utils.cloud import crop_image, save_image_to_s3_and_db
+from OpenOversight.app.utils.conditional import conditional_page
 from OpenOversight.app.utils.constants import (
     ENCODING_UTF_8,
+    FACE_CROP_PENDING,
     FLASH_MSG_PERMANENT_REDIRECT,
+    IMAGE_SLOT_LIST_OFFICER,
+    IMAGE_SLOT_OFFICER_PROFILE,
+    IMAGE_SLOT_SORT,
     KEY_DEPT_ALL_ASSIGNMENTS,
     KEY_DEPT_ALL_INCIDENTS,
     KEY_DEPT_ALL_LINKS,
     KEY_DEPT_ALL_NOTES,
     KEY_DEPT_ALL_OFFICERS,
     KEY_DEPT_ALL_SALARIES,
-    KEY_DEPT_ASSIGNMENTS_LAST_UPDATED,
-    KEY_DEPT_OFFICERS_LAST_UPDATED,
     KEY_OFFICERS_PER_PAGE,
     KEY_TIMEZONE,
 )
@@ -99,6 +99,9 @@ from OpenOversight.app.utils.db import (
     add_department_query,
     add_unit_query,
     compute_leaderboard_stats,
+    department_jobs,
+    department_units,
+    listed_departments,
     unit_choices,
     unsorted_dept_choices,
 )
@@ -113,16 +116,30 @@ from OpenOversight.app.utils.forms import (
     filter_by_form,
     set_dynamic_default,
 )
+from OpenOversight.app.utils.fragments import (
+    OFFICER_PROFILE_FRAGMENTS,
+    Fragments,
+    officer_fragments_key,
+)
 from OpenOversight.app.utils.general import (
     AVAILABLE_TIMEZONES,
     ac_can_edit_officer,
     allowed_file,
     get_or_create,
-    get_random_image,
     replace_list,
     serve_image,
+    serve_image_variant,
     validate_redirect_url,
 )
+from OpenOversight.app.utils.image_queue import (
+    claim_random_image,
+    unsorted_images,
+    untagged_images,
+)
+from OpenOversight.app.utils.pagination import SortKey, keyset_paginate
+from OpenOversight.app.utils.search import officer_name_rank
+from OpenOversight.app.utils.sitemaps import render_sitemap_index
+from OpenOversight.app.utils.uploads import enqueue_upload
 
 
 # Ensure the file is read/write by the creator only
@@ -142,6 +159,21 @@ def static_routes():
         yield "main." + endpoint, {}
 
 
+@main.route("/sitemap.xml")
+def sitemap_index():
+    return Response(render_sitemap_index(), mimetype="application/xml")
+
+
+@main.route("/sitemaps/<source>-<int:number>.xml")
+def sitemap_shard(source: str, number: int):
+    shard = db.session.get(SitemapShard, (source, number))
+    if shard is None:
+        abort(HTTPStatus.NOT_FOUND)
+    response = Response(shard.content, mimetype="application/xml")
+    response.last_modified = shard.built_at
+    return response
+
+
 def redirect_url(default="main.index"):
     return (
         validate_redirect_url(session.get("next"))
@@ -171,8 +203,7 @@ def set_session_timezone():
 @sitemap_include
 @main.route("/browse", methods=[HTTPMethod.GET])
 def browse():
-    departments = Department.query.filter(Department.officers.any())
-    return render_template("browse.html", departments=departments)
+    return render_template("browse.html", departments=listed_departments())
 
 
 @sitemap_include
@@ -263,13 +294,10 @@ def redirect_sort_images(department_id: int):
 @login_required
 def sort_images(department_id: int):
     # Select a random unsorted image from the database
-    image_query = Image.query.filter_by(contains_cops=None).filter_by(
-        department_id=department_id
-    )
-    image = get_random_image(image_query)
+    image = claim_random_image(unsorted_images(department_id))
 
     if image:
-        proper_path = serve_image(image.filepath)
+        proper_path = serve_image_variant(image, IMAGE_SLOT_SORT)
     else:
         proper_path = None
     return render_template(
@@ -308,29 +336,75 @@ def redirect_officer_profile(officer_id: int):
     )
 
 
+# Everything `officer.html` and its partials read, so a profile renders in the
+# same number of queries however many assignments or incidents it has
+OFFICER_PROFILE_LOADER_OPTIONS = (
+    joinedload(Officer.department),
+    joinedload(Officer.current_assignment).options(
+        joinedload(Assignment.job), joinedload(Assignment.unit)
+    ),
+    selectinload(Officer.face).joinedload(Face.image).selectinload(Image.variants),
+    selectinload(Officer.assignments).options(
+        joinedload(Assignment.job), joinedload(Assignment.unit)
+    ),
+    selectinload(Officer.descriptions).joinedload(Description.creator),
+    selectinload(Officer.notes).joinedload(Note.creator),
+    selectinload(Officer.salaries),
+    selectinload(Officer.links),
+    selectinload(Officer.incidents).options(
+        joinedload(Incident.department),
+        joinedload(Incident.address),
+        joinedload(Incident.creator),
+        selectinload(Incident.license_plates),
+        selectinload(Incident.links),
+        selectinload(Incident.officers),
+    ),
+)
+
+
+def _officer_departments(officer_id: int):
+    return select(Officer.department_id).where(Officer.id == officer_id)
+
+
+def _departments(department_id: int, **kwargs):
+    return [department_id]
+
+
 @main.route("/officers/<int:officer_id>", methods=[HTTPMethod.GET, HTTPMethod.POST])
+@conditional_page(_officer_departments)
 def officer_profile(officer_id: int):
     form = AssignmentForm()
     try:
-        officer = Officer.query.filter_by(id=officer_id).one()
+        officer = (
+            Officer.query.options(
+                joinedload(Officer.department).joinedload(Department.statistics)
+            )
+            .filter_by(id=officer_id)
+            .one()
+        )
     except NoResultFound:
         abort(HTTPStatus.NOT_FOUND)
     except Exception:
         current_app.logger.exception("Error finding officer")
-    form.job_title.query = (
-        Job.query.filter_by(department_id=officer.department_id)
-        .order_by(Job.order.asc())
-        .all()
-    )
+    form.job_title.query = department_jobs(officer.department_id)
 
-    try:
-        faces = (
-            Face.query.filter_by(officer_id=officer_id)
-            .order_by(Face.featured.desc())
-            .all()
+    fragments = Fragments(officer_fragments_key(officer), OFFICER_PROFILE_FRAGMENTS)
+    if fragments.complete:
+        return render_template(
+            "officer.html", officer=officer, form=form, fragments=fragments
         )
-        assignments = Assignment.query.filter_by(officer_id=officer_id).all()
-        face_paths = [(face, serve_image(face.image.filepath)) for face in faces]
+
+    # Load everything the fragments still to be rendered read
+    Officer.query.options(*OFFICER_PROFILE_LOADER_OPTIONS).filter_by(
+        id=officer_id
+    ).one()
+    try:
+        faces = sorted(officer.face, key=lambda face: not face.featured)
+        assignments = officer.assignments
+        face_paths = [
+            (face, serve_image_variant(face.image, IMAGE_SLOT_OFFICER_PROFILE))
+            for face in faces
+        ]
         if not face_paths:
             # Add in the placeholder image if no faces are found
             face_paths = [
@@ -358,15 +432,10 @@ def officer_profile(officer_id: int):
         face_paths=face_paths,
         assignments=assignments,
         form=form,
+        fragments=fragments,
     )
 
 
-@sitemap.register_generator
-def sitemap_officers():
-    for officer in Officer.query.all():
-        yield "main.officer_profile", {"officer_id": officer.id}
-
-
 @main.route("/officer/<int:officer_id>/assignment/new", methods=[HTTPMethod.POST])
 @ac_or_admin_required
 def redirect_add_assignment(officer_id: int):
@@ -381,11 +450,7 @@ def redirect_add_assignment(officer_id: int):
 def add_assignment(officer_id: int):
     form = AssignmentForm()
     officer = db.session.get(Officer, officer_id)
-    form.job_title.query = (
-        Job.query.filter_by(department_id=officer.department_id)
-        .order_by(Job.order.asc())
-        .all()
-    )
+    form.job_title.query = department_jobs(officer.department_id)
     if not officer:
         flash("Officer not found")
         abort(HTTPStatus.NOT_FOUND)
@@ -398,7 +463,7 @@ def add_assignment(officer_id: int):
             try:
                 add_new_assignment(officer_id, form, current_user)
                 Department(id=officer.department_id).remove_database_cache_entries(
-                    [KEY_DEPT_ALL_ASSIGNMENTS, KEY_DEPT_ASSIGNMENTS_LAST_UPDATED],
+                    [KEY_DEPT_ALL_ASSIGNMENTS],
                 )
                 flash("Added new assignment!")
             except IntegrityError:
@@ -450,11 +515,7 @@ def edit_assignment(officer_id: int, assignment_id: int):
 
     assignment = db.session.get(Assignment, assignment_id)
     form = AssignmentForm(obj=assignment)
-    form.job_title.query = (
-        Job.query.filter_by(department_id=officer.department_id)
-        .order_by(Job.order.asc())
-        .all()
-    )
+    form.job_title.query = department_jobs(officer.department_id)
     form.job_title.data = db.session.get(Job, assignment.job_id)
     form.unit.query = unit_choices(officer.department_id)
     if form.unit.data and isinstance(form.unit.data, int):
@@ -882,6 +943,7 @@ def redirect_list_officer(
 
 
 @main.route("/departments/<int:department_id>")
+@conditional_page(_departments)
 def list_officer(
     department_id: int,
     page: int = 1,
@@ -899,11 +961,8 @@ def list_officer(
     require_photo: Optional[bool] = None,
 ):
     form = BrowseForm()
-    form.rank.query = (
-        Job.query.filter_by(department_id=department_id, is_sworn_officer=True)
-        .order_by(Job.order.asc())
-        .all()
-    )
+    jobs = department_jobs(department_id)
+    form.rank.query = [job for job in jobs if job.is_sworn_officer]
     form_data = form.data
     form_data["race"] = race or []
     form_data["gender"] = gender or []
@@ -953,19 +1012,9 @@ def list_officer(
         form_data["require_photo"] = require_photo_arg
 
     unit_selections = ["Not Sure"] + [
-        uc[0]
-        for uc in db.session.query(Unit.description)
-        .filter_by(department_id=department_id)
-        .order_by(Unit.description.asc())
-        .all()
-    ]
-    rank_selections = [
-        jc[0]
-        for jc in db.session.query(Job.job_title, Job.order)
-        .filter_by(department_id=department_id)
-        .order_by(Job.job_title)
-        .all()
+        unit.description for unit in department_units(department_id)
     ]
+    rank_selections = sorted(job.job_title for job in jobs)
     if (units := request.args.getlist("unit")) and all(
         unit in unit_selections for unit in units
     ):
@@ -983,24 +1032,37 @@ def list_officer(
 
     # Filter officers by presence of a photo
     if form_data["require_photo"]:
-        officers = officers.join(Face)
-    else:
-        officers = officers.options(selectinload(Officer.face))
+        officers = officers.filter(Officer.face.any())
+    officers = officers.options(
+        selectinload(Officer.face).joinedload(Face.image).selectinload(Image.variants)
+    )
 
-    officers = officers.order_by(Officer.last_name, Officer.first_name, Officer.id)
+    sort_keys = [
+        SortKey(Officer.last_name),
+        SortKey(Officer.first_name),
+        SortKey(Officer.id),
+    ]
+    # Put the closest name matches first
+    rank = officer_name_rank(form_data["first_name"], form_data["last_name"])
+    if rank is not None:
+        officers = officers.options(with_expression(Officer.search_rank, rank))
+        sort_keys.insert(0, SortKey(rank, name="search_rank"))
 
-    officers = officers.paginate(
-        page=page, per_page=current_app.config[KEY_OFFICERS_PER_PAGE], error_out=False
+    officers = keyset_paginate(
+        officers,
+        sort_keys,
+        per_page=current_app.config[KEY_OFFICERS_PER_PAGE],
+        cursor=request.args.get("cursor"),
+        page=page,
     )
 
     for officer in officers.items:
         officer_face = sorted(officer.face, key=lambda x: x.featured, reverse=True)
 
-        # Could do some extra work to not lazy load images but load them all together.
-        # To do that properly we would want to ensure to only load the first picture of
-        # each officer.
         if officer_face and officer_face[0].image:
-            officer.image = serve_image(officer_face[0].image.filepath)
+            officer.image = serve_image_variant(
+                officer_face[0].image, IMAGE_SLOT_LIST_OFFICER
+            )
 
     choices = {
         "race": RACE_CHOICES,
@@ -1012,7 +1074,7 @@ def list_officer(
     next_url = url_for(
         "main.list_officer",
         department_id=department.id,
-        page=officers.next_num,
+        cursor=officers.next_cursor,
         race=form_data["race"],
         gender=form_data["gender"],
         rank=form_data["rank"],
@@ -1029,7 +1091,7 @@ def list_officer(
     prev_url = url_for(
         "main.list_officer",
         department_id=department.id,
-        page=officers.prev_num,
+        cursor=officers.prev_cursor,
         race=form_data["race"],
         gender=form_data["gender"],
         rank=form_data["rank"],
@@ -1079,11 +1141,12 @@ def get_dept_ranks(department_id: Optional[int] = None, is_sworn_officer: bool =
         is_sworn_officer = request.args.get("is_sworn_officer")
 
     if department_id:
-        ranks = Job.query.filter_by(department_id=department_id)
+        ranks = department_jobs(department_id)
         if is_sworn_officer:
-            ranks = ranks.filter_by(is_sworn_officer=True)
-        ranks = ranks.order_by(Job.job_title).all()
-        rank_list = [(rank.id, rank.job_title) for rank in ranks]
+            ranks = [rank for rank in ranks if rank.is_sworn_officer]
+        rank_list = sorted(
+            ((rank.id, rank.job_title) for rank in ranks), key=lambda x: x[1]
+        )
     else:
         # Not filtering by is_sworn_officer
         ranks = Job.query.all()
@@ -1112,8 +1175,7 @@ def get_dept_units(department_id: Optional[int] = None):
         department_id = request.args.get("department_id")
 
     if department_id:
-        units = Unit.query.filter_by(department_id=department_id)
-        units = units.order_by(Unit.description).all()
+        units = department_units(department_id)
         unit_list = [(unit.id, unit.description) for unit in units]
     else:
         units = Unit.query.all()
@@ -1161,7 +1223,7 @@ def add_officer():
         form = AddOfficerForm(new_form_data)
         officer = add_officer_profile(form, current_user)
         Department(id=officer.department_id).remove_database_cache_entries(
-            [KEY_DEPT_ALL_OFFICERS, KEY_DEPT_OFFICERS_LAST_UPDATED]
+            [KEY_DEPT_ALL_OFFICERS]
         )
         flash(f"New Officer {officer.last_name} added to OpenOversight")
         return redirect(url_for("main.submit_officer_images", officer_id=officer.id))
@@ -1208,9 +1270,6 @@ def edit_officer(officer_id: int):
 
     if form.validate_on_submit():
         officer = edit_officer_profile(officer, form)
-        Department(id=officer.department_id).remove_database_cache_entries(
-            [KEY_DEPT_OFFICERS_LAST_UPDATED]
-        )
         flash(f"Officer {officer.last_name} edited")
         return redirect(url_for("main.officer_profile", officer_id=officer.id))
     else:
@@ -1378,22 +1437,14 @@ def label_data(department_id: Optional[int] = None, image_id: Optional[int] = No
                 .first()
             )
         else:  # Get a random image from that department
-            image_query = (
-                Image.query.filter_by(contains_cops=True)
-                .filter_by(department_id=department_id)
-                .filter_by(is_tagged=False)
-            )
-            image = get_random_image(image_query)
+            image = claim_random_image(untagged_images(department_id))
     else:
         department = None
         if image_id:
             image = db.session.get(Image, image_id)
         else:
             # Select a random untagged image from the entire database
-            image_query = Image.query.filter_by(contains_cops=True).filter_by(
-                is_tagged=False
-            )
-            image = get_random_image(image_query)
+            image = claim_random_image(untagged_images())
 
     if image:
         if image.is_tagged and not current_user.is_administrator:
@@ -1448,36 +1499,22 @@ def label_data(department_id: Optional[int] = None, image_id: Optional[int] = No
                 "Are you sure that is the correct officer serial number?"
             )
         elif not existing_tag:
-            left = form.dataX.data
-            upper = form.dataY.data
-            right = left + form.dataWidth.data
-            lower = upper + form.dataHeight.data
-
-            cropped_image = crop_image(
-                image,
-                crop_data=(left, upper, right, lower),
-                department_id=department_id,
+            # The face shows the whole photo until `flask ingest-uploads` crops it
+            new_tag = Face(
+                officer_id=officer_exists.id,
+                img_id=image.id,
+                original_image_id=image.id,
+                face_position_x=form.dataX.data,
+                face_position_y=form.dataY.data,
+                face_width=form.dataWidth.data,
+                face_height=form.dataHeight.data,
+                crop_status=FACE_CROP_PENDING,
+                created_by=current_user.id,
+                last_updated_by=current_user.id,
             )
-            cropped_image.contains_cops = True
-            cropped_image.is_tagged = True
-
-            if cropped_image:
-                new_tag = Face(
-                    officer_id=officer_exists.id,
-                    img_id=cropped_image.id,
-                    original_image_id=image.id,
-                    face_position_x=left,
-                    face_position_y=upper,
-                    face_width=form.dataWidth.data,
-                    face_height=form.dataHeight.data,
-                    created_by=current_user.id,
-                    last_updated_by=current_user.id,
-                )
-                db.session.add(new_tag)
-                db.session.commit()
-                flash("Tag added to database")
-            else:
-                flash("There was a problem saving this tag. Please try again later.")
+            db.session.add(new_tag)
+            db.session.commit()
+            flash("Tag added to database")
         else:
             flash("Tag already exists between this officer and image! Tag not added.")
     else:
@@ -1579,19 +1616,15 @@ def redirect_download_dept_officers_csv(department_id: int):
 @main.route(
     "/download/departments/<int:department_id>/officers", methods=[HTTPMethod.GET]
 )
+@conditional_page(_departments, per_viewer=False)
 @limiter.limit("5/minute")
 def download_dept_officers_csv(department_id: int):
-    cache_params = (Department(id=department_id), KEY_DEPT_ALL_OFFICERS)
-    officers = get_database_cache_entry(*cache_params)
-    if officers is None:
-        officers = (
-            db.session.query(Officer)
-            .options(joinedload(Officer.assignments).joinedload(Assignment.job))
-            .options(joinedload(Officer.salaries))
-            .filter_by(department_id=department_id)
-            .all()
-        )
-        put_database_cache_entry(*cache_params, officers)
+    officers = (
+        db.session.query(Officer)
+        .options(joinedload(Officer.current_assignment).joinedload(Assignment.job))
+        .options(selectinload(Officer.salaries))
+        .filter_by(department_id=department_id)
+    )
 
     field_names = [
         "id",
@@ -1609,7 +1642,12 @@ def download_dept_officers_csv(department_id: int):
         "most recent salary",
     ]
     return make_downloadable_csv(
-        officers, department_id, "Officers", field_names, officer_record_maker
+        officers,
+        department_id,
+        "Officers",
+        field_names,
+        officer_record_maker,
+        KEY_DEPT_ALL_OFFICERS,
     )
 
 
@@ -1627,21 +1665,17 @@ def redirect_download_dept_assignments_csv(department_id: int):
 @main.route(
     "/download/departments/<int:department_id>/assignments", methods=[HTTPMethod.GET]
 )
+@conditional_page(_departments, per_viewer=False)
 @limiter.limit("5/minute")
 def download_dept_assignments_csv(department_id: int):
-    cache_params = Department(id=department_id), KEY_DEPT_ALL_ASSIGNMENTS
-    assignments = get_database_cache_entry(*cache_params)
-    if assignments is None:
-        assignments = (
-            db.session.query(Assignment)
-            .join(Assignment.base_officer)
-            .filter(Officer.department_id == department_id)
-            .options(contains_eager(Assignment.base_officer))
-            .options(joinedload(Assignment.unit))
-            .options(joinedload(Assignment.job))
-            .all()
-        )
-        put_database_cache_entry(*cache_params, assignments)
+    assignments = (
+        db.session.query(Assignment)
+        .join(Assignment.base_officer)
+        .filter(Officer.department_id == department_id)
+        .options(contains_eager(Assignment.base_officer))
+        .options(joinedload(Assignment.unit))
+        .options(joinedload(Assignment.job))
+    )
 
     field_names = [
         "id",
@@ -1660,6 +1694,7 @@ def download_dept_assignments_csv(department_id: int):
         "Assignments",
         field_names,
         assignment_record_maker,
+        KEY_DEPT_ALL_ASSIGNMENTS,
     )
 
 
@@ -1677,13 +1712,15 @@ def redirect_download_incidents_csv(department_id: int):
 @main.route(
     "/download/departments/<int:department_id>/incidents", methods=[HTTPMethod.GET]
 )
+@conditional_page(_departments, per_viewer=False)
 @limiter.limit("5/minute")
 def download_incidents_csv(department_id: int):
-    cache_params = (Department(id=department_id), KEY_DEPT_ALL_INCIDENTS)
-    incidents = get_database_cache_entry(*cache_params)
-    if incidents is None:
-        incidents = Incident.query.filter_by(department_id=department_id).all()
-        put_database_cache_entry(*cache_params, incidents)
+    incidents = Incident.query.filter_by(department_id=department_id).options(
+        joinedload(Incident.address),
+        selectinload(Incident.license_plates),
+        selectinload(Incident.links),
+        selectinload(Incident.officers),
+    )
 
     field_names = [
         "id",
@@ -1702,6 +1739,7 @@ def download_incidents_csv(department_id: int):
         "Incidents",
         field_names,
         incidents_record_maker,
+        KEY_DEPT_ALL_INCIDENTS,
     )
 
 
@@ -1719,19 +1757,15 @@ def redirect_download_dept_salaries_csv(department_id: int):
 @main.route(
     "/download/departments/<int:department_id>/salaries", methods=[HTTPMethod.GET]
 )
+@conditional_page(_departments, per_viewer=False)
 @limiter.limit("5/minute")
 def download_dept_salaries_csv(department_id: int):
-    cache_params = (Department(id=department_id), KEY_DEPT_ALL_SALARIES)
-    salaries = get_database_cache_entry(*cache_params)
-    if salaries is None:
-        salaries = (
-            db.session.query(Salary)
-            .join(Salary.officer)
-            .filter(Officer.department_id == department_id)
-            .options(contains_eager(Salary.officer))
-            .all()
-        )
-        put_database_cache_entry(*cache_params, salaries)
+    salaries = (
+        db.session.query(Salary)
+        .join(Salary.officer)
+        .filter(Officer.department_id == department_id)
+        .options(contains_eager(Salary.officer))
+    )
 
     field_names = [
         "id",
@@ -1744,7 +1778,12 @@ def download_dept_salaries_csv(department_id: int):
         "is_fiscal_year",
     ]
     return make_downloadable_csv(
-        salaries, department_id, "Salaries", field_names, salary_record_maker
+        salaries,
+        department_id,
+        "Salaries",
+        field_names,
+        salary_record_maker,
+        KEY_DEPT_ALL_SALARIES,
     )
 
 
@@ -1758,19 +1797,17 @@ def redirect_download_dept_links_csv(department_id: int):
 
 
 @main.route("/download/departments/<int:department_id>/links", methods=[HTTPMethod.GET])
+@conditional_page(_departments, per_viewer=False)
 @limiter.limit("5/minute")
 def download_dept_links_csv(department_id: int):
-    cache_params = (Department(id=department_id), KEY_DEPT_ALL_LINKS)
-    links = get_database_cache_entry(*cache_params)
-    if links is None:
-        links = (
-            db.session.query(Link)
-            .join(Link.officers)
-            .filter(Officer.department_id == department_id)
-            .options(contains_eager(Link.officers))
-            .all()
+    links = (
+        db.session.query(Link)
+        .filter(Link.officers.any(Officer.department_id == department_id))
+        .options(
+            selectinload(Link.officers.and_(Officer.department_id == department_id))
         )
-        put_database_cache_entry(*cache_params, links)
+        .options(selectinload(Link.incidents))
+    )
 
     field_names = [
         "id",
@@ -1783,7 +1820,12 @@ def download_dept_links_csv(department_id: int):
         "incidents",
     ]
     return make_downloadable_csv(
-        links, department_id, "Links", field_names, links_record_maker
+        links,
+        department_id,
+        "Links",
+        field_names,
+        links_record_maker,
+        KEY_DEPT_ALL_LINKS,
     )
 
 
@@ -1801,19 +1843,15 @@ def redirect_download_dept_descriptions_csv(department_id: int):
 @main.route(
     "/download/departments/<int:department_id>/descriptions", methods=[HTTPMethod.GET]
 )
+@conditional_page(_departments, per_viewer=False)
 @limiter.limit("5/minute")
 def download_dept_descriptions_csv(department_id: int):
-    cache_params = (Department(id=department_id), KEY_DEPT_ALL_NOTES)
-    notes = get_database_cache_entry(*cache_params)
-    if notes is None:
-        notes = (
-            db.session.query(Description)
-            .join(Description.officer)
-            .filter(Officer.department_id == department_id)
-            .options(contains_eager(Description.officer))
-            .all()
-        )
-        put_database_cache_entry(*cache_params, notes)
+    notes = (
+        db.session.query(Description)
+        .join(Description.officer)
+        .filter(Officer.department_id == department_id)
+        .options(contains_eager(Description.officer))
+    )
 
     field_names = [
         "id",
@@ -1824,15 +1862,19 @@ def download_dept_descriptions_csv(department_id: int):
         "last_updated_at",
     ]
     return make_downloadable_csv(
-        notes, department_id, "Notes", field_names, descriptions_record_maker
+        notes,
+        department_id,
+        "Notes",
+        field_names,
+        descriptions_record_maker,
+        KEY_DEPT_ALL_NOTES,
     )
 
 
 @sitemap_include
 @main.route("/download/all", methods=[HTTPMethod.GET])
 def all_data():
-    departments = Department.query.filter(Department.officers.any())
-    return render_template("departments_all.html", departments=departments)
+    return render_template("departments_all.html", departments=listed_departments())
 
 
 @main.route(
@@ -1898,37 +1940,37 @@ def upload(department_id: int, officer_id: Optional[int] = None):
             HTTPStatus.UNSUPPORTED_MEDIA_TYPE,
         )
 
-    try:
-        image = save_image_to_s3_and_db(
-            file_to_upload, current_user.id, department_id=department_id
-        )
-    except ValueError:
-        # Raised if MIME type not allowed
-        current_app.logger.exception("Invalid data type!")
-        return jsonify(error="Invalid data type!"), HTTPStatus.UNSUPPORTED_MEDIA_TYPE
+    job = enqueue_upload(
+        file_to_upload, current_user.id, department_id, officer_id=officer_id
+    )
+    return (
+        jsonify(
+            success="Success!",
+            job_id=job.id,
+            status_url=url_for("main.upload_status", job_id=job.id),
+        ),
+        HTTPStatus.ACCEPTED,
+    )
 
-    if image:
-        db.session.add(image)
-        if officer_id:
-            image.is_tagged = True
-            image.contains_cops = True
-            face = Face(
-                officer_id=officer_id,
-                # Assuming photos uploaded with an officer ID are already cropped,
-                # we set both images to the uploaded one
-                img_id=image.id,
-                original_image_id=image.id,
-                created_by=current_user.id,
-                last_updated_by=current_user.id,
-            )
-            db.session.add(face)
-            db.session.commit()
-        return jsonify(success="Success!"), HTTPStatus.OK
-    else:
-        return (
-            jsonify(error="Server error encountered. Try again later."),
-            HTTPStatus.INTERNAL_SERVER_ERROR,
-        )
+
+@main.route("/upload/jobs/<job_id>")
+@limiter.limit("25/second")
+def upload_status(job_id: str):
+    job = db.session.get(UploadJob, job_id)
+    if job is None or (job.user_id is not None and job.user_id != current_user.id):
+        return jsonify(error="This upload does not exist."), HTTPStatus.NOT_FOUND
+    image = db.session.get(Image, job.image_id) if job.image_id else None
+    near_duplicate_of = (
+        url_for("main.display_submission", image_id=image.near_duplicate_of_id)
+        if image and image.near_duplicate_of_id
+        else None
+    )
+    return (
+        jsonify(
+            status=job.status, error=job.error, near_duplicate_of=near_duplicate_of
+        ),
+        HTTPStatus.OK,
+    )
 
 
 @sitemap_include
@@ -1943,6 +1985,14 @@ def privacy_oo():
     return render_template("privacy.html")
 
 
+def _incident_departments(view, obj_id: Optional[int]):
+    if obj_id:
+        return select(Incident.department_id).where(Incident.id == obj_id)
+    if department_id := request.args.get("department_id", type=int):
+        return [department_id]
+    return None
+
+
 class IncidentApi(ModelView):
     model = Incident
     model_name = "incident"
@@ -1950,6 +2000,7 @@ class IncidentApi(ModelView):
     create_function = create_incident
     department_check = True
 
+    @conditional_page(_incident_departments)
     def get(self, obj_id: int):
         if obj_id:
             # Single-item view
@@ -1983,14 +2034,22 @@ class IncidentApi(ModelView):
             form.occurred_after.data = after_date
             incidents = incidents.filter(self.model.date > after_date)
 
-        incidents = incidents.order_by(
-            Incident.date.desc(), Incident.time.desc()
-        ).paginate(page=page, per_page=self.per_page, error_out=False)
+        incidents = keyset_paginate(
+            incidents,
+            [
+                SortKey(Incident.date, descending=True),
+                SortKey(Incident.time, descending=True),
+                SortKey(Incident.id, descending=True),
+            ],
+            per_page=self.per_page,
+            cursor=request.args.get("cursor"),
+            page=page,
+        )
 
         url = f"main.{self.model_name}_api"
         next_url = url_for(
             url,
-            page=incidents.next_num,
+            cursor=incidents.next_cursor,
             department_id=department_id,
             report_number=report_number,
             occurred_after=occurred_after,
@@ -1998,7 +2057,7 @@ class IncidentApi(ModelView):
         )
         prev_url = url_for(
             url,
-            page=incidents.prev_num,
+            cursor=incidents.prev_cursor,
             department_id=department_id,
             report_number=report_number,
             occurred_after=occurred_after,
@@ -2119,12 +2178,6 @@ main.add_url_rule(
 )
 
 
-@sitemap.register_generator
-def sitemap_incidents():
-    for incident in Incident.query.all():
-        yield "main.incident_api", {"obj_id": incident.id}
-
-
 class TextApi(ModelView):
     order_by = "created_at"
     descending = True
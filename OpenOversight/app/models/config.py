@@ -1,6 +1,14 @@
 import os
+import tempfile
 
 from OpenOversight.app.utils.constants import (
+    KEY_DB_CACHE_BACKEND,
+    KEY_DB_CACHE_MEMORY,
+    KEY_DB_CACHE_PATH,
+    KEY_IMAGE_STORAGE_BACKEND,
+    KEY_IMAGE_STORAGE_LOCAL,
+    KEY_IMAGE_STORAGE_PATH,
+    KEY_IMAGE_STORAGE_S3,
     KEY_MAIL_PASSWORD,
     KEY_MAIL_PORT,
     KEY_MAIL_SERVER,
@@ -11,6 +19,7 @@ from OpenOversight.app.utils.constants import (
     KEY_OO_MAIL_SUBJECT_PREFIX,
     KEY_OO_SERVICE_EMAIL,
     KEY_S3_BUCKET_NAME,
+    KEY_S3_MAX_POOL_CONNECTIONS,
     KEY_TIMEZONE,
     MEGABYTE,
 )
@@ -37,9 +46,24 @@ class BaseConfig:
         self.SQLALCHEMY_TRACK_MODIFICATIONS = False
         self.SQLALCHEMY_DATABASE_URI = os.environ.get("SQLALCHEMY_DATABASE_URI")
 
+        # Cache Settings
+        # Use "sqlite" to share the cache between workers through DB_CACHE_PATH
+        self.DB_CACHE_BACKEND = os.environ.get(
+            KEY_DB_CACHE_BACKEND, KEY_DB_CACHE_MEMORY
+        )
+        self.DB_CACHE_PATH = os.environ.get(
+            KEY_DB_CACHE_PATH, "/tmp/openoversight_cache.sqlite"
+        )
+
         # Protocol Settings
         self.SITEMAP_URL_SCHEME = "http"
 
+        # Sitemap Settings
+        # Flask-Sitemap only lists the static pages, officers and incidents are
+        # listed in the shards built by `flask refresh-sitemaps`
+        self.SITEMAP_ENDPOINT_URL = "/sitemaps/pages.xml"
+        self.SITEMAP_ENDPOINT_PAGE_URL = "/sitemaps/pages<int:page>.xml"
+
         # Pagination Settings
         self.OFFICERS_PER_PAGE = int(os.environ.get(KEY_OFFICERS_PER_PAGE, 20))
         self.USERS_PER_PAGE = int(os.environ.get("USERS_PER_PAGE", 20))
@@ -70,8 +94,17 @@ class BaseConfig:
         self.AWS_ENDPOINT_URL = os.environ.get("AWS_ENDPOINT_URL")
         self.AWS_SECRET_ACCESS_KEY = os.environ.get("AWS_SECRET_ACCESS_KEY")
         self.S3_BUCKET_NAME = os.environ.get(KEY_S3_BUCKET_NAME)
+        # Connections shared by the threads of one worker process
+        self.S3_MAX_POOL_CONNECTIONS = int(
+            os.environ.get(KEY_S3_MAX_POOL_CONNECTIONS, 10)
+        )
 
         # Upload Settings
+        # Use "local" to store images in IMAGE_STORAGE_PATH instead of S3
+        self.IMAGE_STORAGE_BACKEND = os.environ.get(
+            KEY_IMAGE_STORAGE_BACKEND, KEY_IMAGE_STORAGE_S3
+        )
+        self.IMAGE_STORAGE_PATH = os.environ.get(KEY_IMAGE_STORAGE_PATH)
         self.ALLOWED_EXTENSIONS = {"jpeg", "jpg", "jpe", "mpo", "png", "gif", "webp"}
         self.MAX_CONTENT_LENGTH = 50 * MEGABYTE
 
@@ -95,7 +128,12 @@ class TestingConfig(BaseConfig):
         self.WTF_CSRF_ENABLED = False
         self.NUM_OFFICERS = 120
         self.RATELIMIT_ENABLED = False
+        self.DB_CACHE_BACKEND = KEY_DB_CACHE_MEMORY
         self.SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+        self.IMAGE_STORAGE_BACKEND = KEY_IMAGE_STORAGE_LOCAL
+        self.IMAGE_STORAGE_PATH = os.path.join(
+            tempfile.gettempdir(), "openoversight_test_images"
+        )
 
 
 class ProductionConfig(BaseConfig):
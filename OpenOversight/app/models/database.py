@@ -1,35 +1,59 @@
-import operator
+import random
 import re
 import time
 import uuid
-from datetime import date, datetime
+from datetime import date, datetime, timezone
 from decimal import Decimal
-from typing import List, Optional
+from itertools import chain
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set
 
 from authlib.jose import JoseError, JsonWebToken
-from cachetools import cached
 from flask import current_app
 from flask_login import UserMixin
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import CheckConstraint, UniqueConstraint, func
-from sqlalchemy.orm import DeclarativeMeta, declarative_mixin, declared_attr, validates
+from sqlalchemy import (
+    DDL,
+    CheckConstraint,
+    Index,
+    UniqueConstraint,
+    case,
+    delete,
+    event,
+    func,
+    insert,
+    inspect,
+    or_,
+    select,
+    text,
+    update,
+)
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import (
+    DeclarativeMeta,
+    Session,
+    declarative_mixin,
+    declared_attr,
+    query_expression,
+    validates,
+)
 from sqlalchemy.sql import func as sql_func
 from sqlalchemy.types import TypeDecorator
 from werkzeug.security import check_password_hash, generate_password_hash
 
-from OpenOversight.app.models.database_cache import (
-    DB_CACHE,
-    model_cache_key,
-    remove_database_cache_entries,
+from OpenOversight.app.models.database_cache import remove_database_cache_entries
+from OpenOversight.app.models.session_tracking import (
+    SessionTracker,
+    register_session_tracker,
 )
 from OpenOversight.app.utils.choices import GENDER_CHOICES, RACE_CHOICES
 from OpenOversight.app.utils.constants import (
     ENCODING_UTF_8,
+    FACE_CROP_PENDING,
+    FACE_CROP_RUNNING,
     KEY_DB_CREATOR,
-    KEY_DEPT_ASSIGNMENTS_LAST_UPDATED,
-    KEY_DEPT_INCIDENTS_LAST_UPDATED,
-    KEY_DEPT_OFFICERS_LAST_UPDATED,
+    OUTGOING_EMAIL_PENDING,
     SIGNATURE_ALGORITHM,
+    UPLOAD_JOB_PENDING,
 )
 from OpenOversight.app.validators import state_validator, url_validator
 
@@ -37,6 +61,23 @@ from OpenOversight.app.validators import state_validator, url_validator
 db = SQLAlchemy()
 jwt = JsonWebToken(SIGNATURE_ALGORITHM)
 BaseModel: DeclarativeMeta = db.Model
+event.listen(
+    BaseModel.metadata,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
+
+
+def trigram_index(table_name: str, column_name: str) -> Index:
+    """GIN trigram index for `ILIKE '%...%'` and similarity searches, which plain
+    B-tree indexes cannot serve. Requires the PostgreSQL `pg_trgm` extension.
+    """
+    return Index(
+        f"ix_{table_name}_{column_name}_trgm",
+        column_name,
+        postgresql_using="gin",
+        postgresql_ops={column_name: "gin_trgm_ops"},
+    ).ddl_if(dialect="postgresql")
 
 
 officer_links = db.Table(
@@ -135,6 +176,8 @@ class Department(BaseModel, TrackUpdates):
         db.String(100), unique=False, nullable=True
     )
 
+    statistics = db.relationship("DepartmentStatistics", uselist=False, viewonly=True)
+
     __table_args__ = (UniqueConstraint("name", "state", name="departments_name_state"),)
 
     def __repr__(self):
@@ -153,40 +196,65 @@ class Department(BaseModel, TrackUpdates):
     def display_name(self):
         return self.name if not self.state else f"[{self.state}] {self.name}"
 
-    @cached(cache=DB_CACHE, key=model_cache_key(KEY_DEPT_ASSIGNMENTS_LAST_UPDATED))
-    def latest_assignment_update(self) -> date:
-        assignment_updated = (
-            db.session.query(func.max(Assignment.last_updated_at))
-            .join(Officer)
-            .filter(Assignment.officer_id == Officer.id)
-            .filter(Officer.department_id == self.id)
-            .scalar()
-        )
-        return assignment_updated.date() if assignment_updated else None
-
-    @cached(cache=DB_CACHE, key=model_cache_key(KEY_DEPT_INCIDENTS_LAST_UPDATED))
-    def latest_incident_update(self) -> date:
-        incident_updated = (
-            db.session.query(func.max(Incident.last_updated_at))
-            .filter(Incident.department_id == self.id)
-            .scalar()
-        )
-        return incident_updated.date() if incident_updated else None
-
-    @cached(cache=DB_CACHE, key=model_cache_key(KEY_DEPT_OFFICERS_LAST_UPDATED))
-    def latest_officer_update(self) -> date:
-        officer_updated = (
-            db.session.query(func.max(Officer.last_updated_at))
-            .filter(Officer.department_id == self.id)
-            .scalar()
-        )
-        return officer_updated.date() if officer_updated else None
+    def latest_assignment_update(self) -> Optional[date]:
+        return self._latest_update("assignments_last_updated_at")
+
+    def latest_incident_update(self) -> Optional[date]:
+        return self._latest_update("incidents_last_updated_at")
+
+    def latest_officer_update(self) -> Optional[date]:
+        return self._latest_update("officers_last_updated_at")
+
+    def _latest_update(self, column: str) -> Optional[date]:
+        last_updated = getattr(self.statistics, column, None)
+        return last_updated.date() if last_updated else None
 
     def remove_database_cache_entries(self, update_types: List[str]) -> None:
         """Remove the Department model key from the cache if it exists."""
         remove_database_cache_entries(self, update_types)
 
 
+class DepartmentStatistics(BaseModel):
+    """Counts and latest update times of the officers, assignments and incidents of
+    each department, so department listings need no aggregate queries.
+
+    Rows are adjusted at commit for the departments whose records were written
+    through the session, see `DepartmentStatisticsTracker`. Writes that bypass the
+    session, such as bulk imports, call `refresh_department_statistics`, which
+    recomputes them.
+
+    `version` is incremented by every commit changing a record shown on the pages
+    of the department, see `DepartmentVersionsTracker`, and versions these pages
+    for conditional requests.
+    """
+
+    __tablename__ = "department_statistics"
+
+    department_id = db.Column(
+        db.Integer,
+        db.ForeignKey(
+            "departments.id",
+            name="department_statistics_department_id_fkey",
+            ondelete="CASCADE",
+        ),
+        primary_key=True,
+    )
+    officer_count = db.Column(db.Integer, nullable=False, server_default="0")
+    assignment_count = db.Column(db.Integer, nullable=False, server_default="0")
+    incident_count = db.Column(db.Integer, nullable=False, server_default="0")
+    officers_last_updated_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    assignments_last_updated_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    incidents_last_updated_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    version = db.Column(db.Integer, nullable=False, server_default="0")
+    changed_at = db.Column(db.DateTime(timezone=True), nullable=True)
+
+    def __repr__(self):
+        return (
+            f"<DepartmentStatistics ID {self.department_id}: "
+            f"{self.officer_count} officers>"
+        )
+
+
 class Job(BaseModel, TrackUpdates):
     __tablename__ = "jobs"
 
@@ -284,9 +352,20 @@ class Officer(BaseModel, TrackUpdates):
         cascade_backrefs=False,
         order_by="Salary.year.desc()",
     )
+    current_assignment = db.relationship(
+        "Assignment",
+        secondary="current_assignments",
+        uselist=False,
+        viewonly=True,
+    )
+    # Set by searches with `with_expression`, see `utils.search`
+    search_rank = query_expression()
 
     __table_args__ = (
         CheckConstraint("gender in ('M', 'F', 'Other')", name="gender_options"),
+        trigram_index("officers", "last_name"),
+        trigram_index("officers", "first_name"),
+        trigram_index("officers", "unique_internal_identifier"),
     )
 
     def full_name(self):
@@ -323,30 +402,21 @@ class Officer(BaseModel, TrackUpdates):
                 return label
 
     def job_title(self):
-        if self.assignments:
-            return max(
-                self.assignments, key=operator.attrgetter("start_date_or_min")
-            ).job.job_title
+        if self.current_assignment:
+            return self.current_assignment.job.job_title
 
     def unit_description(self):
-        if self.assignments:
-            unit = max(
-                self.assignments, key=operator.attrgetter("start_date_or_min")
-            ).unit
+        if self.current_assignment:
+            unit = self.current_assignment.unit
             return unit.description if unit else None
 
     def badge_number(self):
-        if self.assignments:
-            return max(
-                self.assignments, key=operator.attrgetter("start_date_or_min")
-            ).star_no
+        if self.current_assignment:
+            return self.current_assignment.star_no
 
     def currently_on_force(self):
-        if self.assignments:
-            most_recent = max(
-                self.assignments, key=operator.attrgetter("start_date_or_min")
-            )
-            return "Yes" if most_recent.resign_date is None else "No"
+        if self.current_assignment:
+            return "Yes" if self.current_assignment.resign_date is None else "No"
         return "Uncertain"
 
     def __repr__(self):
@@ -441,6 +511,8 @@ class Assignment(BaseModel, TrackUpdates):
     start_date = db.Column(db.Date, index=True, unique=False, nullable=True)
     resign_date = db.Column(db.Date, index=True, unique=False, nullable=True)
 
+    __table_args__ = (trigram_index("assignments", "star_no"),)
+
     def __repr__(self):
         return f"<Assignment: ID {self.officer_id} : {self.star_no}>"
 
@@ -453,6 +525,94 @@ class Assignment(BaseModel, TrackUpdates):
         return self.start_date or date.max
 
 
+class CurrentAssignment(BaseModel):
+    """Projection of each officer's most recent assignment.
+
+    Assignment write paths keep it up to date with `refresh_current_assignments`.
+    """
+
+    __tablename__ = "current_assignments"
+
+    officer_id = db.Column(
+        db.Integer,
+        db.ForeignKey(
+            "officers.id",
+            name="current_assignments_officer_id_fkey",
+            ondelete="CASCADE",
+        ),
+        primary_key=True,
+    )
+    assignment_id = db.Column(
+        db.Integer,
+        db.ForeignKey(
+            "assignments.id",
+            name="current_assignments_assignment_id_fkey",
+            ondelete="CASCADE",
+        ),
+        unique=True,
+        nullable=False,
+    )
+
+    def __repr__(self):
+        return f"<CurrentAssignment: ID {self.officer_id} : {self.assignment_id}>"
+
+
+def refresh_current_assignments(
+    officer_ids: Optional[Iterable[int]] = None, department_id: Optional[int] = None
+) -> None:
+    """Recompute the current assignment of the given officers, the officers of the
+    given department, or every officer when neither is given.
+
+    The current assignment is the one with the latest start date, with unknown start
+    dates sorting first and ties going to the oldest assignment.
+    """
+    db.session.flush()
+
+    officer_filter = None
+    if officer_ids is not None:
+        officer_filter = Officer.id.in_(list(officer_ids))
+    elif department_id is not None:
+        officer_filter = Officer.department_id == department_id
+    officers = select(Officer.id)
+    if officer_filter is not None:
+        officers = officers.where(officer_filter)
+
+    ranked = (
+        select(
+            Assignment.officer_id,
+            Assignment.id.label("assignment_id"),
+            func.row_number()
+            .over(
+                partition_by=Assignment.officer_id,
+                order_by=(Assignment.start_date.desc().nulls_last(), Assignment.id),
+            )
+            .label("position"),
+        )
+        .where(Assignment.officer_id.in_(officers.scalar_subquery()))
+        .subquery()
+    )
+
+    db.session.execute(
+        delete(CurrentAssignment).where(
+            CurrentAssignment.officer_id.in_(officers.scalar_subquery())
+        ),
+        execution_options={"synchronize_session": False},
+    )
+    db.session.execute(
+        insert(CurrentAssignment).from_select(
+            ["officer_id", "assignment_id"],
+            select(ranked.c.officer_id, ranked.c.assignment_id).where(
+                ranked.c.position == 1
+            ),
+        )
+    )
+
+    # Reload the projection on officers already in the session when next accessed
+    for obj in list(db.session.identity_map.values()):
+        if isinstance(obj, Officer):
+            db.session.expire(obj, ["current_assignment"])
+
+
 class Unit(BaseModel, TrackUpdates):
     __tablename__ = "unit_types"
 
@@ -472,6 +632,9 @@ class Unit(BaseModel, TrackUpdates):
         return f"Unit: {self.description}"
 
 
+QUEUED_FACE_CROPS = f"crop_status IN ('{FACE_CROP_PENDING}', '{FACE_CROP_RUNNING}')"
+
+
 class Face(BaseModel, TrackUpdates):
     __tablename__ = "faces"
 
@@ -517,19 +680,52 @@ class Face(BaseModel, TrackUpdates):
     featured = db.Column(
         db.Boolean, nullable=False, default=False, server_default="false"
     )
+    # Set while the face waits to be cropped by `flask ingest-uploads`, until then
+    # the face shows the original image
+    crop_status = db.Column(db.String(10), nullable=True)
+    # When a worker last took the crop, and how many times it was taken
+    crop_claimed_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    crop_attempts = db.Column(db.Integer, nullable=False, default=0, server_default="0")
 
-    __table_args__ = (UniqueConstraint("officer_id", "img_id", name="unique_faces"),)
+    __table_args__ = (
+        UniqueConstraint("officer_id", "img_id", name="unique_faces"),
+        Index(
+            "ix_faces_crop_queue",
+            "original_image_id",
+            "id",
+            postgresql_where=text(QUEUED_FACE_CROPS),
+            sqlite_where=text(QUEUED_FACE_CROPS),
+        ),
+    )
 
     def __repr__(self):
         return f"<Tag ID {self.id}: {self.officer_id} - {self.img_id}>"
 
 
+UNSORTED_IMAGES = "contains_cops IS NULL"
+UNTAGGED_IMAGES = "contains_cops = true AND is_tagged = false"
+
+
 class Image(BaseModel, TrackUpdates):
     __tablename__ = "raw_images"
 
     id = db.Column(db.Integer, primary_key=True)
     filepath = db.Column(db.String(255), unique=False)
-    hash_img = db.Column(db.String(120), unique=False, nullable=True)
+    hash_img = db.Column(db.String(120), unique=False, nullable=True, index=True)
+    # Perceptual hash to find near-duplicates, see `utils.image_hash`
+    phash = db.Column(db.BigInteger, nullable=True)
+    # When its variants were created, if it was large enough to have any
+    variants_built_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    # Image that looked the same when this one was uploaded, for sorters to check
+    near_duplicate_of_id = db.Column(
+        db.Integer,
+        db.ForeignKey(
+            "raw_images.id",
+            name="raw_images_near_duplicate_of_id_fkey",
+            ondelete="SET NULL",
+        ),
+        nullable=True,
+    )
 
     # We might know when the image was taken e.g. through EXIF data
     taken_at = db.Column(
@@ -538,6 +734,8 @@ class Image(BaseModel, TrackUpdates):
     contains_cops = db.Column(db.Boolean, nullable=True)
 
     is_tagged = db.Column(db.Boolean, default=False, unique=False, nullable=True)
+    # Position in the sorting and tagging queues, see `utils.image_queue`
+    random_key = db.Column(db.Float, nullable=False, default=random.random)
 
     department_id = db.Column(
         db.Integer,
@@ -547,10 +745,173 @@ class Image(BaseModel, TrackUpdates):
         "Department", backref=db.backref("raw_images", cascade_backrefs=False)
     )
 
+    # Partial indexes only hold the images still waiting in each queue
+    __table_args__ = (
+        Index(
+            "ix_raw_images_sort_queue",
+            "department_id",
+            "random_key",
+            postgresql_where=text(UNSORTED_IMAGES),
+            sqlite_where=text(UNSORTED_IMAGES),
+        ),
+        Index(
+            "ix_raw_images_tag_queue",
+            "department_id",
+            "random_key",
+            postgresql_where=text(UNTAGGED_IMAGES),
+            sqlite_where=text(UNTAGGED_IMAGES),
+        ),
+        Index(
+            "ix_raw_images_all_tag_queue",
+            "random_key",
+            postgresql_where=text(UNTAGGED_IMAGES),
+            sqlite_where=text(UNTAGGED_IMAGES),
+        ),
+    )
+
+    near_duplicate_of = db.relationship(
+        "Image", remote_side=[id], foreign_keys=[near_duplicate_of_id]
+    )
+    phash_bands = db.relationship(
+        "ImagePhashBand", cascade="all, delete-orphan", passive_deletes=True
+    )
+    variants = db.relationship(
+        "ImageVariant",
+        order_by="ImageVariant.size",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+    )
+
     def __repr__(self):
         return f"<Image ID {self.id}: {self.filepath}>"
 
 
+class ImagePhashBand(BaseModel):
+    """One band of the perceptual hash of an image, indexed to look up images with
+    similar hashes, see `utils.image_hash.find_near_duplicate`.
+    """
+
+    __tablename__ = "image_phash_bands"
+
+    band = db.Column(db.SmallInteger, primary_key=True, autoincrement=False)
+    value = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    image_id = db.Column(
+        db.Integer,
+        db.ForeignKey(
+            "raw_images.id", name="image_phash_bands_image_id_fkey", ondelete="CASCADE"
+        ),
+        primary_key=True,
+    )
+
+    def __repr__(self):
+        return f"<ImagePhashBand {self.image_id} {self.band}: {self.value}>"
+
+
+class ImageVariant(BaseModel):
+    """Downscaled copy of an image, served instead of the original where a smaller
+    one fits, see `utils.general.serve_image_variant`.
+    """
+
+    __tablename__ = "image_variants"
+
+    image_id = db.Column(
+        db.Integer,
+        db.ForeignKey(
+            "raw_images.id", name="image_variants_image_id_fkey", ondelete="CASCADE"
+        ),
+        primary_key=True,
+    )
+    # Longest side of the bounding box the image was shrunk to fit in
+    size = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    filepath = db.Column(db.String(255), nullable=False)
+    width = db.Column(db.Integer, nullable=False)
+    height = db.Column(db.Integer, nullable=False)
+
+    def __repr__(self):
+        return f"<ImageVariant {self.image_id} {self.size}: {self.filepath}>"
+
+
+class UploadJob(BaseModel):
+    """Uploaded image waiting to be processed by `flask ingest-uploads`, see
+    `utils.uploads`. The uploaded bytes are dropped once it has been processed.
+    """
+
+    __tablename__ = "upload_jobs"
+
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    status = db.Column(db.String(10), nullable=False, default=UPLOAD_JOB_PENDING)
+    data = db.Column(db.LargeBinary(), nullable=True)
+    error = db.Column(db.Text(), nullable=True)
+    department_id = db.Column(
+        db.Integer,
+        db.ForeignKey("departments.id", name="upload_jobs_department_id_fkey"),
+    )
+    officer_id = db.Column(
+        db.Integer,
+        db.ForeignKey(
+            "officers.id", name="upload_jobs_officer_id_fkey", ondelete="CASCADE"
+        ),
+        nullable=True,
+    )
+    user_id = db.Column(
+        db.Integer,
+        db.ForeignKey("users.id", name="upload_jobs_user_id_fkey", ondelete="SET NULL"),
+        nullable=True,
+    )
+    image_id = db.Column(
+        db.Integer,
+        db.ForeignKey(
+            "raw_images.id", name="upload_jobs_image_id_fkey", ondelete="SET NULL"
+        ),
+        nullable=True,
+    )
+    created_at = db.Column(
+        db.DateTime(timezone=True), nullable=False, server_default=sql_func.now()
+    )
+    finished_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    # When a worker last took the job, and how many times it was taken
+    claimed_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+
+    __table_args__ = (
+        Index("ix_upload_jobs_status_created_at", "status", "created_at"),
+    )
+
+    def __repr__(self):
+        return f"<UploadJob {self.id}: {self.status}>"
+
+
+class OutgoingEmail(BaseModel):
+    """Email waiting to be sent by `flask send-emails`, see `utils.outbox`. The
+    message is dropped once it has been sent, as it may hold account tokens.
+    """
+
+    __tablename__ = "outgoing_emails"
+
+    id = db.Column(db.Integer, primary_key=True)
+    status = db.Column(db.String(10), nullable=False, default=OUTGOING_EMAIL_PENDING)
+    receiver = db.Column(db.String(255), nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    body = db.Column(db.Text(), nullable=True)
+    html = db.Column(db.Text(), nullable=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text(), nullable=True)
+    created_at = db.Column(
+        db.DateTime(timezone=True), nullable=False, server_default=sql_func.now()
+    )
+    next_attempt_at = db.Column(
+        db.DateTime(timezone=True), nullable=False, server_default=sql_func.now()
+    )
+    sent_at = db.Column(db.DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index("ix_outgoing_emails_status_next_attempt_at", "status", "next_attempt_at"),
+    )
+
+    def __repr__(self):
+        return f"<OutgoingEmail {self.id} to {self.receiver}: {self.status}>"
+
+
 incident_links = db.Table(
     "incident_links",
     db.Column(
@@ -741,6 +1102,408 @@ class Incident(BaseModel, TrackUpdates):
     )
 
 
+def _refresh_department_statistics(
+    session: Session, department_ids: Iterable[int]
+) -> None:
+    # Ids assigned from form or csv data may still be strings
+    department_ids = sorted({int(department_id) for department_id in department_ids})
+    if not department_ids:
+        return
+
+    # Lock the rows first, so the counts below see the records committed by
+    # concurrent refreshes of the same departments
+    existing_ids = set(
+        session.scalars(
+            select(DepartmentStatistics.department_id)
+            .where(DepartmentStatistics.department_id.in_(department_ids))
+            .order_by(DepartmentStatistics.department_id)
+            .with_for_update()
+        )
+    )
+
+    rows = {
+        department_id: {
+            "department_id": department_id,
+            "officer_count": 0,
+            "assignment_count": 0,
+            "incident_count": 0,
+            "officers_last_updated_at": None,
+            "assignments_last_updated_at": None,
+            "incidents_last_updated_at": None,
+        }
+        for department_id in department_ids
+    }
+    aggregates = {
+        "officer": select(
+            Officer.department_id,
+            func.count(Officer.id),
+            func.max(Officer.last_updated_at),
+        ).where(Officer.department_id.in_(department_ids)),
+        "assignment": select(
+            Officer.department_id,
+            func.count(Assignment.id),
+            func.max(Assignment.last_updated_at),
+        )
+        .join(Assignment, Assignment.officer_id == Officer.id)
+        .where(Officer.department_id.in_(department_ids)),
+        "incident": select(
+            Incident.department_id,
+            func.count(Incident.id),
+            func.max(Incident.last_updated_at),
+        ).where(Incident.department_id.in_(department_ids)),
+    }
+    for name, aggregate in aggregates.items():
+        for department_id, count, last_updated_at in session.execute(
+            aggregate.group_by(aggregate.selected_columns[0])
+        ):
+            rows[department_id][f"{name}_count"] = count
+            rows[department_id][f"{name}s_last_updated_at"] = last_updated_at
+
+    new_rows = [row for key, row in rows.items() if key not in existing_ids]
+    updated_rows = [row for key, row in rows.items() if key in existing_ids]
+    if new_rows:
+        session.execute(insert(DepartmentStatistics), new_rows)
+    if updated_rows:
+        session.execute(update(DepartmentStatistics), updated_rows)
+
+    _expire_department_statistics(session, rows)
+
+
+def _expire_department_statistics(
+    session: Session, department_ids: Optional[Iterable[int]]
+) -> None:
+    """Reload the statistics already in the session when next accessed."""
+    if department_ids is not None:
+        department_ids = set(department_ids)
+    for obj in list(session.identity_map.values()):
+        if not isinstance(obj, (Department, DepartmentStatistics)):
+            continue
+        if department_ids is None or inspect(obj).identity[0] in department_ids:
+            session.expire(obj, ["statistics"] if isinstance(obj, Department) else None)
+
+
+def refresh_department_statistics(
+    department_ids: Optional[Iterable[int]] = None,
+) -> None:
+    """Recompute the statistics of the given departments, or of every department
+    when none are given, and mark their pages as changed.
+    """
+    db.session.flush()
+    if department_ids is not None:
+        department_ids = list(department_ids)
+    _refresh_department_statistics(
+        db.session,
+        db.session.scalars(select(Department.id))
+        if department_ids is None
+        else department_ids,
+    )
+    _bump_department_versions(db.session, department_ids)
+
+
+class DepartmentStatisticsChanges(NamedTuple):
+    """Changes to the statistics of departments made by a transaction."""
+
+    # Counter increments and candidate latest update times by department, and of
+    # the assignment columns by officer until their departments are looked up
+    departments: Dict[int, Dict[str, Any]]
+    officers: Dict[int, Dict[str, Any]]
+    # Departments whose statistics are recomputed instead, e.g. when an officer
+    # moves with all of their assignments
+    refresh: Set[int]
+
+
+# Counter and latest update time columns of the records of each model
+DEPARTMENT_STATISTICS_COLUMNS = {
+    Officer: ("officer_count", "officers_last_updated_at"),
+    Assignment: ("assignment_count", "assignments_last_updated_at"),
+    Incident: ("incident_count", "incidents_last_updated_at"),
+}
+
+
+def _add_statistics_change(
+    changes: Dict[int, Dict[str, Any]], key, obj, delta: int
+) -> None:
+    if key is None:
+        return
+    count_column, updated_column = DEPARTMENT_STATISTICS_COLUMNS[type(obj)]
+    row = changes.setdefault(int(key), {})
+    row[count_column] = row.get(count_column, 0) + delta
+    if delta < 0:
+        return
+    # New records get their update time from the database, which is the time the
+    # transaction started, and updated records from `TrackUpdates`
+    updated_at = inspect(obj).dict.get("last_updated_at")
+    if updated_at is not None and updated_at.tzinfo is None:
+        updated_at = updated_at.replace(tzinfo=timezone.utc)
+    times = row.setdefault(updated_column, set())
+    latest = max((value for value in times if value is not None), default=None)
+    if updated_at is None or latest is None or updated_at > latest:
+        times.discard(latest)
+        times.add(updated_at)
+
+
+def _latest_time(column, times: Set[Optional[datetime]]):
+    """SQL expression for the latest of the column and the given times, where None
+    is the time the transaction started.
+    """
+    value = column
+    for updated_at in times:
+        if updated_at is None:
+            updated_at = sql_func.now()
+        value = case(
+            (or_(value.is_(None), value < updated_at), updated_at), else_=value
+        )
+    return value
+
+
+class DepartmentStatisticsTracker(SessionTracker):
+    """Adjusts the statistics of the departments whose officers, assignments or
+    incidents were written when the transaction commits, by the number of records
+    added or removed and their update times.
+    """
+
+    name = "department_statistics"
+
+    def new_pending(self) -> DepartmentStatisticsChanges:
+        return DepartmentStatisticsChanges({}, {}, set())
+
+    def before_flush(
+        self, session: Session, pending: DepartmentStatisticsChanges
+    ) -> None:
+        # Load the department or officer of records deleted without being read, to
+        # take them off its counters
+        for obj in session.deleted:
+            if isinstance(obj, (Officer, Incident)):
+                inspect(obj).attrs.department_id.load_history()
+            elif isinstance(obj, Assignment):
+                inspect(obj).attrs.officer_id.load_history()
+
+    def after_flush(
+        self, session: Session, pending: DepartmentStatisticsChanges
+    ) -> None:
+        departments, officers, refresh = pending
+        refresh.update(obj.id for obj in session.new if isinstance(obj, Department))
+        for obj in chain(session.new, session.dirty, session.deleted):
+            if isinstance(obj, Officer):
+                history = inspect(obj).attrs.department_id.history
+                if obj in session.deleted or history.deleted:
+                    # Their assignments leave the department with them
+                    refresh.update(history.sum())
+                    continue
+                changes, keys = departments, history
+            elif isinstance(obj, Incident):
+                changes, keys = departments, inspect(obj).attrs.department_id.history
+            elif isinstance(obj, Assignment):
+                changes, keys = officers, inspect(obj).attrs.officer_id.history
+            else:
+                continue
+            if obj in session.deleted:
+                for key in chain(keys.unchanged, keys.deleted):
+                    _add_statistics_change(changes, key, obj, -1)
+                continue
+            for key in keys.added:
+                _add_statistics_change(changes, key, obj, 1)
+            for key in keys.deleted:
+                _add_statistics_change(changes, key, obj, -1)
+            if obj not in session.new:
+                # Records updated without moving
+                for key in keys.unchanged:
+                    _add_statistics_change(changes, key, obj, 0)
+
+    def commit(self, session: Session, pending: DepartmentStatisticsChanges) -> None:
+        departments, officers, refresh = pending
+        if officers:
+            officer_departments = session.execute(
+                select(Officer.id, Officer.department_id).where(
+                    Officer.id.in_(list(officers))
+                )
+            )
+            for officer_id, department_id in officer_departments:
+                if department_id is None:
+                    continue
+                row = departments.setdefault(department_id, {})
+                for column_name, change in officers[officer_id].items():
+                    if isinstance(change, int):
+                        row[column_name] = row.get(column_name, 0) + change
+                    else:
+                        row.setdefault(column_name, set()).update(change)
+        refresh = {int(department_id) for department_id in refresh - {None}}
+        departments = {
+            department_id: row
+            for department_id, row in departments.items()
+            if department_id not in refresh and any(row.values())
+        }
+
+        # Departments without statistics yet get them from a full count
+        existing = set(
+            session.scalars(
+                select(DepartmentStatistics.department_id).where(
+                    DepartmentStatistics.department_id.in_(list(departments))
+                )
+            )
+        )
+        refresh.update(set(departments) - existing)
+        for department_id in sorted(existing):
+            values: Dict[Any, Any] = {}
+            for column_name, change in departments[department_id].items():
+                column = getattr(DepartmentStatistics, column_name)
+                if isinstance(change, int):
+                    values[column] = column + change
+                else:
+                    values[column] = _latest_time(column, change)
+            session.execute(
+                update(DepartmentStatistics)
+                .where(DepartmentStatistics.department_id == department_id)
+                .values(values),
+                execution_options={"synchronize_session": False},
+            )
+        _refresh_department_statistics(session, refresh)
+        _expire_department_statistics(session, existing)
+
+
+register_session_tracker(DepartmentStatisticsTracker())
+
+
+# Records which can be shown on the pages of officers and incidents of any
+# department. New ones only show up once added to an officer or incident, which
+# are tracked themselves.
+SHARED_PAGE_MODELS = (Link, Location, LicensePlate)
+
+
+def get_department_version(department_id: int) -> Optional[int]:
+    """The `DepartmentStatistics.version` of the department, or None if it has no
+    statistics yet.
+    """
+    return db.session.scalar(
+        select(DepartmentStatistics.version).where(
+            DepartmentStatistics.department_id == department_id
+        )
+    )
+
+
+def _bump_department_versions(
+    session: Session, department_ids: Optional[Iterable[int]]
+) -> None:
+    """Increment the version of the given departments, or of every department when
+    none are given.
+    """
+    statement = update(DepartmentStatistics).values(
+        version=DepartmentStatistics.version + 1,
+        changed_at=datetime.now(timezone.utc),
+    )
+    if department_ids is not None:
+        # Ids assigned from form or csv data may still be strings
+        department_ids = sorted(
+            {int(department_id) for department_id in department_ids}
+        )
+        if not department_ids:
+            return
+        statement = statement.where(
+            DepartmentStatistics.department_id.in_(department_ids)
+        )
+    session.execute(statement, execution_options={"synchronize_session": False})
+    _expire_department_statistics(session, department_ids)
+
+
+def _identities(objs: Iterable[BaseModel]) -> Iterable[int]:
+    return (inspect(obj).identity[0] for obj in objs if inspect(obj).identity)
+
+
+class DepartmentVersionsTracker(SessionTracker):
+    """Increments the version of the departments whose pages show records written
+    in the transaction when it commits.
+    """
+
+    name = "department_versions"
+
+    def new_pending(self):
+        # Departments, officers, incidents and shared records written
+        return set(), set(), set(), set()
+
+    def after_flush(self, session: Session, pending) -> None:
+        department_ids, officer_ids, incident_ids, shared_keys = pending
+        for obj in chain(session.new, session.dirty, session.deleted):
+            if isinstance(obj, Department):
+                department_ids.update(_identities([obj]))
+            elif isinstance(obj, (Officer, Incident, Job, Unit)):
+                department_ids.update(inspect(obj).attrs.department_id.history.sum())
+            if isinstance(obj, (Assignment, Description, Face, Note, Salary)):
+                officer_ids.update(inspect(obj).attrs.officer_id.history.sum())
+            elif isinstance(obj, Officer):
+                # Officers are listed on the pages of their incidents
+                officer_ids.update(_identities([obj]))
+            elif isinstance(obj, Incident):
+                # Incidents are listed on the profiles of their officers
+                incident_ids.update(_identities([obj]))
+                officer_ids.update(
+                    _identities(inspect(obj).attrs.officers.history.sum())
+                )
+            elif isinstance(obj, SHARED_PAGE_MODELS) and (
+                obj in session.deleted
+                or session.is_modified(obj, include_collections=False)
+            ):
+                shared_keys.add(inspect(obj).key)
+
+    def commit(self, session: Session, pending) -> None:
+        department_ids, officer_ids, incident_ids, shared_keys = pending
+        if shared_keys:
+            _bump_department_versions(session, None)
+            return
+        if officer_ids:
+            department_ids.update(
+                session.scalars(
+                    select(Officer.department_id)
+                    .where(Officer.id.in_(officer_ids))
+                    .distinct()
+                )
+            )
+            department_ids.update(
+                session.scalars(
+                    select(Incident.department_id)
+                    .join(officer_incidents)
+                    .where(officer_incidents.c.officer_id.in_(officer_ids))
+                    .distinct()
+                )
+            )
+        if incident_ids:
+            department_ids.update(
+                session.scalars(
+                    select(Officer.department_id)
+                    .join(officer_incidents)
+                    .where(officer_incidents.c.incident_id.in_(incident_ids))
+                    .distinct()
+                )
+            )
+        department_ids.discard(None)
+        _bump_department_versions(session, department_ids)
+
+
+register_session_tracker(DepartmentVersionsTracker())
+
+
+class SitemapShard(BaseModel):
+    """Prebuilt sitemap file listing the pages of up to `SITEMAP_SHARD_SIZE` rows of
+    one table, see `utils.sitemaps`.
+    """
+
+    __tablename__ = "sitemap_shards"
+
+    source = db.Column(db.String(50), primary_key=True)
+    number = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    url_count = db.Column(db.Integer, nullable=False)
+    lastmod = db.Column(db.DateTime(timezone=True), nullable=True)
+    content = db.Column(db.Text(), nullable=False)
+    built_at = db.Column(
+        db.DateTime(timezone=True),
+        nullable=False,
+        server_default=sql_func.now(),
+        onupdate=datetime.utcnow,
+    )
+
+    def __repr__(self):
+        return f"<SitemapShard {self.source} {self.number}: {self.url_count} URLs>"
+
+
 class User(UserMixin, BaseModel):
     __tablename__ = "users"
     id = db.Column(db.Integer, primary_key=True)
@@ -775,6 +1538,7 @@ class User(UserMixin, BaseModel):
         db.Integer, db.ForeignKey("departments.id", name="users_dept_pref_fkey")
     )
     dept_pref_rel = db.relationship("Department", foreign_keys=[dept_pref])
+    contributions = db.relationship("UserContributions", uselist=False, viewonly=True)
 
     # creator backlinks
     classifications = db.relationship(
@@ -931,3 +1695,206 @@ class User(UserMixin, BaseModel):
 
     def __repr__(self):
         return f"<User {self.username!r}>"
+
+
+class UserContributions(BaseModel):
+    """Number of images and faces each user created, for the leaderboard.
+
+    Counters are adjusted at commit for the images and faces created, deleted or
+    reassigned through the session, see `UserContributionsTracker`. Writes that
+    bypass the session, such as cascading deletes, are corrected by
+    `reconcile_user_contributions`.
+    """
+
+    __tablename__ = "user_contributions"
+
+    user_id = db.Column(
+        db.Integer,
+        db.ForeignKey(
+            "users.id", name="user_contributions_user_id_fkey", ondelete="CASCADE"
+        ),
+        primary_key=True,
+    )
+    image_count = db.Column(db.Integer, nullable=False, server_default="0")
+    face_count = db.Column(db.Integer, nullable=False, server_default="0")
+
+    # Serve the top contributors by scanning the indexes backwards
+    __table_args__ = (
+        Index("ix_user_contributions_image_count", "image_count", "user_id"),
+        Index("ix_user_contributions_face_count", "face_count", "user_id"),
+    )
+
+    def __repr__(self):
+        return (
+            f"<UserContributions ID {self.user_id}: "
+            f"{self.image_count} images, {self.face_count} faces>"
+        )
+
+
+USER_CONTRIBUTION_COUNTERS: Dict[Any, str] = {Image: "image_count", Face: "face_count"}
+
+
+def _count_user_contributions(
+    session: Session, user_ids: Optional[Iterable[int]] = None
+) -> dict:
+    counts: Dict[int, Dict[str, int]] = {}
+    for model, counter in USER_CONTRIBUTION_COUNTERS.items():
+        query = select(model.created_by, func.count()).where(
+            model.created_by.is_not(None)
+        )
+        if user_ids is not None:
+            query = query.where(model.created_by.in_(user_ids))
+        for user_id, count in session.execute(query.group_by(model.created_by)):
+            counts.setdefault(user_id, {"image_count": 0, "face_count": 0})
+            counts[user_id][counter] = count
+    return counts
+
+
+def reconcile_user_contributions(user_ids: Optional[Iterable[int]] = None) -> int:
+    """Recount the images and faces of the given users, or of every user when none
+    are given, and correct the counters that drifted. Returns how many users had
+    their counters corrected.
+    """
+    db.session.flush()
+    if user_ids is not None:
+        user_ids = list(user_ids)
+    return _reconcile_user_contributions(db.session, user_ids)
+
+
+def _reconcile_user_contributions(
+    session: Session, user_ids: Optional[List[int]]
+) -> int:
+    users = select(User.id)
+    if user_ids is not None:
+        users = users.where(User.id.in_(user_ids))
+    counts = _count_user_contributions(session, user_ids)
+    stored = {
+        contributions.user_id: contributions
+        for contributions in session.execute(
+            select(UserContributions).where(UserContributions.user_id.in_(users))
+        ).scalars()
+    }
+
+    new_rows, updated_rows = [], []
+    for user_id in session.scalars(users):
+        row = {"user_id": user_id, "image_count": 0, "face_count": 0}
+        row.update(counts.get(user_id, {}))
+        contributions = stored.get(user_id)
+        if contributions is None:
+            new_rows.append(row)
+        elif (contributions.image_count, contributions.face_count) != (
+            row["image_count"],
+            row["face_count"],
+        ):
+            updated_rows.append(row)
+
+    if new_rows:
+        session.execute(insert(UserContributions), new_rows)
+    if updated_rows:
+        session.execute(update(UserContributions), updated_rows)
+    # Reload the counters already in the session when next accessed
+    for obj in list(session.identity_map.values()):
+        if not isinstance(obj, User):
+            continue
+        if user_ids is None or inspect(obj).identity[0] in user_ids:
+            session.expire(obj, ["contributions"])
+    for contributions in stored.values():
+        session.expire(contributions)
+    return len(new_rows) + len(updated_rows)
+
+
+def _add_user_contributions(
+    deltas: dict, counter: str, user_ids: Iterable[Optional[int]], delta: int
+) -> None:
+    for user_id in user_ids:
+        if user_id is not None:
+            user_deltas = deltas.setdefault(int(user_id), {})
+            user_deltas[counter] = user_deltas.get(counter, 0) + delta
+
+
+def _upsert(session: Session, model):
+    """INSERT statement of the session's database taking ON CONFLICT clauses."""
+    if session.get_bind().dialect.name == "postgresql":
+        return postgresql.insert(model)
+    return sqlite.insert(model)
+
+
+def _created_by_changed(obj) -> bool:
+    return inspect(obj).attrs.created_by.history.has_changes()
+
+
+class UserContributionsTracker(SessionTracker):
+    """Adjusts the counters of the users whose images and faces were created,
+    deleted or reassigned in the transaction when it commits.
+    """
+
+    name = "user_contributions"
+
+    def new_pending(self):
+        # Counter deltas by user
+        return {}
+
+    def before_flush(self, session: Session, pending) -> None:
+        """Take back the images and faces being deleted or reassigned from the
+        users who created them.
+        """
+        for model, counter in USER_CONTRIBUTION_COUNTERS.items():
+            # Read the previous creators, which the session only has if they were
+            # loaded
+            ids = [
+                inspect(obj).identity[0]
+                for obj in chain(session.deleted, session.dirty)
+                if isinstance(obj, model)
+                and (obj in session.deleted or _created_by_changed(obj))
+            ]
+            if ids:
+                _add_user_contributions(
+                    pending,
+                    counter,
+                    session.scalars(select(model.created_by).where(model.id.in_(ids))),
+                    -1,
+                )
+
+    def after_flush(self, session: Session, pending) -> None:
+        """Credit the images and faces created or reassigned to their creators."""
+        for model, counter in USER_CONTRIBUTION_COUNTERS.items():
+            _add_user_contributions(
+                pending,
+                counter,
+                [
+                    obj.created_by
+                    for obj in chain(session.new, session.dirty)
+                    if isinstance(obj, model)
+                    and (obj in session.new or _created_by_changed(obj))
+                ],
+                1,
+            )
+
+    def commit(self, session: Session, pending) -> None:
+        rows = [
+            {"user_id": user_id, "image_count": 0, "face_count": 0, **user_deltas}
+            for user_id, user_deltas in pending.items()
+            if any(user_deltas.values())
+        ]
+        if not rows:
+            return
+
+        # Users without counters yet, e.g. new volunteers, start from the deltas.
+        # Transactions crediting them at the same time both add to the one row.
+        statement = _upsert(session, UserContributions)
+        session.execute(
+            statement.on_conflict_do_update(
+                index_elements=[UserContributions.user_id],
+                set_={
+                    counter: (
+                        getattr(UserContributions, counter)
+                        + getattr(statement.excluded, counter)
+                    )
+                    for counter in USER_CONTRIBUTION_COUNTERS.values()
+                },
+            ),
+            rows,
+        )
+
+
+register_session_tracker(UserContributionsTracker())
@@ -1,13 +1,273 @@
-from typing import Any, List
+import os
+import pickle
+import sqlite3
+import sys
+import threading
+import time
+from abc import abstractmethod
+from collections.abc import MutableMapping
+from typing import Any, Callable, Hashable, Iterator, List, Optional
 
 from cachetools import TTLCache
 from cachetools.keys import hashkey
+from flask import Flask
 from flask_sqlalchemy.model import Model
 
-from OpenOversight.app.utils.constants import HOUR
+from OpenOversight.app.utils.constants import (
+    HOUR,
+    KEY_DB_CACHE_BACKEND,
+    KEY_DB_CACHE_PATH,
+    KEY_DB_CACHE_SQLITE,
+    MEGABYTE,
+)
 
 
-DB_CACHE = TTLCache(maxsize=1024, ttl=24 * HOUR)
+def get_cache_entry_size(value: Any) -> int:
+    """Charge cache entries by their size in bytes rather than as single items."""
+    if isinstance(value, tuple):
+        return sum(map(sys.getsizeof, value))
+    return sys.getsizeof(value)
+
+
+class CacheBackend(MutableMapping):
+    """Base class to define where database cache entries are stored.
+
+    Backends are mutable mappings so they can be used directly with the
+    `cachetools.cached` decorator. `maxsize` is the total size of the entries as
+    measured by `getsizeof`.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        getsizeof: Callable[[Any], int] = get_cache_entry_size,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.getsizeof = getsizeof
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Remove every entry from the cache."""
+
+
+class InProcessCacheBackend(CacheBackend):
+    """Stores entries in a `TTLCache` local to the current worker process."""
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        getsizeof: Callable[[Any], int] = get_cache_entry_size,
+    ):
+        super().__init__(maxsize, ttl, getsizeof)
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl, getsizeof=getsizeof)
+
+    def __getitem__(self, key: Hashable) -> Any:
+        return self._cache[key]
+
+    def __setitem__(self, key: Hashable, value: Any) -> None:
+        self._cache[key] = value
+
+    def __delitem__(self, key: Hashable) -> None:
+        del self._cache[key]
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._cache
+
+    def __iter__(self) -> Iterator[Hashable]:
+        return iter(self._cache)
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """Stores entries in a SQLite file shared by every worker on the host.
+
+    Writes and invalidations are visible to all processes opening the same
+    file, so removing an entry in one gunicorn worker removes it for all of
+    them. Keys and values are pickled, and entries are charged by the size of
+    their pickled value.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        maxsize: int,
+        ttl: float,
+        getsizeof: Callable[[Any], int] = get_cache_entry_size,
+    ):
+        super().__init__(maxsize, ttl, getsizeof)
+        self.path = path
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS db_cache ("
+                "key BLOB PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, "
+                "expires_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS db_cache_expires_at "
+                "ON db_cache (expires_at)"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        # Connections cannot be shared across threads or forked processes
+        pid = os.getpid()
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != pid:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = pid
+        return conn
+
+    @staticmethod
+    def _dump_key(key: Hashable) -> bytes:
+        # `hashkey` returns a tuple subclass, store it as a plain tuple
+        if isinstance(key, tuple):
+            key = tuple(key)
+        return pickle.dumps(key, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def __getitem__(self, key: Hashable) -> Any:
+        row = (
+            self._connection()
+            .execute(
+                "SELECT value FROM db_cache WHERE key = ? AND expires_at > ?",
+                (self._dump_key(key), time.time()),
+            )
+            .fetchone()
+        )
+        if row is None:
+            raise KeyError(key)
+        return pickle.loads(row[0])
+
+    def __setitem__(self, key: Hashable, value: Any) -> None:
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.maxsize:
+            raise ValueError("value too large")
+
+        now = time.time()
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "INSERT OR REPLACE INTO db_cache (key, value, size, expires_at) "
+                "VALUES (?, ?, ?, ?)",
+                (self._dump_key(key), data, len(data), now + self.ttl),
+            )
+            conn.execute("DELETE FROM db_cache WHERE expires_at <= ?", (now,))
+            # Evict the entries closest to expiring once over capacity
+            conn.execute(
+                "DELETE FROM db_cache WHERE key IN ("
+                "SELECT key FROM ("
+                "SELECT key, SUM(size) OVER (ORDER BY expires_at DESC) AS total "
+                "FROM db_cache) WHERE total > ?)",
+                (self.maxsize,),
+            )
+
+    def __delitem__(self, key: Hashable) -> None:
+        cursor = self._connection().execute(
+            "DELETE FROM db_cache WHERE key = ?", (self._dump_key(key),)
+        )
+        if cursor.rowcount == 0:
+            raise KeyError(key)
+
+    def __contains__(self, key: object) -> bool:
+        row = (
+            self._connection()
+            .execute(
+                "SELECT 1 FROM db_cache WHERE key = ? AND expires_at > ?",
+                (self._dump_key(key), time.time()),  # type: ignore[arg-type]
+            )
+            .fetchone()
+        )
+        return row is not None
+
+    def __iter__(self) -> Iterator[Hashable]:
+        rows = (
+            self._connection()
+            .execute("SELECT key FROM db_cache WHERE expires_at > ?", (time.time(),))
+            .fetchall()
+        )
+        return (pickle.loads(row[0]) for row in rows)
+
+    def __len__(self) -> int:
+        return (
+            self._connection()
+            .execute(
+                "SELECT COUNT(*) FROM db_cache WHERE expires_at > ?", (time.time(),)
+            )
+            .fetchone()[0]
+        )
+
+    def clear(self) -> None:
+        self._connection().execute("DELETE FROM db_cache")
+
+
+class DatabaseCache(MutableMapping):
+    """Proxy for the configured `CacheBackend`.
+
+    `DB_CACHE` is bound at import time by the `cached` decorators on the models,
+    so the backend it delegates to is swapped in place by `init_app`.
+    """
+
+    def __init__(self, backend: CacheBackend):
+        self.backend = backend
+
+    @property
+    def maxsize(self) -> int:
+        """Size of the largest entry the cache can hold."""
+        return self.backend.maxsize
+
+    def init_app(self, app: Flask) -> None:
+        self.backend = create_cache_backend(
+            app.config.get(KEY_DB_CACHE_BACKEND),
+            app.config.get(KEY_DB_CACHE_PATH),
+            self.backend.maxsize,
+            self.backend.ttl,
+        )
+
+    def __getitem__(self, key: Hashable) -> Any:
+        return self.backend[key]
+
+    def __setitem__(self, key: Hashable, value: Any) -> None:
+        self.backend[key] = value
+
+    def __delitem__(self, key: Hashable) -> None:
+        del self.backend[key]
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.backend
+
+    def __iter__(self) -> Iterator[Hashable]:
+        return iter(self.backend)
+
+    def __len__(self) -> int:
+        return len(self.backend)
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+
+def create_cache_backend(
+    name: Optional[str], path: Optional[str], maxsize: int, ttl: float
+) -> CacheBackend:
+    """Build the cache backend with the given name, defaulting to in-process."""
+    if name == KEY_DB_CACHE_SQLITE:
+        if not path:
+            raise ValueError(f"{KEY_DB_CACHE_PATH} is required for the sqlite cache")
+        return SQLiteCacheBackend(path, maxsize=maxsize, ttl=ttl)
+    return InProcessCacheBackend(maxsize=maxsize, ttl=ttl)
+
+
+DB_CACHE = DatabaseCache(InProcessCacheBackend(maxsize=256 * MEGABYTE, ttl=24 * HOUR))
 
 
 def get_model_cache_key(model: Model, update_type: str):
@@ -36,27 +296,31 @@ def model_cache_key(update_type: str):
 def get_database_cache_entry(model: Model, update_type: str) -> Any:
     """Get db.Model entry for key in the cache."""
     key = get_model_cache_key(model, update_type)
-    if key in DB_CACHE.keys():
-        return DB_CACHE.get(key)
-    else:
-        return None
+    return DB_CACHE.get(key)
 
 
 def has_database_cache_entry(model: Model, update_type: str) -> bool:
     """db.Model key exists in cache."""
     key = get_model_cache_key(model, update_type)
-    return key in DB_CACHE.keys()
+    return key in DB_CACHE
 
 
 def put_database_cache_entry(model: Model, update_type: str, data: Any) -> None:
-    """Put data in cache using the constructed key."""
+    """Put data in cache using the constructed key, skipping values too large to
+    fit in the cache.
+    """
     key = get_model_cache_key(model, update_type)
-    DB_CACHE[key] = data
+    try:
+        DB_CACHE[key] = data
+    except ValueError:
+        pass
 
 
 def remove_database_cache_entries(model: Model, update_types: List[str]) -> None:
     """Remove db.Model key from cache if it exists."""
     for update_type in update_types:
         key = get_model_cache_key(model, update_type)
-        if key in DB_CACHE.keys():
+        try:
             del DB_CACHE[key]
+        except KeyError:
+            pass
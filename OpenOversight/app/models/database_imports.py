@@ -1,6 +1,6 @@
 from datetime import date, time
 from decimal import Decimal
-from typing import Any, Dict, Optional, Sequence, Tuple, Union
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple, Union
 
 import dateutil.parser
 
@@ -16,6 +16,7 @@ from OpenOversight.app.models.database import (
     User,
     db,
 )
+from OpenOversight.app.models.users import get_user_snapshot
 from OpenOversight.app.utils.choices import (
     GENDER_CHOICES,
     LINK_CHOICES,
@@ -73,22 +74,57 @@ def parse_str(value: Optional[str], default: Optional[str] = "") -> Optional[str
     return value.strip() or default
 
 
+OFFICER_FIELD_PARSERS: Dict[str, Callable[[Any], Any]] = {
+    "department_id": int,
+    "last_name": parse_str,
+    "first_name": parse_str,
+    "middle_initial": parse_str,
+    "suffix": lambda value: validate_choice(value, SUFFIX_CHOICES),
+    "race": lambda value: validate_choice(value, RACE_CHOICES),
+    "gender": lambda value: validate_choice(value, GENDER_CHOICES),
+    "employment_date": parse_date,
+    "birth_year": parse_int,
+    "unique_internal_identifier": lambda value: parse_str(value, None),
+}
+
+ASSIGNMENT_FIELD_PARSERS: Dict[str, Callable[[Any], Any]] = {
+    "officer_id": int,
+    "star_no": lambda value: parse_str(value, None),
+    "job_id": int,
+    "unit_id": parse_int,
+    "start_date": parse_date,
+    "resign_date": parse_date,
+}
+
+SALARY_FIELD_PARSERS: Dict[str, Callable[[Any], Any]] = {
+    "officer_id": int,
+    "salary": Decimal,
+    "overtime_pay": parse_decimal,
+    "year": int,
+    "is_fiscal_year": parse_bool,
+}
+
+
+def values_from_dict(
+    data: Dict[str, Any],
+    field_parsers: Dict[str, Callable[[Any], Any]],
+    only_given: bool = False,
+) -> Dict[str, Any]:
+    """Parse the column values in a csv row. Missing fields are parsed as
+    `None` unless `only_given` is set, in which case they are left out.
+    """
+    return {
+        field: parse(data.get(field))
+        for field, parse in field_parsers.items()
+        if not only_given or field in data
+    }
+
+
 def create_officer_from_dict(data: Dict[str, Any], force_id: bool = False) -> Officer:
     admin_user = User.query.filter_by(is_administrator=True).first()
 
     officer = Officer(
-        department_id=int(data["department_id"]),
-        last_name=parse_str(data.get("last_name", "")),
-        first_name=parse_str(data.get("first_name", "")),
-        middle_initial=parse_str(data.get("middle_initial", "")),
-        suffix=validate_choice(data.get("suffix", ""), SUFFIX_CHOICES),
-        race=validate_choice(data.get("race"), RACE_CHOICES),
-        gender=validate_choice(data.get("gender"), GENDER_CHOICES),
-        employment_date=parse_date(data.get("employment_date")),
-        birth_year=parse_int(data.get("birth_year")),
-        unique_internal_identifier=parse_str(
-            data.get("unique_internal_identifier"), None
-        ),
+        **values_from_dict(data, OFFICER_FIELD_PARSERS),
         created_by=admin_user.id,
         last_updated_by=admin_user.id,
     )
@@ -134,12 +170,7 @@ def create_assignment_from_dict(
     admin_user = User.query.filter_by(is_administrator=True).first()
 
     assignment = Assignment(
-        officer_id=int(data["officer_id"]),
-        star_no=parse_str(data.get("star_no"), None),
-        job_id=int(data["job_id"]),
-        unit_id=parse_int(data.get("unit_id")),
-        start_date=parse_date(data.get("start_date")),
-        resign_date=parse_date(data.get("resign_date")),
+        **values_from_dict(data, ASSIGNMENT_FIELD_PARSERS),
         created_by=admin_user.id,
         last_updated_by=admin_user.id,
     )
@@ -175,11 +206,7 @@ def create_salary_from_dict(data: Dict[str, Any], force_id: bool = False) -> Sal
     admin_user = User.query.filter_by(is_administrator=True).first()
 
     salary = Salary(
-        officer_id=int(data["officer_id"]),
-        salary=Decimal(data["salary"]),
-        overtime_pay=parse_decimal(data.get("overtime_pay")),
-        year=int(data["year"]),
-        is_fiscal_year=parse_bool(data.get("is_fiscal_year")),
+        **values_from_dict(data, SALARY_FIELD_PARSERS),
         created_by=admin_user.id,
         last_updated_by=admin_user.id,
     )
@@ -353,4 +380,4 @@ def load_user(token):
     # Identify user using alternative token so their sessions are
     # automatically invalidated when they update their email or password.
     # https://flask-login.readthedocs.io/en/latest/#alternative-tokens
-    return User.query.filter_by(_uuid=token).one_or_none()
+    return get_user_snapshot(token)
@@ -0,0 +1,101 @@
+"""Bookkeeping done once per transaction for the records written through a session.
+
+Each `SessionTracker` collects what the flushes of a transaction wrote into its
+pending state, and applies it when the transaction commits. One set of session
+listeners runs every tracker, so a commit flushes once before the trackers apply
+their changes, and the pending state of all trackers is dropped together when the
+transaction ends.
+"""
+
+from typing import Any, Dict, List
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+SESSION_TRACKERS_KEY = "session_trackers"
+
+
+class SessionTracker:
+    """Collects the changes of a transaction, see `register_session_tracker`."""
+
+    name: str = ""
+    # Whether `commit` runs once the transaction is committed, e.g. to drop cache
+    # entries, rather than in the transaction before it commits
+    after_commit: bool = False
+
+    def new_pending(self) -> Any:
+        """The empty pending state of a transaction."""
+        return set()
+
+    def before_flush(self, session: Session, pending: Any) -> None:
+        """Collect changes from the objects about to be flushed."""
+
+    def after_flush(self, session: Session, pending: Any) -> None:
+        """Collect changes from the objects just flushed, whose attribute history
+        is still that of before the flush.
+        """
+
+    def commit(self, session: Session, pending: Any) -> None:
+        """Apply the changes collected during the transaction."""
+
+
+SESSION_TRACKERS: List[SessionTracker] = []
+
+
+def register_session_tracker(tracker: SessionTracker) -> SessionTracker:
+    SESSION_TRACKERS.append(tracker)
+    return tracker
+
+
+def get_pending(session: Session, tracker: SessionTracker) -> Any:
+    """The changes collected by the tracker in the current transaction so far, or
+    None if there are none.
+    """
+    return session.info.get(SESSION_TRACKERS_KEY, {}).get(tracker.name)
+
+
+def _pending(session: Session, tracker: SessionTracker) -> Any:
+    states: Dict[str, Any] = session.info.setdefault(SESSION_TRACKERS_KEY, {})
+    if tracker.name not in states:
+        states[tracker.name] = tracker.new_pending()
+    return states[tracker.name]
+
+
+@event.listens_for(Session, "before_flush")
+def _before_flush(session: Session, flush_context, instances) -> None:
+    for tracker in SESSION_TRACKERS:
+        tracker.before_flush(session, _pending(session, tracker))
+
+
+@event.listens_for(Session, "after_flush")
+def _after_flush(session: Session, flush_context) -> None:
+    for tracker in SESSION_TRACKERS:
+        tracker.after_flush(session, _pending(session, tracker))
+
+
+@event.listens_for(Session, "before_commit")
+def _before_commit(session: Session) -> None:
+    session.flush()
+    states = session.info.get(SESSION_TRACKERS_KEY, {})
+    for tracker in SESSION_TRACKERS:
+        if tracker.after_commit:
+            continue
+        pending = states.pop(tracker.name, None)
+        if pending is not None:
+            tracker.commit(session, pending)
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session: Session) -> None:
+    states = session.info.pop(SESSION_TRACKERS_KEY, {})
+    for tracker in SESSION_TRACKERS:
+        pending = states.get(tracker.name)
+        if tracker.after_commit and pending is not None:
+            tracker.commit(session, pending)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _discard_pending(session: Session, transaction) -> None:
+    if transaction.parent is None:
+        session.info.pop(SESSION_TRACKERS_KEY, None)
@@ -1,6 +1,23 @@
-from flask_login import AnonymousUserMixin
+import time
+from itertools import chain
+from typing import Any, Optional
 
-from OpenOversight.app.models.database import Department
+from cachetools.keys import hashkey
+from flask_login import AnonymousUserMixin, UserMixin
+from sqlalchemy import inspect, select
+from sqlalchemy.orm import Session
+
+from OpenOversight.app.models.database import Department, User, db
+from OpenOversight.app.models.database_cache import DB_CACHE
+from OpenOversight.app.models.session_tracking import (
+    SessionTracker,
+    register_session_tracker,
+)
+from OpenOversight.app.utils.constants import KEY_USER_SNAPSHOT, USER_SNAPSHOT_TTL
+
+
+# Never copied out of the users table
+USER_SNAPSHOT_EXCLUDED_COLUMNS = {"password_hash"}
 
 
 class AnonymousUser(AnonymousUserMixin):
@@ -8,3 +25,130 @@ class AnonymousUser(AnonymousUserMixin):
 
     def is_admin_or_coordinator(self, department: Department) -> bool:
         return False
+
+
+class UserSnapshot(UserMixin):
+    """Read-only copy of the columns of a `User`, cached to authenticate requests
+    without querying the users table, see `load_user`.
+
+    Other attributes and methods are read from the `User` row, loaded on first
+    use. Changes have to be made to that row instead, see `record`.
+    """
+
+    def __init__(self, user: User):
+        values = {
+            attr.key: getattr(user, attr.key)
+            for attr in inspect(User).column_attrs
+            if attr.key not in USER_SNAPSHOT_EXCLUDED_COLUMNS
+        }
+        self.__dict__.update(values, _cached_at=time.time())
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return getattr(self.record, name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"{type(self).__name__} is read-only, change its record")
+
+    def __repr__(self):
+        return f"<UserSnapshot {self.username!r}>"
+
+    @property
+    def record(self) -> User:
+        """The `User` row this is a copy of."""
+        return db.session.get(User, self.id)
+
+    @property
+    def uuid(self) -> str:
+        return self._uuid
+
+    def get_id(self) -> str:
+        return str(self._uuid)
+
+    @property
+    def is_active(self) -> bool:
+        return not self.is_disabled
+
+    @property
+    def expired(self) -> bool:
+        return time.time() - self._cached_at > USER_SNAPSHOT_TTL
+
+    @property
+    def ac_department(self) -> Optional[Department]:
+        if self.ac_department_id is None:
+            return None
+        return db.session.get(Department, self.ac_department_id)
+
+    @property
+    def dept_pref_rel(self) -> Optional[Department]:
+        if self.dept_pref is None:
+            return None
+        return db.session.get(Department, self.dept_pref)
+
+    is_admin_or_coordinator = User.is_admin_or_coordinator
+
+
+def _user_snapshot_key(uuid: str):
+    return hashkey(uuid, KEY_USER_SNAPSHOT, User.__name__)
+
+
+def get_user_snapshot(uuid: str) -> Optional[UserSnapshot]:
+    """The snapshot of the user with the given uuid, from the database cache if it
+    was taken less than `USER_SNAPSHOT_TTL` seconds ago.
+    """
+    key = _user_snapshot_key(uuid)
+    snapshot = DB_CACHE.get(key)
+    if snapshot is None or snapshot.expired:
+        user = User.query.filter_by(_uuid=uuid).one_or_none()
+        if user is None:
+            return None
+        snapshot = UserSnapshot(user)
+        try:
+            DB_CACHE[key] = snapshot
+        except ValueError:
+            pass
+    return snapshot
+
+
+def remove_user_snapshots(uuids) -> None:
+    for uuid in uuids:
+        try:
+            del DB_CACHE[_user_snapshot_key(uuid)]
+        except KeyError:
+            pass
+
+
+class UserSnapshotsTracker(SessionTracker):
+    """Drops the snapshots of the users changed in the transaction once it
+    commits.
+    """
+
+    name = "user_snapshots"
+    after_commit = True
+
+    def before_flush(self, session: Session, uuids) -> None:
+        """Remember the uuids of the users being changed. This covers new uuids from
+        `User.regenerate_uuid`, e.g. on password or email changes, and edits of
+        users by administrators.
+        """
+        unknown_ids = []
+        for obj in chain(session.dirty, session.deleted):
+            if not isinstance(obj, User):
+                continue
+            history = inspect(obj).attrs._uuid.history
+            if history.deleted or history.unchanged:
+                uuids.update(history.deleted, history.unchanged)
+            else:
+                # The uuid was replaced without being loaded first
+                unknown_ids.append(obj.id)
+        if unknown_ids:
+            uuids.update(
+                session.scalars(select(User._uuid).where(User.id.in_(unknown_ids)))
+            )
+
+    def commit(self, session: Session, uuids) -> None:
+        remove_user_snapshots(uuids)
+
+
+register_session_tracker(UserSnapshotsTracker())
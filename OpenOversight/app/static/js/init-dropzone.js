@@ -1,3 +1,29 @@
+/**
+ * Wait for an uploaded image to be processed, and show the error if it failed or
+ * a link to the image it looks like
+ * @param file the Dropzone file
+ * @param url status url returned by the upload
+ * @param delay milliseconds to wait before checking again
+ */
+function poll_upload(file, url, delay = 1000) {
+    setTimeout(function() {
+      $.getJSON(url).done(function(job) {
+        if (job.status === "pending" || job.status === "running") {
+          poll_upload(file, url, Math.min(delay * 2, 10000));
+        } else if (job.status === "failed") {
+          file.previewElement.classList.remove("dz-success");
+          file.previewElement.classList.add("dz-error");
+          file.previewTemplate.appendChild(document.createTextNode(job.error));
+        } else if (job.near_duplicate_of) {
+          let link = document.createElement("a");
+          link.href = job.near_duplicate_of;
+          link.textContent = "This photo looks like one uploaded before.";
+          file.previewTemplate.appendChild(link);
+        }
+      });
+    }, delay);
+}
+
 /**
  * Initialize dropzone component
  * @param id element id
@@ -20,6 +46,11 @@ function init_dropzone(id, url, csrf_token) {
         'X-CSRF-TOKEN': csrf_token
       },
       init: function() {
+        this.on("success", function(file, response) {
+          if (typeof(response) == "object" && response.status_url) {
+            poll_upload(file, response.status_url);
+          }
+        });
         this.on("error", function(file, response) {
           if (typeof(response) == "object") {
             response = response.error;
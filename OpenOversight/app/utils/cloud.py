@@ -1,22 +1,38 @@
 import hashlib
 import os
 import sys
-from datetime import datetime
+from datetime import datetime, timezone
 from io import BytesIO
 from traceback import format_exc
+from typing import List, Tuple
 from urllib.request import urlopen
 
-import boto3
-import botocore
 from botocore.exceptions import ClientError
+from cachetools import LRUCache
 from flask import current_app
 from flask_login import current_user
 from PIL import Image as Pimage
 from PIL import UnidentifiedImageError
 from PIL.PngImagePlugin import PngImageFile
 
-from OpenOversight.app.models.database import Image, db
-from OpenOversight.app.utils.constants import KEY_ALLOWED_EXTENSIONS, KEY_S3_BUCKET_NAME
+from OpenOversight.app.models.database import Image, ImageVariant, db
+from OpenOversight.app.utils.constants import (
+    CROP_CACHE_MAX_BYTES,
+    IMAGE_FETCH_TIMEOUT,
+    IMAGE_HASH_BATCH_SIZE,
+    IMAGE_VARIANT_BATCH_SIZE,
+    IMAGE_VARIANT_FORMAT,
+    IMAGE_VARIANT_QUALITY,
+    IMAGE_VARIANT_SIZES,
+    KEY_ALLOWED_EXTENSIONS,
+)
+from OpenOversight.app.utils.image_hash import (
+    compute_dhash,
+    find_near_duplicate,
+    set_image_phash,
+)
+from OpenOversight.app.utils.image_scrub import scrub_image
+from OpenOversight.app.utils.storage import get_image_storage
 
 
 # Cropped officer face image size
@@ -27,17 +43,55 @@ def compute_hash(data_to_hash):
     return hashlib.sha256(data_to_hash).hexdigest()
 
 
-def crop_image(image, crop_data=None, department_id=None):
+def open_image_file(filepath: str):
+    """Open a stored image, either uploaded to S3 or kept with the static files."""
+    storage = get_image_storage()
+    key = storage.key_from_url(filepath)
+    if key is not None:
+        # Reuses the connections of the storage client
+        image_buf = BytesIO()
+        storage.download(key, image_buf)
+        image_buf.seek(0)
+        return image_buf
+    if "http" in filepath:
+        with urlopen(filepath, timeout=IMAGE_FETCH_TIMEOUT) as response:
+            return BytesIO(response.read())
+    return open(os.path.abspath(current_app.root_path) + filepath, "rb")
+
+
+def _decoded_size(pimage: Pimage.Image) -> int:
+    return pimage.width * pimage.height * len(pimage.getbands())
+
+
+# Decoded originals of the images being cropped, so tagging several faces in one
+# photo only downloads and decodes it once per worker process
+ORIGINALS_CACHE: LRUCache = LRUCache(
+    maxsize=CROP_CACHE_MAX_BYTES, getsizeof=_decoded_size
+)
+
+
+def open_original(image: Image) -> Pimage.Image:
+    """Load the decoded image, from `ORIGINALS_CACHE` if it was loaded recently.
+    The returned image is shared and must not be modified in place.
+    """
+    key = (image.id, image.filepath)
+    pimage = ORIGINALS_CACHE.get(key)
+    if pimage is None:
+        with open_image_file(image.filepath) as image_file:
+            pimage = Pimage.open(image_file)
+            pimage.load()
+        if _decoded_size(pimage) <= ORIGINALS_CACHE.maxsize:
+            ORIGINALS_CACHE[key] = pimage
+    return pimage
+
+
+def crop_image(image, crop_data=None, department_id=None, user_id=None):
     """Crops an image to given dimensions and shrinks it to fit within a configured
     bounding box if the cropped image is still too big.
-    """
-    if "http" in image.filepath:
-        with urlopen(image.filepath) as response:
-            image_buf = BytesIO(response.read())
-    else:
-        image_buf = open(os.path.abspath(current_app.root_path) + image.filepath, "rb")
 
-    pimage = Pimage.open(image_buf)
+    The cropped image is saved on behalf of `user_id`, or the current user.
+    """
+    pimage = open_original(image)
 
     if (
         not crop_data
@@ -47,8 +101,7 @@ def crop_image(image, crop_data=None, department_id=None):
         return image
 
     # Crops image to face and resizes to bounding box if still too big
-    if crop_data:
-        pimage = pimage.crop(crop_data)
+    pimage = pimage.crop(crop_data) if crop_data else pimage.copy()
     if pimage.size[0] > THUMBNAIL_SIZE[0] or pimage.size[1] > THUMBNAIL_SIZE[1]:
         pimage.thumbnail(THUMBNAIL_SIZE)
 
@@ -60,7 +113,14 @@ def crop_image(image, crop_data=None, department_id=None):
     cropped_image_buf = BytesIO()
     pimage.save(cropped_image_buf, "jpeg", quality=95, optimize=True, progressive=True)
 
-    return save_image_to_s3_and_db(cropped_image_buf, current_user.id, department_id)
+    # Crops of different photos of one officer may look alike, only exact
+    # duplicates are reused
+    return save_image_to_s3_and_db(
+        cropped_image_buf,
+        user_id if user_id is not None else current_user.id,
+        department_id,
+        match_near_duplicates=False,
+    )
 
 
 # 36867 in the exif tags holds the date and the original image was taken
@@ -77,8 +137,6 @@ def get_date_taken(pimage):
 
 
 def upload_file_to_s3(file_obj, dest_filename: str):
-    s3_client = boto3.client("s3", endpoint_url=current_app.config["AWS_ENDPOINT_URL"])
-
     # Folder to store files in on S3 is first two chars of dest_filename
     s3_folder = dest_filename[0:2]
     s3_filename = dest_filename[2:]
@@ -89,32 +147,123 @@ def upload_file_to_s3(file_obj, dest_filename: str):
     file_obj.seek(0)
     s3_content_type = f"image/{pimage.format.lower()}"
     s3_path = f"{s3_folder}/{s3_filename}"
-    s3_client.upload_fileobj(
-        file_obj,
-        current_app.config[KEY_S3_BUCKET_NAME],
-        s3_path,
-        ExtraArgs={"ContentType": s3_content_type, "ACL": "public-read"},
-    )
+    return get_image_storage().upload(file_obj, s3_path, s3_content_type)
 
-    config = s3_client._client_config
-    config.signature_version = botocore.UNSIGNED
-    url = boto3.resource(
-        "s3", config=config, endpoint_url=current_app.config["AWS_ENDPOINT_URL"]
-    ).meta.client.generate_presigned_url(
-        "get_object",
-        Params={"Bucket": current_app.config[KEY_S3_BUCKET_NAME], "Key": s3_path},
-    )
 
-    return url
+def create_image_variants(image: Image, pimage: Pimage.Image) -> List[ImageVariant]:
+    """Store downscaled copies of the image for each size it is larger than, and
+    add them to the session.
+    """
+    # Decode JPEGs at a reduced scale that is still larger than every variant
+    pimage.draft("RGB", (IMAGE_VARIANT_SIZES[-1], IMAGE_VARIANT_SIZES[-1]))
+    if pimage.mode not in ("RGB", "RGBA"):
+        pimage = pimage.convert("RGBA" if "transparency" in pimage.info else "RGB")
+    storage = get_image_storage()
+    variants = []
+    for size in IMAGE_VARIANT_SIZES:
+        if size >= max(pimage.size):
+            break
+        resized = pimage.copy()
+        resized.thumbnail((size, size))
+        variant_buf = BytesIO()
+        resized.save(variant_buf, IMAGE_VARIANT_FORMAT, quality=IMAGE_VARIANT_QUALITY)
+        variant_buf.seek(0)
+        url = storage.upload(
+            variant_buf,
+            f"variants/{image.id}/{size}.{IMAGE_VARIANT_FORMAT}",
+            f"image/{IMAGE_VARIANT_FORMAT}",
+        )
+        variant = ImageVariant(
+            image_id=image.id,
+            size=size,
+            filepath=url,
+            width=resized.width,
+            height=resized.height,
+        )
+        image.variants.append(variant)
+        variants.append(variant)
+    image.variants_built_at = datetime.now(timezone.utc)
+    return variants
 
 
-def save_image_to_s3_and_db(image_buf, user_id, department_id=None):
+def backfill_image_variants() -> Tuple[int, int]:
+    """Create the variants of stored images that have not been processed yet, in
+    batches.
+
+    Variants of an image are committed together with its `variants_built_at`, so
+    images smaller than every variant are not read again either. Returns the
+    number of images processed and that failed.
+    """
+    processed, failed = 0, 0
+    last_id = 0
+    while True:
+        images = (
+            Image.query.filter(Image.id > last_id, Image.variants_built_at.is_(None))
+            .order_by(Image.id)
+            .limit(IMAGE_VARIANT_BATCH_SIZE)
+            .all()
+        )
+        if not images:
+            return processed, failed
+        for image in images:
+            last_id = image.id
+            try:
+                with Pimage.open(open_image_file(image.filepath)) as pimage:
+                    create_image_variants(image, pimage)
+                db.session.commit()
+                processed += 1
+            except Exception:
+                current_app.logger.exception(f"Error creating variants of {image}")
+                db.session.rollback()
+                failed += 1
+        # Only keep one batch of images in the session
+        db.session.expunge_all()
+
+
+def backfill_image_hashes() -> Tuple[int, int]:
+    """Compute the perceptual hash of stored images that have none, in batches.
+
+    Returns the number of images hashed and that failed.
+    """
+    hashed, failed = 0, 0
+    last_id = 0
+    while True:
+        images = (
+            Image.query.filter(Image.id > last_id, Image.phash.is_(None))
+            .order_by(Image.id)
+            .limit(IMAGE_HASH_BATCH_SIZE)
+            .all()
+        )
+        if not images:
+            return hashed, failed
+        for image in images:
+            last_id = image.id
+            try:
+                with Pimage.open(open_image_file(image.filepath)) as pimage:
+                    set_image_phash(image, compute_dhash(pimage))
+                db.session.commit()
+                hashed += 1
+            except Exception:
+                current_app.logger.exception(f"Error hashing {image}")
+                db.session.rollback()
+                failed += 1
+        # Only keep one batch of images in the session
+        db.session.expunge_all()
+
+
+def save_image_to_s3_and_db(
+    image_buf, user_id, department_id=None, match_near_duplicates=True
+):
     """
     Just a quick explanation of the order of operations here...
     we have to scrub the image before we do anything else like hash it,
     but we also have to get the date for the image before we scrub it.
+
+    An existing image is returned instead if it has the same contents. With
+    `match_near_duplicates`, images that only look the same as a stored image are
+    linked to it.
     """
-    # Scrub EXIF data, extracting date taken data if it exists
+    # Only the headers are read until the image is decoded
     image_buf.seek(0)
     try:
         pimage = Pimage.open(image_buf)
@@ -123,41 +272,57 @@ def save_image_to_s3_and_db(image_buf, user_id, department_id=None):
     image_format = pimage.format.lower()
     if image_format not in current_app.config[KEY_ALLOWED_EXTENSIONS]:
         raise ValueError(f"Attempted to pass invalid data type: {image_format}")
-    image_buf.seek(0)
 
     date_taken = get_date_taken(pimage)
     if date_taken:
         date_taken = datetime.strptime(date_taken, "%Y:%m:%d %H:%M:%S")
-    pimage.getexif().clear()
-    scrubbed_image_buf = BytesIO()
-    pimage.save(scrubbed_image_buf, image_format)
+    # Scrub EXIF data, hashing the scrubbed image as it is written
+    scrubbed_image_buf, hash_img = scrub_image(image_buf, pimage)
     pimage.close()
 
-    # Check whether image with hash already exists
-    scrubbed_image_buf.seek(0)
-    image_data = scrubbed_image_buf.read()
-    hash_img = compute_hash(image_data)
-    existing_image = Image.query.filter_by(hash_img=hash_img).first()
-    if existing_image:
-        return existing_image
+    with scrubbed_image_buf:
+        # Check whether image with hash already exists
+        existing_image = Image.query.filter_by(hash_img=hash_img).first()
+        if existing_image:
+            return existing_image
 
-    try:
-        new_filename = f"{hash_img}.{image_format}"
+        try:
+            with Pimage.open(scrubbed_image_buf) as hash_pimage:
+                phash = compute_dhash(hash_pimage)
+        except OSError as err:
+            raise ValueError("Attempted to pass an invalid image.") from err
         scrubbed_image_buf.seek(0)
-        url = upload_file_to_s3(scrubbed_image_buf, new_filename)
-        new_image = Image(
-            filepath=url,
-            hash_img=hash_img,
-            department_id=department_id,
-            taken_at=date_taken,
-            created_by=user_id,
-            last_updated_by=user_id,
-        )
-        db.session.add(new_image)
-        db.session.commit()
+        near_duplicate = find_near_duplicate(phash) if match_near_duplicates else None
+
+        try:
+            new_filename = f"{hash_img}.{image_format}"
+            url = upload_file_to_s3(scrubbed_image_buf, new_filename)
+            new_image = Image(
+                filepath=url,
+                hash_img=hash_img,
+                department_id=department_id,
+                taken_at=date_taken,
+                near_duplicate_of=near_duplicate,
+                created_by=user_id,
+                last_updated_by=user_id,
+            )
+            set_image_phash(new_image, phash)
+            db.session.add(new_image)
+            db.session.commit()
+        except ClientError:
+            exception_type, value, full_traceback = sys.exc_info()
+            error_str = " ".join([str(exception_type), str(value), format_exc()])
+            current_app.logger.error(f"Error uploading to S3: {error_str}")
+            return None
+
+        # The original is stored, missing variants are created by
+        # `flask backfill-image-variants`
+        try:
+            scrubbed_image_buf.seek(0)
+            with Pimage.open(scrubbed_image_buf) as pimage:
+                create_image_variants(new_image, pimage)
+            db.session.commit()
+        except Exception:
+            current_app.logger.exception(f"Error creating variants of {new_image}")
+            db.session.rollback()
         return new_image
-    except ClientError:
-        exception_type, value, full_traceback = sys.exc_info()
-        error_str = " ".join([str(exception_type), str(value), format_exc()])
-        current_app.logger.error(f"Error uploading to S3: {error_str}")
-        return None
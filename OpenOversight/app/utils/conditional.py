@@ -0,0 +1,146 @@
+"""Conditional GET support for the pages of departments, officers and incidents.
+
+A page is versioned by the departments whose records it shows, see
+`DepartmentStatistics.version`. Clients revalidating a page that has not changed
+since are answered with 304 Not Modified before the view runs.
+"""
+
+import hashlib
+from datetime import datetime, time, timezone
+from functools import wraps
+from http import HTTPMethod, HTTPStatus
+from typing import Callable, Hashable, Iterable, NamedTuple, Optional, Tuple, Union
+
+from flask import Response, make_response, request, session
+from flask_login import current_user
+from sqlalchemy import Select, func, select
+from werkzeug.http import is_resource_modified
+
+from OpenOversight.app.models.database import DepartmentStatistics, db
+from OpenOversight.app.utils.constants import KEY_TIMEZONE
+
+
+# Department ids, or a query selecting them
+DepartmentIds = Union[Iterable[int], Select]
+
+
+class PageVersion(NamedTuple):
+    etag: str
+    last_modified: Optional[datetime]
+    per_viewer: bool
+    # Request headers the page is negotiated on
+    vary: Tuple[str, ...] = ()
+
+
+def get_page_version(
+    department_ids: Optional[DepartmentIds],
+    per_viewer: bool = True,
+    variant: Hashable = None,
+    vary: Tuple[str, ...] = (),
+) -> Optional[PageVersion]:
+    """The version of a page showing records of the given departments, or of every
+    department if None. Pages negotiated on the `vary` request headers give the
+    `variant` picked for the request, e.g. its content type.
+
+    Pages rendered for the current viewer, rather than the same for everyone, are
+    also versioned by the user and their role, their timezone and the day. No
+    version is given to pages about to show flashed messages, or when none of the
+    departments exist. Administrators and area coordinators see forms whose CSRF
+    tokens expire, so their pages are never versioned.
+    """
+    if per_viewer and session.get("_flashes"):
+        return None
+    if per_viewer and (
+        current_user.is_authenticated
+        and (current_user.is_administrator or current_user.is_area_coordinator)
+    ):
+        return None
+
+    query = select(
+        func.count(),
+        func.sum(DepartmentStatistics.version),
+        func.max(DepartmentStatistics.changed_at),
+    )
+    if department_ids is not None:
+        query = query.where(DepartmentStatistics.department_id.in_(department_ids))
+    count, version, changed_at = db.session.execute(query).one()
+    if not count:
+        return None
+
+    parts = [count, version, variant]
+    if changed_at and changed_at.tzinfo is None:
+        changed_at = changed_at.replace(tzinfo=timezone.utc)
+    last_modified = changed_at
+    if per_viewer:
+        today = datetime.now(timezone.utc).date()
+        if current_user.is_authenticated:
+            parts += [
+                current_user.get_id(),
+                current_user.is_administrator,
+                current_user.is_area_coordinator,
+                current_user.ac_department_id,
+            ]
+        parts += [session.get(KEY_TIMEZONE), today]
+        # Pages showing ages or relative dates change with the day
+        start_of_day = datetime.combine(today, time.min, timezone.utc)
+        last_modified = max(changed_at or start_of_day, start_of_day)
+    etag = hashlib.sha1(repr(parts).encode()).hexdigest()
+    return PageVersion(etag, last_modified, per_viewer, vary)
+
+
+def add_validators(response: Response, version: PageVersion) -> Response:
+    response.set_etag(version.etag, weak=True)
+    response.last_modified = version.last_modified
+    # Clients may keep the page but have to revalidate it before each use
+    response.cache_control.no_cache = True
+    response.vary.update(version.vary)
+    if version.per_viewer:
+        response.vary.add("Cookie")
+        if current_user.is_authenticated:
+            response.cache_control.private = True
+    return response
+
+
+def conditional_page(
+    department_ids: Callable[..., Optional[DepartmentIds]],
+    per_viewer: bool = True,
+    variant: Optional[Callable[..., Hashable]] = None,
+    vary: Tuple[str, ...] = (),
+):
+    """Answer GET requests for the decorated view with 304 Not Modified, without
+    calling it, if the client's copy is still current.
+
+    `department_ids` is called with the view arguments and gives the departments
+    whose records the page shows, or None if it shows records of every department.
+    Views answering in more than one format give the `vary` request headers they
+    are negotiated on, and `variant`, called with the view arguments, gives the
+    format picked.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method not in (HTTPMethod.GET, HTTPMethod.HEAD):
+                return view(*args, **kwargs)
+
+            version = get_page_version(
+                department_ids(*args, **kwargs),
+                per_viewer=per_viewer,
+                variant=variant(*args, **kwargs) if variant else None,
+                vary=vary,
+            )
+            if version is None:
+                return view(*args, **kwargs)
+            if not is_resource_modified(
+                request.environ, etag=version.etag, last_modified=version.last_modified
+            ):
+                return add_validators(Response(status=HTTPStatus.NOT_MODIFIED), version)
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == HTTPStatus.OK:
+                add_validators(response, version)
+            return response
+
+        return wrapper
+
+    return decorator
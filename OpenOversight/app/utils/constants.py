@@ -1,6 +1,13 @@
 import os
 
 
+# API Constants
+API_MAX_PAGE_SIZE = 1000
+API_PAGE_SIZE = 100
+API_STREAM_BATCH_SIZE = 1000  # Rows read and written at a time when streaming
+MIMETYPE_JSON = "application/json"
+MIMETYPE_NDJSON = "application/x-ndjson"
+
 # Cache Key Constants
 KEY_DEPT_ALL_ASSIGNMENTS = "all_department_assignments"
 KEY_DEPT_ALL_INCIDENTS = "all_department_incidents"
@@ -8,17 +15,27 @@ KEY_DEPT_ALL_LINKS = "all_department_links"
 KEY_DEPT_ALL_NOTES = "all_department_notes"
 KEY_DEPT_ALL_OFFICERS = "all_department_officers"
 KEY_DEPT_ALL_SALARIES = "all_department_salaries"
-KEY_DEPT_ASSIGNMENTS_LAST_UPDATED = "assignments_last_updated"
-KEY_DEPT_INCIDENTS_LAST_UPDATED = "incidents_last_updated"
-KEY_DEPT_OFFICERS_LAST_UPDATED = "officers_last_updated"
+KEY_DEPT_METADATA = "department_metadata"
+KEY_USER_SNAPSHOT = "user_snapshot"
+
+# Command Constants
+BULK_ADD_PROGRESS_INTERVAL = 1000
 
 # Config Key Constants
 KEY_ALLOWED_EXTENSIONS = "ALLOWED_EXTENSIONS"
 KEY_DATABASE_URI = "SQLALCHEMY_DATABASE_URI"
+KEY_DB_CACHE_BACKEND = "DB_CACHE_BACKEND"
+KEY_DB_CACHE_MEMORY = "memory"
+KEY_DB_CACHE_PATH = "DB_CACHE_PATH"
+KEY_DB_CACHE_SQLITE = "sqlite"
 KEY_ENV = "ENV"
 KEY_ENV_DEV = "development"
 KEY_ENV_TESTING = "testing"
 KEY_ENV_PROD = "production"
+KEY_IMAGE_STORAGE_BACKEND = "IMAGE_STORAGE_BACKEND"
+KEY_IMAGE_STORAGE_LOCAL = "local"
+KEY_IMAGE_STORAGE_PATH = "IMAGE_STORAGE_PATH"
+KEY_IMAGE_STORAGE_S3 = "s3"
 KEY_NUM_OFFICERS = "NUM_OFFICERS"
 KEY_OFFICERS_PER_PAGE = "OFFICERS_PER_PAGE"
 KEY_OO_MAIL_SUBJECT_PREFIX = "OO_MAIL_SUBJECT_PREFIX"
@@ -30,6 +47,7 @@ KEY_MAIL_USE_TLS = "MAIL_USE_TLS"
 KEY_MAIL_USERNAME = "MAIL_USERNAME"
 KEY_MAIL_PASSWORD = "MAIL_PASSWORD"
 KEY_S3_BUCKET_NAME = "S3_BUCKET_NAME"
+KEY_S3_MAX_POOL_CONNECTIONS = "S3_MAX_POOL_CONNECTIONS"
 KEY_TIMEZONE = "TIMEZONE"
 
 # Database Key Constants
@@ -39,6 +57,20 @@ KEY_DB_CREATOR = "creator"
 OO_DATE_FORMAT = "%b %d, %Y"
 OO_TIME_FORMAT = "%I:%M %p"
 
+# Download Constants
+CSV_CHUNK_SIZE = 64 * 1024
+CSV_QUERY_BATCH_SIZE = 1000
+
+# Email Outbox Constants
+EMAIL_BATCH_SIZE = 50  # Emails sent over one connection
+EMAIL_MAX_ATTEMPTS = 8
+# Seconds before retrying a failed email, doubled after each attempt
+EMAIL_RETRY_DELAY = 30
+EMAIL_RETRY_MAX_DELAY = 6 * 60 * 60
+OUTGOING_EMAIL_FAILED = "failed"
+OUTGOING_EMAIL_PENDING = "pending"
+OUTGOING_EMAIL_SENT = "sent"
+
 # File Handling Constants
 ENCODING_UTF_8 = "utf-8"
 FILE_TYPE_HTML = "html"
@@ -48,6 +80,47 @@ SAVED_UMASK = os.umask(0o077)  # Ensure the file is read/write by the creator on
 # File Name Constants
 SERVICE_ACCOUNT_FILE = "service_account_key.json"
 
+# Fragment Cache Constants
+FRAGMENT_CACHE_MAX_BYTES = 64 * 1024 * 1024  # Rendered page fragments kept per worker
+
+# Image Hash Constants
+IMAGE_HASH_BATCH_SIZE = 100
+PHASH_BAND_COUNT = 4
+# Uploads this many bits away from a stored image are linked to it, must be less than
+# PHASH_BAND_COUNT for the band index to find them
+PHASH_MAX_DISTANCE = 3
+
+# Image Upload Constants
+CROP_CACHE_MAX_BYTES = 256 * 1024 * 1024  # Decoded originals kept per worker
+FACE_CROP_FAILED = "failed"
+# Seconds after which a running crop is taken to have lost its worker, and retried
+FACE_CROP_LEASE = 10 * 60
+FACE_CROP_MAX_ATTEMPTS = 3
+FACE_CROP_PENDING = "pending"
+FACE_CROP_RUNNING = "running"
+IMAGE_FETCH_TIMEOUT = 30
+IMAGE_SCRUB_CHUNK_SIZE = 64 * 1024
+IMAGE_SPOOL_MAX_MEMORY = 8 * 1024 * 1024  # Larger images are spooled to disk
+IMAGE_STORAGE_CHUNK_SIZE = 64 * 1024  # Bytes copied at a time to stored images
+UPLOAD_JOB_DONE = "done"
+UPLOAD_JOB_FAILED = "failed"
+# Seconds after which a running job is taken to have lost its worker, and retried
+UPLOAD_JOB_LEASE = 10 * 60
+UPLOAD_JOB_MAX_ATTEMPTS = 3
+UPLOAD_JOB_PENDING = "pending"
+UPLOAD_JOB_RUNNING = "running"
+S3_DELETE_BATCH_SIZE = 1000  # Most keys allowed in one DeleteObjects request
+
+# Image Variant Constants
+IMAGE_VARIANT_BATCH_SIZE = 100
+IMAGE_VARIANT_FORMAT = "webp"
+IMAGE_VARIANT_QUALITY = 80
+IMAGE_VARIANT_SIZES = (64, 320, 640, 1000)
+# Largest (width, height) each template shows an image at
+IMAGE_SLOT_LIST_OFFICER = (540, 300)
+IMAGE_SLOT_OFFICER_PROFILE = (720, 590)
+IMAGE_SLOT_SORT = (1000, 1000)
+
 # JWT Constants
 SIGNATURE_ALGORITHM = "HS512"
 
@@ -58,8 +131,16 @@ MEGABYTE = 1024 * KILOBYTE
 MINUTE = 60
 HOUR = 60 * MINUTE
 
+# Sitemap Constants
+SITEMAP_BATCH_SIZE = 1000
+SITEMAP_SHARD_SIZE = 50000  # Most URLs allowed in one sitemap file
+
 # UI Constants
 FIELD_NOT_AVAILABLE = "Field Not Available"
 FLASH_MSG_PERMANENT_REDIRECT = (
     "This page's address has changed, please update your bookmark!"
 )
+
+# User Constants
+# Seconds a signed-in user is authenticated from their cached snapshot
+USER_SNAPSHOT_TTL = MINUTE
@@ -1,17 +1,149 @@
-from typing import Optional
+from itertools import chain
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
 
-from sqlalchemy import func
+from flask import g, has_app_context
+from sqlalchemy import inspect, select
+from sqlalchemy.orm import Session, contains_eager, make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.util import identity_key
 
 from OpenOversight.app.models.database import (
     Assignment,
     Department,
-    Face,
-    Image,
+    DepartmentStatistics,
+    Job,
     Officer,
     Unit,
     User,
+    UserContributions,
     db,
+    get_department_version,
 )
+from OpenOversight.app.models.database_cache import (
+    get_database_cache_entry,
+    put_database_cache_entry,
+    remove_database_cache_entries,
+)
+from OpenOversight.app.models.session_tracking import (
+    SessionTracker,
+    get_pending,
+    register_session_tracker,
+)
+from OpenOversight.app.utils.constants import KEY_DEPT_METADATA
+
+
+class DepartmentMetadata(NamedTuple):
+    """Column values of the jobs and units of a department, which rarely change but
+    are looked up by most officer pages and forms.
+    """
+
+    jobs: Tuple[Dict[str, Any], ...]
+    units: Tuple[Dict[str, Any], ...]
+    # `DepartmentStatistics.version` of the department when they were read
+    version: Optional[int] = None
+
+
+def _column_values(model, *criteria, order_by) -> Tuple[Dict[str, Any], ...]:
+    columns = [getattr(model, attr.key) for attr in inspect(model).column_attrs]
+    rows = db.session.execute(select(*columns).where(*criteria).order_by(*order_by))
+    return tuple(row._asdict() for row in rows)
+
+
+def get_department_metadata(department_id: int) -> DepartmentMetadata:
+    """The jobs and units of the department, read at most once per request and
+    shared between requests through the database cache until they change.
+
+    Cached values are checked against the version of the department, which every
+    commit writing its jobs or units increments, so values cached by a worker are
+    not served once another process changed them. Jobs and units written by the
+    current transaction are read from it, and only cached once it commits.
+    """
+    department_id = int(department_id)
+    memo = g.setdefault("department_metadata", {})
+    if department_id in memo:
+        return memo[department_id]
+
+    department = Department(id=department_id)
+    version = get_department_version(department_id)
+    written = get_pending(db.session, DEPARTMENT_METADATA_TRACKER) or set()
+    uncommitted = department_id in {int(value) for value in written - {None}}
+    metadata = None
+    if not uncommitted:
+        metadata = get_database_cache_entry(department, KEY_DEPT_METADATA)
+    if metadata is None or version is None or metadata.version != version:
+        metadata = DepartmentMetadata(
+            jobs=_column_values(
+                Job, Job.department_id == department_id, order_by=(Job.order, Job.id)
+            ),
+            units=_column_values(
+                Unit,
+                Unit.department_id == department_id,
+                order_by=(Unit.description, Unit.id),
+            ),
+            version=version,
+        )
+        if not uncommitted:
+            put_database_cache_entry(department, KEY_DEPT_METADATA, metadata)
+    memo[department_id] = metadata
+    return metadata
+
+
+def _attach(model, values: Dict[str, Any]):
+    """The instance of `model` with the cached column `values`, added to the session
+    as if it had been loaded, without querying the database.
+    """
+    instance = db.session.identity_map.get(identity_key(model, values["id"]))
+    if instance is None:
+        instance = model(**values)
+        make_transient_to_detached(instance)
+        db.session.add(instance)
+    else:
+        # Fill in expired attributes rather than reloading them
+        for key in inspect(instance).unloaded & values.keys():
+            set_committed_value(instance, key, values[key])
+    return instance
+
+
+def department_jobs(department_id: int) -> List[Job]:
+    """The jobs of the department by their order."""
+    return [_attach(Job, job) for job in get_department_metadata(department_id).jobs]
+
+
+def department_units(department_id: int) -> List[Unit]:
+    """The units of the department by their description."""
+    return [
+        _attach(Unit, unit) for unit in get_department_metadata(department_id).units
+    ]
+
+
+class DepartmentMetadataTracker(SessionTracker):
+    """Drops the cached metadata of the departments whose jobs or units were
+    written once the transaction commits.
+    """
+
+    name = "department_metadata"
+    after_commit = True
+
+    def after_flush(self, session: Session, department_ids) -> None:
+        memo = g.get("department_metadata", {}) if has_app_context() else {}
+        for obj in chain(session.new, session.dirty, session.deleted):
+            if isinstance(obj, (Job, Unit)):
+                history = inspect(obj).attrs.department_id.history.sum()
+                department_ids.update(history)
+                # Read them again from the transaction
+                for department_id in set(history) - {None}:
+                    memo.pop(int(department_id), None)
+
+    def commit(self, session: Session, department_ids) -> None:
+        memo = g.get("department_metadata", {}) if has_app_context() else {}
+        for department_id in department_ids - {None}:
+            remove_database_cache_entries(
+                Department(id=int(department_id)), [KEY_DEPT_METADATA]
+            )
+            memo.pop(int(department_id), None)
+
+
+DEPARTMENT_METADATA_TRACKER = register_session_tracker(DepartmentMetadataTracker())
 
 
 def add_department_query(form, current_user):
@@ -24,32 +156,24 @@ def add_department_query(form, current_user):
 
 def add_unit_query(form, current_user):
     if not current_user.is_administrator:
-        form.unit.query = Unit.query.filter_by(
-            department_id=current_user.ac_department_id
-        ).order_by(Unit.description.asc())
+        form.unit.query = department_units(current_user.ac_department_id)
     else:
         form.unit.query = Unit.query.order_by(Unit.description.asc()).all()
 
 
 def compute_leaderboard_stats(select_top=25):
-    top_sorters = (
-        db.session.query(User, func.count(Image.created_by))
-        .select_from(Image)
-        .join(User, Image.created_by == User.id)
-        .group_by(User)
-        .order_by(func.count(Image.created_by).desc())
-        .limit(select_top)
-        .all()
-    )
-    top_taggers = (
-        db.session.query(User, func.count(Face.created_by))
-        .select_from(Face)
-        .join(User, Face.created_by == User.id)
-        .group_by(User)
-        .order_by(func.count(Face.created_by).desc())
+    """Users with the most images and faces, read from their contribution counters
+    so the cost does not grow with the number of images and faces.
+    """
+    top_sorters, top_taggers = [
+        db.session.query(User, counter)
+        .join(UserContributions, UserContributions.user_id == User.id)
+        .filter(counter > 0)
+        .order_by(counter.desc(), UserContributions.user_id.desc())
         .limit(select_top)
         .all()
-    )
+        for counter in (UserContributions.image_count, UserContributions.face_count)
+    ]
     return top_sorters, top_taggers
 
 
@@ -61,6 +185,15 @@ def dept_choices():
     )
 
 
+def listed_departments():
+    """Departments with officers, loaded with their statistics in a single query."""
+    return (
+        Department.query.join(Department.statistics)
+        .filter(DepartmentStatistics.officer_count > 0)
+        .options(contains_eager(Department.statistics))
+    )
+
+
 def unsorted_dept_choices():
     return db.session.query(Department).all()
 
@@ -87,10 +220,5 @@ def get_officer(department_id, star_no, first_name, last_name):
 
 def unit_choices(department_id: Optional[int] = None):
     if department_id is not None:
-        return (
-            db.session.query(Unit)
-            .filter_by(department_id=department_id)
-            .order_by(Unit.description.asc())
-            .all()
-        )
+        return department_units(department_id)
     return db.session.query(Unit).order_by(Unit.description.asc()).all()
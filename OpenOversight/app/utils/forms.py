@@ -1,8 +1,8 @@
 from datetime import datetime
 from typing import Union
 
-from sqlalchemy import or_
-from sqlalchemy.orm import selectinload
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import joinedload
 
 from OpenOversight.app.main.forms import (
     AddOfficerForm,
@@ -23,11 +23,13 @@ from OpenOversight.app.models.database import (
     Note,
     Officer,
     Salary,
-    Unit,
     User,
     db,
+    refresh_current_assignments,
 )
 from OpenOversight.app.utils.choices import GENDER_CHOICES, RACE_CHOICES
+from OpenOversight.app.utils.db import department_jobs, department_units
+from OpenOversight.app.utils.search import get_search_backend
 
 
 def if_exists_or_none(val: Union[str, None]) -> Union[str, None]:
@@ -53,6 +55,7 @@ def add_new_assignment(officer_id: int, form: AssignmentForm, user: User) -> Non
         last_updated_by=user.id,
     )
     db.session.add(new_assignment)
+    refresh_current_assignments([officer_id])
     db.session.commit()
 
 
@@ -127,6 +130,7 @@ def add_officer_profile(form: AddOfficerForm, user: User) -> Officer:
             )
             db.session.add(new_salary)
 
+    refresh_current_assignments([officer.id])
     db.session.commit()
     return officer
 
@@ -237,6 +241,7 @@ def edit_existing_assignment(assignment, form: AssignmentForm) -> Assignment:
     assignment.start_date = form.start_date.data
     assignment.resign_date = form.resign_date.data
     db.session.add(assignment)
+    refresh_current_assignments([assignment.officer_id])
     db.session.commit()
     return assignment
 
@@ -275,13 +280,14 @@ def edit_officer_profile(officer, form: EditOfficerForm) -> Officer:
 
 
 def filter_by_form(form_data: BrowseForm, officer_query, department_id=None):
+    search = get_search_backend()
     if form_data.get("last_name"):
         officer_query = officer_query.filter(
-            Officer.last_name.ilike(f"%%{form_data['last_name']}%%")
+            search.similar(Officer.last_name, form_data["last_name"])
         )
     if form_data.get("first_name"):
         officer_query = officer_query.filter(
-            Officer.first_name.ilike(f"%%{form_data['first_name']}%%")
+            search.similar(Officer.first_name, form_data["first_name"])
         )
     if not department_id and form_data.get("dept"):
         department_id = form_data["dept"].id
@@ -289,8 +295,9 @@ def filter_by_form(form_data: BrowseForm, officer_query, department_id=None):
 
     if form_data.get("unique_internal_identifier"):
         officer_query = officer_query.filter(
-            Officer.unique_internal_identifier.ilike(
-                f"%%{form_data['unique_internal_identifier']}%%"
+            search.contains(
+                Officer.unique_internal_identifier,
+                form_data["unique_internal_identifier"],
             )
         )
 
@@ -323,14 +330,12 @@ def filter_by_form(form_data: BrowseForm, officer_query, department_id=None):
             )
         )
 
+    jobs = department_jobs(department_id) if department_id else []
+    units = department_units(department_id) if department_id else []
+
     job_ids = []
     if form_data.get("rank"):
-        job_ids = [
-            job.id
-            for job in Job.query.filter_by(department_id=department_id)
-            .filter(Job.job_title.in_(form_data.get("rank")))
-            .all()
-        ]
+        job_ids = [job.id for job in jobs if job.job_title in form_data["rank"]]
 
         if "Not Sure" in form_data["rank"]:
             form_data["rank"].append(None)
@@ -338,12 +343,7 @@ def filter_by_form(form_data: BrowseForm, officer_query, department_id=None):
     unit_ids = []
     include_null_unit = False
     if form_data.get("unit"):
-        unit_ids = [
-            unit.id
-            for unit in Unit.query.filter_by(department_id=department_id)
-            .filter(Unit.description.in_(form_data.get("unit")))
-            .all()
-        ]
+        unit_ids = [unit.id for unit in units if unit.description in form_data["unit"]]
 
         if "Not Sure" in form_data["unit"]:
             include_null_unit = True
@@ -355,10 +355,11 @@ def filter_by_form(form_data: BrowseForm, officer_query, department_id=None):
         or job_ids
         or form_data.get("current_job")
     ):
-        officer_query = officer_query.join(Officer.assignments)
+        # Filter with EXISTS rather than a join so no DISTINCT is needed
+        assignment_filters = []
         if form_data.get("badge"):
-            officer_query = officer_query.filter(
-                Assignment.star_no.like(f"%%{form_data['badge']}%%")
+            assignment_filters.append(
+                search.contains(Assignment.star_no, form_data["badge"])
             )
 
         if unit_ids or include_null_unit:
@@ -368,14 +369,20 @@ def filter_by_form(form_data: BrowseForm, officer_query, department_id=None):
                 unit_filters.append(Assignment.unit_id.in_(unit_ids))
             if include_null_unit:
                 unit_filters.append(Assignment.unit_id.is_(None))
-            officer_query = officer_query.filter(or_(*unit_filters))
+            assignment_filters.append(or_(*unit_filters))
 
         if job_ids:
-            officer_query = officer_query.filter(Assignment.job_id.in_(job_ids))
+            assignment_filters.append(Assignment.job_id.in_(job_ids))
 
         if form_data.get("current_job"):
-            officer_query = officer_query.filter(Assignment.resign_date.is_(None))
-    officer_query = officer_query.options(selectinload(Officer.assignments)).distinct()
+            assignment_filters.append(Assignment.resign_date.is_(None))
+        officer_query = officer_query.filter(
+            Officer.assignments.any(and_(*assignment_filters))
+        )
+    officer_query = officer_query.options(
+        joinedload(Officer.current_assignment).joinedload(Assignment.job),
+        joinedload(Officer.current_assignment).joinedload(Assignment.unit),
+    )
 
     return officer_query
 
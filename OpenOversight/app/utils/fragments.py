@@ -0,0 +1,98 @@
+import sys
+import threading
+from datetime import date
+from typing import Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+from cachetools import LRUCache
+from flask import session
+from flask_login import current_user
+from markupsafe import Markup
+
+from OpenOversight.app.models.database import Officer
+from OpenOversight.app.utils.constants import FRAGMENT_CACHE_MAX_BYTES, KEY_TIMEZONE
+
+
+OFFICER_PROFILE_FRAGMENTS = (
+    "meta",
+    "faces",
+    "general_information",
+    "assignment_history",
+    "descriptions",
+    "salary",
+    "incidents",
+    "links",
+)
+
+# Rendered HTML of page fragments, per worker process. Keys include the version of
+# the records shown, so outdated fragments are never read again and are evicted
+# as the least recently used.
+FRAGMENT_CACHE: LRUCache = LRUCache(
+    maxsize=FRAGMENT_CACHE_MAX_BYTES, getsizeof=sys.getsizeof
+)
+_fragment_cache_lock = threading.Lock()
+
+
+class Fragments:
+    """Renders the fragments of one page, reusing the cached HTML of those rendered
+    under the same `key` before. Nothing is cached if `key` is None.
+
+    Cached fragments are looked up once, when the page is created, so views can
+    skip loading the data of fragments that will not be rendered, see `complete`.
+    In templates, wrap each fragment in `{% call fragments(name) %}`.
+    """
+
+    def __init__(self, key: Optional[Hashable], names: Iterable[str]):
+        self.key = key
+        self.names = tuple(names)
+        self._html: Dict[str, Markup] = {}
+        if key is None:
+            return
+        with _fragment_cache_lock:
+            for name in self.names:
+                html = FRAGMENT_CACHE.get((key, name))
+                if html is not None:
+                    self._html[name] = html
+
+    @property
+    def complete(self) -> bool:
+        """Whether every fragment of the page is already rendered."""
+        return len(self._html) == len(self.names)
+
+    def __call__(self, name: str, caller: Callable[[], str]) -> Markup:
+        if name in self._html:
+            return self._html[name]
+        html = Markup(caller())
+        if self.key is not None and sys.getsizeof(html) <= FRAGMENT_CACHE.maxsize:
+            with _fragment_cache_lock:
+                FRAGMENT_CACHE[(self.key, name)] = html
+        self._html[name] = html
+        return html
+
+
+def officer_fragments_key(officer: Officer) -> Optional[Tuple[Hashable, ...]]:
+    """The key of the officer's profile fragments for the current viewer, or None
+    if they should not be cached.
+
+    Profiles differ between anonymous visitors, who share their fragments, and
+    each signed-in user, who may edit their own descriptions. Administrators and
+    area coordinators see forms with CSRF tokens, so their profiles are always
+    rendered in full. Dates are shown in the viewer's timezone and ages as of
+    today.
+    """
+    statistics = officer.department.statistics
+    if statistics is None:
+        return None
+    if current_user.is_anonymous:
+        viewer = None
+    elif current_user.is_administrator or current_user.is_area_coordinator:
+        return None
+    else:
+        viewer = current_user.id
+    return (
+        "officer",
+        officer.id,
+        statistics.version,
+        viewer,
+        session.get(KEY_TIMEZONE),
+        date.today(),
+    )
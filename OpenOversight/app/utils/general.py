@@ -1,12 +1,11 @@
-import random
 import sys
-from typing import Optional, Union
+from typing import Optional, Tuple, Union
 from urllib.parse import urlparse
 from zoneinfo import available_timezones
 
 from flask import current_app, url_for
 
-from OpenOversight.app.models.database import Officer, User
+from OpenOversight.app.models.database import Image, Officer, User
 from OpenOversight.app.utils.constants import KEY_ALLOWED_EXTENSIONS
 
 
@@ -78,14 +77,6 @@ def get_or_create(session, model, defaults=None, **kwargs):
         return instance, True
 
 
-def get_random_image(image_query):
-    if image_query.count() > 0:
-        rand = random.randrange(0, image_query.count())
-        return image_query[rand]
-    else:
-        return None
-
-
 def merge_dicts(*dict_args):
     """
     Given any number of dicts, shallow copy and merge into a new dict,
@@ -166,6 +157,17 @@ def serve_image(filepath: str):
         return url_for("static", filename=filepath.replace("static/", "").lstrip("/"))
 
 
+def serve_image_variant(image: Image, slot: Tuple[int, int]):
+    """Serve the smallest variant of the image that is not shown upscaled in a
+    `slot` of the given largest width and height, or the original if none is.
+    """
+    max_width, max_height = slot
+    for variant in image.variants:
+        if variant.width >= max_width or variant.height >= max_height:
+            return serve_image(variant.filepath)
+    return serve_image(image.filepath)
+
+
 def str_is_true(str_) -> bool:
     if str_ is None:
         return False
@@ -0,0 +1,166 @@
+from typing import Dict, List, Optional
+
+from PIL import Image as Pimage
+from sqlalchemy import and_, or_, select
+
+from OpenOversight.app.models.database import Image, ImagePhashBand, db
+from OpenOversight.app.utils.constants import PHASH_BAND_COUNT, PHASH_MAX_DISTANCE
+
+
+PHASH_BITS = 64
+PHASH_MASK = (1 << PHASH_BITS) - 1
+PHASH_BAND_BITS = PHASH_BITS // PHASH_BAND_COUNT
+
+
+def compute_dhash(pimage: Pimage.Image) -> int:
+    """Difference hash of the image: one bit per pair of horizontally adjacent
+    pixels of a 9x8 grayscale thumbnail, set where brightness decreases.
+
+    It stays within a few bits when the image is resized, recompressed or has its
+    colors adjusted.
+    """
+    # Decode JPEGs at the smallest scale still larger than the thumbnail
+    pimage.draft("L", (9, 8))
+    pixels = list(pimage.convert("L").resize((9, 8), Pimage.LANCZOS).getdata())
+    dhash = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            dhash = (dhash << 1) | (left > right)
+    return dhash
+
+
+def to_signed(phash: int) -> int:
+    """Store unsigned 64 bit hashes in a signed BIGINT column."""
+    return phash - (1 << PHASH_BITS) if phash >> (PHASH_BITS - 1) else phash
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return ((a ^ b) & PHASH_MASK).bit_count()
+
+
+def phash_bands(phash: int) -> List[int]:
+    """Split the hash in equal bands. Two hashes fewer than `PHASH_BAND_COUNT` bits
+    apart have at least one identical band.
+    """
+    band_mask = (1 << PHASH_BAND_BITS) - 1
+    phash &= PHASH_MASK
+    return [
+        (phash >> (band * PHASH_BAND_BITS)) & band_mask
+        for band in range(PHASH_BAND_COUNT)
+    ]
+
+
+def set_image_phash(image: Image, phash: int) -> None:
+    image.phash = to_signed(phash)
+    image.phash_bands = [
+        ImagePhashBand(band=band, value=value)
+        for band, value in enumerate(phash_bands(phash))
+    ]
+
+
+def find_near_duplicate(
+    phash: int, max_distance: int = PHASH_MAX_DISTANCE
+) -> Optional[Image]:
+    """Find the stored image closest to the hash, if it is at most `max_distance`
+    bits away.
+
+    Only images sharing a band with the hash are compared, found through the
+    index of `ImagePhashBand`, so this does not scan all images.
+    """
+    if max_distance >= PHASH_BAND_COUNT:
+        raise ValueError(f"Bands only find hashes up to {PHASH_BAND_COUNT - 1} apart")
+    matching_bands = select(ImagePhashBand.image_id).where(
+        or_(
+            *(
+                and_(ImagePhashBand.band == band, ImagePhashBand.value == value)
+                for band, value in enumerate(phash_bands(phash))
+            )
+        )
+    )
+    candidates = Image.query.filter(Image.id.in_(matching_bands)).order_by(Image.id)
+    closest, closest_distance = None, max_distance + 1
+    for candidate in candidates:
+        distance = hamming_distance(candidate.phash, phash)
+        if distance < closest_distance:
+            closest, closest_distance = candidate, distance
+    return closest
+
+
+class BKTree:
+    """Burkhard-Keller tree of hashes under the Hamming distance.
+
+    Children are keyed by their distance to the parent, so by the triangle
+    inequality a search within `radius` of a hash only visits children whose key
+    is within `radius` of the distance between that hash and the parent.
+    """
+
+    def __init__(self):
+        # Nodes are [hash, ids with that hash, children by distance]
+        self.root: Optional[list] = None
+
+    def add(self, phash: int, item_id: int) -> None:
+        if self.root is None:
+            self.root = [phash, [item_id], {}]
+            return
+        node = self.root
+        while True:
+            distance = hamming_distance(node[0], phash)
+            if distance == 0:
+                node[1].append(item_id)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [phash, [item_id], {}]
+                return
+            node = child
+
+    def search(self, phash: int, radius: int) -> List[int]:
+        """Ids of the hashes at most `radius` bits away from `phash`."""
+        found: List[int] = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            distance = hamming_distance(node[0], phash)
+            if distance <= radius:
+                found.extend(node[1])
+            for child_distance, child in node[2].items():
+                if distance - radius <= child_distance <= distance + radius:
+                    stack.append(child)
+        return found
+
+
+def near_duplicate_clusters(max_distance: int) -> List[List[int]]:
+    """Group the ids of hashed images that are linked by chains of images at most
+    `max_distance` bits apart. Only groups of more than one image are returned.
+    """
+    hashes: Dict[int, int] = dict(
+        db.session.execute(
+            select(Image.id, Image.phash)
+            .where(Image.phash.is_not(None))
+            .order_by(Image.id)
+        ).all()
+    )
+    tree = BKTree()
+    for image_id, phash in hashes.items():
+        tree.add(phash, image_id)
+
+    # Union-find of the ids, merged into the smallest id of each cluster
+    parents: Dict[int, int] = {}
+
+    def root(image_id: int) -> int:
+        while parents.get(image_id, image_id) != image_id:
+            image_id = parents[image_id]
+        return image_id
+
+    for image_id, phash in hashes.items():
+        for other_id in tree.search(phash, max_distance):
+            first, second = sorted((root(image_id), root(other_id)))
+            if first != second:
+                parents[second] = first
+
+    clusters: Dict[int, List[int]] = {}
+    for image_id in hashes:
+        clusters.setdefault(root(image_id), []).append(image_id)
+    return [cluster for cluster in clusters.values() if len(cluster) > 1]
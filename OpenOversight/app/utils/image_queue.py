@@ -0,0 +1,57 @@
+import random
+from typing import Optional
+
+from sqlalchemy import update
+from sqlalchemy.orm import Query
+
+from OpenOversight.app.models.database import Image, db
+
+
+def unsorted_images(department_id: int) -> Query:
+    """Images in the department that have not been classified yet."""
+    return Image.query.filter(
+        Image.contains_cops.is_(None), Image.department_id == department_id
+    )
+
+
+def untagged_images(department_id: Optional[int] = None) -> Query:
+    """Images containing officers that still need to be tagged."""
+    image_query = Image.query.filter(
+        Image.contains_cops == True,  # noqa: E712
+        Image.is_tagged == False,  # noqa: E712
+    )
+    if department_id:
+        image_query = image_query.filter(Image.department_id == department_id)
+    return image_query
+
+
+def claim_random_image(image_query: Query) -> Optional[Image]:
+    """Pick a random image from one of the queues above.
+
+    Seeks the partial index on `Image.random_key` from a random point, wrapping
+    around to the start, so it does not count or scan the queue. Rows being
+    claimed by another request are skipped, and the claimed image is moved to a
+    new random position so it is unlikely to be handed out again right away.
+    """
+    key = random.random()
+    for position in (Image.random_key >= key, Image.random_key < key):
+        image = (
+            image_query.filter(position)
+            .order_by(Image.random_key)
+            .with_for_update(skip_locked=True)
+            .first()
+        )
+        if image:
+            break
+    else:
+        return None
+
+    db.session.execute(
+        update(Image)
+        .where(Image.id == image.id)
+        # Not an edit, keep the last updated date as is
+        .values(random_key=random.random(), last_updated_at=Image.last_updated_at)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return image
@@ -0,0 +1,231 @@
+import hashlib
+import struct
+from io import SEEK_CUR, BufferedIOBase
+from tempfile import SpooledTemporaryFile
+from typing import IO, Callable, Dict, Optional, Tuple
+
+from PIL import Image as Pimage
+
+from OpenOversight.app.utils.constants import (
+    IMAGE_SCRUB_CHUNK_SIZE,
+    IMAGE_SPOOL_MAX_MEMORY,
+)
+
+
+JPEG_SOI = b"\xff\xd8"
+JPEG_EOI = 0xD9
+JPEG_SOS = 0xDA
+JPEG_APP0 = 0xE0
+JPEG_APP14 = 0xEE
+JPEG_COM = 0xFE
+# APPn segments hold EXIF, XMP, IPTC, ICC profiles, thumbnails and vendor data,
+# and COM segments hold free text comments. Only the JFIF header and the Adobe
+# color transform, needed to decode the image, are kept.
+JPEG_METADATA_MARKERS = {*range(0xE0, 0xF0), JPEG_COM}
+JPEG_JFIF = b"JFIF\x00"
+JPEG_ADOBE = b"Adobe"
+# Identifier, version, density units and densities of the JFIF header, after
+# which the thumbnail dimensions and pixels follow
+JPEG_JFIF_HEADER_SIZE = 12
+# Markers without a length or payload
+JPEG_STANDALONE_MARKERS = {0x01, *range(0xD0, 0xD8)}
+# Bytes following 0xFF in compressed image data that do not start a marker
+JPEG_SCAN_ESCAPES = {0x00, *range(0xD0, 0xD8)}
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+PNG_IEND = b"IEND"
+PNG_METADATA_CHUNKS = {b"eXIf", b"iTXt", b"tEXt", b"tIME", b"zTXt"}
+
+
+class HashingWriter:
+    """Writes to a file while hashing everything written to it."""
+
+    def __init__(self, file_obj: IO[bytes]):
+        self.file_obj = file_obj
+        self.hash = hashlib.sha256()
+
+    def write(self, data) -> int:
+        self.hash.update(data)
+        return self.file_obj.write(data)
+
+    def hexdigest(self) -> str:
+        return self.hash.hexdigest()
+
+
+def _read_exactly(src: BufferedIOBase, size: int) -> bytes:
+    data = src.read(size)
+    if len(data) != size:
+        raise ValueError("Unexpected end of image data")
+    return data
+
+
+def _copy(
+    src: BufferedIOBase, dst: Optional[HashingWriter], size: int, view: memoryview
+) -> None:
+    """Copy `size` bytes from `src` to `dst` through the `view` buffer, or skip
+    them if `dst` is None.
+    """
+    while size:
+        read = src.readinto(view[: min(size, len(view))])
+        if not read:
+            raise ValueError("Unexpected end of image data")
+        if dst is not None:
+            dst.write(view[:read])
+        size -= read
+
+
+def _copy_scan(src: BufferedIOBase, dst: HashingWriter, buffer: bytearray) -> None:
+    """Copy the compressed image data following a start of scan, leaving `src` at
+    the marker that ends it.
+    """
+    view = memoryview(buffer)
+    while True:
+        read = src.readinto(view)
+        if not read:
+            raise ValueError("Unexpected end of image data")
+        start = 0
+        while (index := buffer.find(b"\xff", start, read)) != -1:
+            if index + 1 == read:
+                if index == 0:
+                    raise ValueError("Unexpected end of image data")
+                # Read the byte following 0xFF with the next chunk
+                dst.write(view[:index])
+                src.seek(index - read, SEEK_CUR)
+                break
+            if buffer[index + 1] not in JPEG_SCAN_ESCAPES:
+                dst.write(view[:index])
+                src.seek(index - read, SEEK_CUR)
+                return
+            start = index + 2
+        else:
+            dst.write(view[:read])
+
+
+def _copy_app_segment(
+    src: BufferedIOBase,
+    dst: HashingWriter,
+    code: int,
+    length: int,
+    view: memoryview,
+) -> None:
+    """Copy the JFIF header, without its thumbnail, or the Adobe color transform
+    of an APPn segment, skipping any other APPn or COM segment.
+    """
+    size = length - 2
+    if code == JPEG_APP0 and size >= JPEG_JFIF_HEADER_SIZE:
+        header = _read_exactly(src, JPEG_JFIF_HEADER_SIZE)
+        size -= JPEG_JFIF_HEADER_SIZE
+        if header.startswith(JPEG_JFIF):
+            # Zero thumbnail width and height
+            dst.write(
+                struct.pack(">BBH", 0xFF, code, JPEG_JFIF_HEADER_SIZE + 4)
+                + header
+                + b"\x00\x00"
+            )
+    elif code == JPEG_APP14 and size >= len(JPEG_ADOBE):
+        header = _read_exactly(src, len(JPEG_ADOBE))
+        size -= len(JPEG_ADOBE)
+        if header == JPEG_ADOBE:
+            dst.write(struct.pack(">BBH", 0xFF, code, length) + header)
+            _copy(src, dst, size, view)
+            return
+    _copy(src, None, size, view)
+
+
+def strip_jpeg_metadata(src: BufferedIOBase, dst: HashingWriter) -> None:
+    """Copy a JPEG without its metadata segments, up to its end of image. The
+    compressed image data of each scan is copied as is.
+    """
+    buffer = bytearray(IMAGE_SCRUB_CHUNK_SIZE)
+    view = memoryview(buffer)
+    if src.read(2) != JPEG_SOI:
+        raise ValueError("Missing JPEG start of image")
+    dst.write(JPEG_SOI)
+    while True:
+        if _read_exactly(src, 1) != b"\xff":
+            raise ValueError("Expected a JPEG marker")
+        marker = _read_exactly(src, 1)
+        # Markers may be preceded by any number of fill bytes
+        while marker == b"\xff":
+            marker = _read_exactly(src, 1)
+        code = marker[0]
+        if code in JPEG_STANDALONE_MARKERS or code == JPEG_EOI:
+            dst.write(b"\xff" + marker)
+            if code == JPEG_EOI:
+                # Anything appended after the end of image is dropped
+                return
+            continue
+
+        length_bytes = _read_exactly(src, 2)
+        (length,) = struct.unpack(">H", length_bytes)
+        if length < 2:
+            raise ValueError("Invalid JPEG segment length")
+        if code in JPEG_METADATA_MARKERS:
+            _copy_app_segment(src, dst, code, length, view)
+            continue
+        dst.write(b"\xff" + marker + length_bytes)
+        _copy(src, dst, length - 2, view)
+        if code == JPEG_SOS:
+            _copy_scan(src, dst, buffer)
+
+
+def strip_png_metadata(src: BufferedIOBase, dst: HashingWriter) -> None:
+    """Copy a PNG without its text, time and EXIF chunks."""
+    view = memoryview(bytearray(IMAGE_SCRUB_CHUNK_SIZE))
+    if src.read(len(PNG_SIGNATURE)) != PNG_SIGNATURE:
+        raise ValueError("Missing PNG signature")
+    dst.write(PNG_SIGNATURE)
+    while True:
+        header = _read_exactly(src, 8)
+        length, chunk_type = struct.unpack(">I4s", header)
+        # The chunk data is followed by its CRC
+        if chunk_type in PNG_METADATA_CHUNKS:
+            _copy(src, None, length + 4, view)
+            continue
+        dst.write(header)
+        _copy(src, dst, length + 4, view)
+        if chunk_type == PNG_IEND:
+            return
+
+
+METADATA_STRIPPERS: Dict[str, Callable[[BufferedIOBase, HashingWriter], None]] = {
+    "jpeg": strip_jpeg_metadata,
+    "png": strip_png_metadata,
+}
+
+
+def _reencode(pimage: Pimage.Image, image_format: str) -> Tuple[IO[bytes], str]:
+    spool = SpooledTemporaryFile(max_size=IMAGE_SPOOL_MAX_MEMORY)
+    pimage.getexif().clear()
+    pimage.save(spool, image_format)
+    spool.seek(0)
+    view = memoryview(bytearray(IMAGE_SCRUB_CHUNK_SIZE))
+    hash_img = hashlib.sha256()
+    while read := spool.readinto(view):
+        hash_img.update(view[:read])
+    spool.seek(0)
+    return spool, hash_img.hexdigest()
+
+
+def scrub_image(src: BufferedIOBase, pimage: Pimage.Image) -> Tuple[IO[bytes], str]:
+    """Strip the metadata of the image opened from `src`, returning the scrubbed
+    image and its SHA-256 hash.
+
+    JPEGs and PNGs are streamed into a file spooled to disk once it gets large,
+    dropping their metadata without decoding them. Other formats, and images
+    that cannot be parsed that way, are decoded and re-encoded by Pillow.
+    """
+    image_format = pimage.format.lower()
+    strip_metadata = METADATA_STRIPPERS.get(image_format)
+    if strip_metadata is not None:
+        spool = SpooledTemporaryFile(max_size=IMAGE_SPOOL_MAX_MEMORY)
+        writer = HashingWriter(spool)
+        src.seek(0)
+        try:
+            strip_metadata(src, writer)
+        except ValueError:
+            spool.close()
+        else:
+            spool.seek(0)
+            return spool, writer.hexdigest()
+    return _reencode(pimage, image_format)
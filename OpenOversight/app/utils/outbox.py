@@ -0,0 +1,115 @@
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+from flask import current_app
+
+from OpenOversight.app.email_client import EmailClient
+from OpenOversight.app.models.database import OutgoingEmail, db
+from OpenOversight.app.models.emails import Email
+from OpenOversight.app.utils.constants import (
+    EMAIL_BATCH_SIZE,
+    EMAIL_MAX_ATTEMPTS,
+    EMAIL_RETRY_DELAY,
+    EMAIL_RETRY_MAX_DELAY,
+    OUTGOING_EMAIL_FAILED,
+    OUTGOING_EMAIL_PENDING,
+    OUTGOING_EMAIL_SENT,
+)
+
+
+def claim_outgoing_emails(limit: int) -> List[OutgoingEmail]:
+    """Lock the oldest emails due to be sent, skipping emails claimed by other
+    workers. The locks are held until the batch is committed, so emails of a worker
+    that dies while sending them are sent again by the next one.
+    """
+    return (
+        OutgoingEmail.query.filter(
+            OutgoingEmail.status == OUTGOING_EMAIL_PENDING,
+            OutgoingEmail.next_attempt_at <= datetime.now(timezone.utc),
+        )
+        .order_by(OutgoingEmail.next_attempt_at, OutgoingEmail.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """Time to wait before the next attempt at sending an email that failed
+    `attempts` times.
+    """
+    return timedelta(
+        seconds=min(EMAIL_RETRY_DELAY * 2 ** (attempts - 1), EMAIL_RETRY_MAX_DELAY)
+    )
+
+
+def _fail_outgoing_email(outgoing: OutgoingEmail, error: Exception) -> None:
+    outgoing.attempts += 1
+    outgoing.error = str(error) or error.__class__.__name__
+    if outgoing.attempts >= EMAIL_MAX_ATTEMPTS:
+        outgoing.status = OUTGOING_EMAIL_FAILED
+        outgoing.body = None
+        outgoing.html = None
+    else:
+        outgoing.next_attempt_at = datetime.now(timezone.utc) + retry_delay(
+            outgoing.attempts
+        )
+
+
+def send_outgoing_emails(emails: List[OutgoingEmail]) -> int:
+    """Send the claimed emails over one connection, returning how many were sent.
+    Emails that could not be sent are retried later, with exponential backoff.
+    """
+    sent = 0
+    unsent = list(emails)
+    try:
+        with EmailClient.connect():
+            while unsent:
+                outgoing = unsent[0]
+                try:
+                    EmailClient.deliver(
+                        Email(
+                            outgoing.body,
+                            outgoing.html,
+                            outgoing.subject,
+                            outgoing.receiver,
+                        )
+                    )
+                except Exception as error:
+                    current_app.logger.exception(f"Error sending email {outgoing.id}")
+                    _fail_outgoing_email(outgoing, error)
+                else:
+                    outgoing.status = OUTGOING_EMAIL_SENT
+                    outgoing.sent_at = datetime.now(timezone.utc)
+                    outgoing.body = None
+                    outgoing.html = None
+                    outgoing.error = None
+                    sent += 1
+                unsent.pop(0)
+    except Exception as error:
+        # Connecting to, or disconnecting from, the email provider failed
+        current_app.logger.exception("Error connecting to the email provider")
+        for outgoing in unsent:
+            _fail_outgoing_email(outgoing, error)
+    db.session.commit()
+    return sent
+
+
+def run_email_worker(
+    poll_interval: float,
+    batch_size: int = EMAIL_BATCH_SIZE,
+    exit_when_empty: bool = False,
+) -> int:
+    """Send queued emails as they come in, returning how many were sent once none
+    are due if `exit_when_empty` is set.
+    """
+    sent = 0
+    while True:
+        if emails := claim_outgoing_emails(batch_size):
+            sent += send_outgoing_emails(emails)
+            continue
+        db.session.commit()
+        if exit_when_empty:
+            return sent
+        time.sleep(poll_interval)
@@ -0,0 +1,200 @@
+import base64
+import binascii
+import json
+from datetime import date, datetime, time
+from http import HTTPStatus
+from typing import Any, List, NamedTuple, Optional, Sequence, Union
+
+from flask import abort
+from sqlalchemy import and_, false, or_
+from sqlalchemy.orm import InstrumentedAttribute, Query
+from sqlalchemy.sql.elements import ColumnElement
+
+
+class SortKey(NamedTuple):
+    column: Union[InstrumentedAttribute, ColumnElement]
+    descending: bool = False
+    # Attribute holding the value on each result, for SQL expressions
+    name: Optional[str] = None
+
+
+class KeysetPagination:
+    """A page of results located by the sort keys of its neighbours.
+
+    Exposes the same attributes as `flask_sqlalchemy.pagination.Pagination`
+    that the pagination templates use. `total` is `None` when it was not
+    counted, and `next_cursor`/`prev_cursor` are opaque tokens to pass back as
+    the `cursor` argument.
+    """
+
+    def __init__(
+        self,
+        items: List[Any],
+        page: int,
+        per_page: int,
+        total: Optional[int],
+        next_cursor: Optional[str],
+        prev_cursor: Optional[str],
+    ):
+        self.items = items
+        self.page = page
+        self.per_page = per_page
+        self.total = total
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self) -> bool:
+        return self.prev_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+
+def _dump_value(value: Any) -> Any:
+    if isinstance(value, (date, datetime, time)):
+        return value.isoformat()
+    return value
+
+
+def _load_value(key: SortKey, value: Any) -> Any:
+    if value is None:
+        return None
+    python_type = key.column.type.python_type
+    if python_type in (date, datetime, time):
+        return python_type.fromisoformat(value)
+    return python_type(value)
+
+
+def encode_cursor(
+    sort_keys: Sequence[SortKey],
+    obj: Any,
+    backwards: bool,
+    page: int,
+    total: Optional[int],
+) -> str:
+    """Build the token for the page after (or before) `obj`."""
+    state = {
+        "k": [
+            _dump_value(getattr(obj, key.name or key.column.key)) for key in sort_keys
+        ],
+        "b": backwards,
+        "p": page,
+        "t": total,
+    }
+    data = json.dumps(state, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def decode_cursor(sort_keys: Sequence[SortKey], cursor: str) -> dict:
+    """Read a token created by `encode_cursor`, raising `ValueError` if it
+    is malformed or was made for different sort keys.
+    """
+    try:
+        data = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        state = json.loads(data)
+        values = state["k"]
+        if not isinstance(values, list) or len(values) != len(sort_keys):
+            raise ValueError("cursor does not match the sort keys")
+        return {
+            "values": [_load_value(k, v) for k, v in zip(sort_keys, values)],
+            "backwards": bool(state["b"]),
+            "page": max(int(state["p"]), 1),
+            "total": None if state["t"] is None else int(state["t"]),
+        }
+    except (binascii.Error, KeyError, TypeError, UnicodeDecodeError) as e:
+        raise ValueError("invalid cursor") from e
+
+
+def _order_by(key: SortKey, backwards: bool):
+    # NULLs always sort after values so the cursor comparison is portable
+    descending = key.descending != backwards
+    ordering = key.column.desc() if descending else key.column.asc()
+    return ordering.nulls_first() if backwards else ordering.nulls_last()
+
+
+def _comes_after(key: SortKey, value: Any, backwards: bool):
+    if value is None:
+        return key.column.isnot(None) if backwards else false()
+    descending = key.descending != backwards
+    comparison = key.column < value if descending else key.column > value
+    return comparison if backwards else or_(comparison, key.column.is_(None))
+
+
+def _equals(key: SortKey, value: Any):
+    return key.column.is_(None) if value is None else key.column == value
+
+
+def keyset_paginate(
+    query: Query,
+    sort_keys: Sequence[SortKey],
+    per_page: int,
+    cursor: Optional[str] = None,
+    page: int = 1,
+    count: bool = True,
+) -> KeysetPagination:
+    """Paginate `query` by seeking past the sort keys of the previous page.
+
+    Unlike `Query.paginate`, later pages do not scan the rows before them, and
+    the total is only counted for the first page and carried along in the
+    cursor. The last sort key must be unique. `page` supports links made before
+    cursors existed, and is read with an OFFSET.
+    """
+    total = None
+    backwards = False
+    values = None
+    if cursor:
+        try:
+            state = decode_cursor(sort_keys, cursor)
+        except ValueError:
+            abort(HTTPStatus.BAD_REQUEST)
+        values, backwards, page, total = (
+            state["values"],
+            state["backwards"],
+            state["page"],
+            state["total"],
+        )
+    elif count:
+        total = query.order_by(None).count()
+
+    query = query.order_by(None).order_by(
+        *(_order_by(key, backwards) for key in sort_keys)
+    )
+    if values is not None:
+        query = query.filter(
+            or_(
+                *(
+                    and_(
+                        *(_equals(k, v) for k, v in zip(sort_keys[:i], values)),
+                        _comes_after(sort_keys[i], values[i], backwards),
+                    )
+                    for i in range(len(sort_keys))
+                )
+            )
+        )
+    elif page > 1:
+        query = query.offset((page - 1) * per_page)
+
+    items = query.limit(per_page + 1).all()
+    has_more = len(items) > per_page
+    items = items[:per_page]
+
+    if backwards:
+        items.reverse()
+        has_next, has_prev = True, has_more
+        if not has_more:
+            page = 1
+    else:
+        has_next, has_prev = has_more, page > 1
+
+    next_cursor = prev_cursor = None
+    if items and has_next:
+        next_cursor = encode_cursor(sort_keys, items[-1], False, page + 1, total)
+    if items and has_prev:
+        prev_cursor = encode_cursor(sort_keys, items[0], True, page - 1, total)
+
+    return KeysetPagination(items, page, per_page, total, next_cursor, prev_cursor)
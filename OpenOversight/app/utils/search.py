@@ -0,0 +1,86 @@
+from abc import ABC, abstractmethod
+from typing import Optional
+
+from sqlalchemy import case, func, or_
+from sqlalchemy.sql.elements import ColumnElement
+
+from OpenOversight.app.models.database import Officer, db
+
+
+# Rank tiers for name matches, lower is better
+RANK_EXACT = 0
+RANK_PREFIX = 1
+RANK_SUBSTRING = 2
+RANK_FUZZY = 3
+
+
+def escape_like(term: str) -> str:
+    """Escape the LIKE wildcards in user input."""
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+class SearchBackend(ABC):
+    """Base class to define how officers are searched by name, identifier and
+    badge number.
+    """
+
+    def contains(self, column, term: str) -> ColumnElement:
+        """Case-insensitive substring match."""
+        return column.ilike(f"%{escape_like(term)}%", escape="\\")
+
+    @abstractmethod
+    def similar(self, column, term: str) -> ColumnElement:
+        """Match values containing or resembling `term`, for names."""
+
+    def rank(self, column, term: str) -> ColumnElement:
+        """Order matches from `similar`, exact matches first."""
+        return case(
+            (func.lower(column) == term.lower(), RANK_EXACT),
+            (column.ilike(f"{escape_like(term)}%", escape="\\"), RANK_PREFIX),
+            (self.contains(column, term), RANK_SUBSTRING),
+            else_=RANK_FUZZY,
+        )
+
+
+class TrigramSearchBackend(SearchBackend):
+    """Uses the `pg_trgm` GIN indexes, which serve both `ILIKE '%term%'` and
+    the `%` similarity operator, so neither scans the table.
+    """
+
+    def similar(self, column, term: str) -> ColumnElement:
+        return or_(self.contains(column, term), column.op("%")(term))
+
+
+class LikeSearchBackend(SearchBackend):
+    """Fallback for databases without trigram support, e.g. SQLite in tests.
+    Only substring matches are found.
+    """
+
+    def similar(self, column, term: str) -> ColumnElement:
+        return self.contains(column, term)
+
+
+def get_search_backend() -> SearchBackend:
+    if db.session.get_bind().dialect.name == "postgresql":
+        return TrigramSearchBackend()
+    return LikeSearchBackend()
+
+
+def officer_name_rank(
+    first_name: Optional[str], last_name: Optional[str]
+) -> Optional[ColumnElement]:
+    """Rank officers by how closely they match the searched names, or return
+    `None` if no name was searched.
+    """
+    backend = get_search_backend()
+    ranks = [
+        backend.rank(column, term)
+        for column, term in (
+            (Officer.first_name, first_name),
+            (Officer.last_name, last_name),
+        )
+        if term
+    ]
+    if not ranks:
+        return None
+    return sum(ranks[1:], ranks[0])
@@ -0,0 +1,156 @@
+from datetime import datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple, Type
+from xml.sax.saxutils import escape
+
+from flask import current_app, url_for
+from sqlalchemy import func, select
+from sqlalchemy.orm import load_only
+
+from OpenOversight.app.models.database import (
+    BaseModel,
+    Incident,
+    Officer,
+    SitemapShard,
+    db,
+)
+from OpenOversight.app.utils.constants import SITEMAP_BATCH_SIZE, SITEMAP_SHARD_SIZE
+
+
+SITEMAP_XML_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n'
+SITEMAP_XMLNS = 'xmlns="http://www.sitemaps.org/schemas/sitemap/0.9"'
+
+
+class SitemapSource(NamedTuple):
+    """A table with one page per row, listed in sharded sitemap files."""
+
+    name: str
+    model: Type[BaseModel]
+    endpoint: str
+    id_arg: str
+
+
+SITEMAP_SOURCES = {
+    source.name: source
+    for source in (
+        SitemapSource("officers", Officer, "main.officer_profile", "officer_id"),
+        SitemapSource("incidents", Incident, "main.incident_api", "obj_id"),
+    )
+}
+
+
+def _format_lastmod(lastmod: Optional[datetime]) -> str:
+    if lastmod is None:
+        return ""
+    return f"<lastmod>{lastmod.date().isoformat()}</lastmod>"
+
+
+def _external_url(endpoint: str, **values) -> str:
+    return escape(
+        url_for(
+            endpoint,
+            _external=True,
+            _scheme=current_app.config["SITEMAP_URL_SCHEME"],
+            **values,
+        )
+    )
+
+
+def shard_summaries(
+    source: SitemapSource,
+) -> Dict[int, Tuple[int, Optional[datetime]]]:
+    """Count the rows of each shard and find when they last changed.
+
+    Shards hold fixed ranges of ids, so a shard only changes when one of its
+    own rows is added, edited or deleted.
+    """
+    model = source.model
+    number = (model.id // SITEMAP_SHARD_SIZE).label("number")
+    rows = db.session.execute(
+        select(number, func.count(), func.max(model.last_updated_at)).group_by(number)
+    )
+    return {number: (url_count, lastmod) for number, url_count, lastmod in rows}
+
+
+def render_shard(source: SitemapSource, number: int) -> str:
+    """Build the sitemap file for one shard, reading only the id and last update
+    of its rows in batches.
+    """
+    model = source.model
+    first_id = number * SITEMAP_SHARD_SIZE
+    rows = db.session.execute(
+        select(model.id, model.last_updated_at)
+        .where(model.id >= first_id, model.id < first_id + SITEMAP_SHARD_SIZE)
+        .order_by(model.id)
+        .execution_options(yield_per=SITEMAP_BATCH_SIZE)
+    )
+    parts = [SITEMAP_XML_HEADER, f"<urlset {SITEMAP_XMLNS}>\n"]
+    for obj_id, last_updated_at in rows:
+        url = _external_url(source.endpoint, **{source.id_arg: obj_id})
+        parts.append(f"<url><loc>{url}</loc>{_format_lastmod(last_updated_at)}</url>\n")
+    parts.append("</urlset>\n")
+    return "".join(parts)
+
+
+def refresh_sitemap_shards(
+    sources: Optional[Iterable[SitemapSource]] = None,
+) -> List[SitemapShard]:
+    """Rebuild the stored shards whose rows changed since they were built, and
+    drop the shards that no longer have rows. Returns the rebuilt shards.
+    """
+    rebuilt = []
+    for source in sources or SITEMAP_SOURCES.values():
+        stored = {
+            shard.number: shard
+            for shard in SitemapShard.query.filter_by(source=source.name).options(
+                load_only(
+                    SitemapShard.source,
+                    SitemapShard.number,
+                    SitemapShard.url_count,
+                    SitemapShard.lastmod,
+                )
+            )
+        }
+        for number, (url_count, lastmod) in sorted(shard_summaries(source).items()):
+            shard = stored.pop(number, None)
+            if (
+                shard is not None
+                and shard.url_count == url_count
+                and shard.lastmod == lastmod
+            ):
+                continue
+            content = render_shard(source, number)
+            if shard is None:
+                shard = SitemapShard(source=source.name, number=number)
+                db.session.add(shard)
+            shard.url_count = url_count
+            shard.lastmod = lastmod
+            shard.content = content
+            # Commit each shard so only one is held in memory
+            db.session.commit()
+            rebuilt.append(shard)
+
+        for shard in stored.values():
+            db.session.delete(shard)
+        db.session.commit()
+    return rebuilt
+
+
+def render_sitemap_index() -> str:
+    """List the pages sitemap and every stored shard, without reading the shards'
+    contents or the tables they cover.
+    """
+    parts = [
+        SITEMAP_XML_HEADER,
+        f"<sitemapindex {SITEMAP_XMLNS}>\n",
+        f"<sitemap><loc>{_external_url('flask_sitemap.sitemap')}</loc></sitemap>\n",
+    ]
+    rows = db.session.execute(
+        select(SitemapShard.source, SitemapShard.number, SitemapShard.lastmod).order_by(
+            SitemapShard.source, SitemapShard.number
+        )
+    )
+    for source, number, lastmod in rows:
+        url = _external_url("main.sitemap_shard", source=source, number=number)
+        parts.append(f"<sitemap><loc>{url}</loc>{_format_lastmod(lastmod)}</sitemap>\n")
+    parts.append("</sitemapindex>\n")
+    return "".join(parts)
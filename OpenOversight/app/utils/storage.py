@@ -0,0 +1,247 @@
+import os
+import shutil
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from io import BufferedIOBase
+from typing import BinaryIO, Iterable, List, Optional
+from urllib.parse import quote, unquote
+
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from flask import Flask, current_app
+
+from OpenOversight.app.utils.constants import (
+    IMAGE_STORAGE_CHUNK_SIZE,
+    KEY_IMAGE_STORAGE_BACKEND,
+    KEY_IMAGE_STORAGE_LOCAL,
+    KEY_IMAGE_STORAGE_PATH,
+    KEY_S3_BUCKET_NAME,
+    KEY_S3_MAX_POOL_CONNECTIONS,
+    MEGABYTE,
+    S3_DELETE_BATCH_SIZE,
+)
+
+
+IMAGE_STORAGE_EXTENSION = "image_storage"
+
+
+class ImageStorage(ABC):
+    """Base class to define where uploaded images are stored."""
+
+    @abstractmethod
+    def public_url(self, key: str) -> str:
+        """The URL the stored file under `key` is served from."""
+
+    @abstractmethod
+    def upload(self, file_obj: BinaryIO, key: str, content_type: str) -> str:
+        """Store `file_obj` under `key` and return its public URL."""
+
+    @abstractmethod
+    def upload_multipart(
+        self, chunks: Iterable[bytes], key: str, content_type: str
+    ) -> str:
+        """Store the concatenated `chunks` under `key` without holding the whole
+        file in memory, and return its public URL.
+        """
+
+    @abstractmethod
+    def delete_many(self, keys: Iterable[str]) -> None:
+        """Remove the files stored under `keys`, ignoring missing ones."""
+
+    @abstractmethod
+    def download(self, key: str, file_obj: BufferedIOBase) -> None:
+        """Write the file stored under `key` to `file_obj`."""
+
+    def key_from_url(self, url: str) -> Optional[str]:
+        """The key of a file served from `url`, if it is stored here."""
+        prefix = self.public_url("")
+        if not url.startswith(prefix):
+            return None
+        return unquote(url[len(prefix) :])
+
+
+class S3ImageStorage(ImageStorage):
+    """Stores images in a public-read S3 bucket.
+
+    Create it once per worker with `init_image_storage`: it shares one client,
+    and so one connection pool, between every upload. A new client is created
+    in forked processes since connections cannot be shared with the parent.
+    """
+
+    def __init__(
+        self,
+        bucket: str,
+        endpoint_url: Optional[str] = None,
+        region_name: Optional[str] = None,
+        max_pool_connections: int = 10,
+        multipart_threshold: int = 8 * MEGABYTE,
+        client=None,
+    ):
+        self.bucket = bucket
+        self.endpoint_url = endpoint_url
+        self.region_name = region_name
+        self.max_pool_connections = max_pool_connections
+        self.transfer_config = TransferConfig(
+            multipart_threshold=multipart_threshold,
+            multipart_chunksize=multipart_threshold,
+            max_concurrency=max_pool_connections,
+        )
+        self._client = client
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        with self._lock:
+            if self._client is None or self._pid != os.getpid():
+                self._client = boto3.client(
+                    "s3",
+                    endpoint_url=self.endpoint_url,
+                    region_name=self.region_name,
+                    config=Config(max_pool_connections=self.max_pool_connections),
+                )
+                self._pid = os.getpid()
+            return self._client
+
+    def public_url(self, key: str) -> str:
+        key = quote(key, safe="/")
+        if self.endpoint_url:
+            # S3-compatible servers such as MinIO use path-style URLs
+            return f"{self.endpoint_url.rstrip('/')}/{self.bucket}/{key}"
+        region = self.region_name or self.client.meta.region_name
+        return f"https://{self.bucket}.s3.{region}.amazonaws.com/{key}"
+
+    def upload(self, file_obj: BinaryIO, key: str, content_type: str) -> str:
+        # Large files are split into parts uploaded in parallel
+        self.client.upload_fileobj(
+            file_obj,
+            self.bucket,
+            key,
+            ExtraArgs={"ContentType": content_type, "ACL": "public-read"},
+            Config=self.transfer_config,
+        )
+        return self.public_url(key)
+
+    def upload_multipart(
+        self, chunks: Iterable[bytes], key: str, content_type: str
+    ) -> str:
+        upload_id = self.client.create_multipart_upload(
+            Bucket=self.bucket, Key=key, ContentType=content_type, ACL="public-read"
+        )["UploadId"]
+        try:
+            parts = []
+            for number, chunk in enumerate(chunks, start=1):
+                response = self.client.upload_part(
+                    Bucket=self.bucket,
+                    Key=key,
+                    UploadId=upload_id,
+                    PartNumber=number,
+                    Body=chunk,
+                )
+                parts.append({"ETag": response["ETag"], "PartNumber": number})
+            self.client.complete_multipart_upload(
+                Bucket=self.bucket,
+                Key=key,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": parts},
+            )
+        except Exception:
+            self.client.abort_multipart_upload(
+                Bucket=self.bucket, Key=key, UploadId=upload_id
+            )
+            raise
+        return self.public_url(key)
+
+    def delete_many(self, keys: Iterable[str]) -> None:
+        batch: List[str] = []
+        for key in keys:
+            batch.append(key)
+            if len(batch) == S3_DELETE_BATCH_SIZE:
+                self._delete_batch(batch)
+                batch = []
+        if batch:
+            self._delete_batch(batch)
+
+    def download(self, key: str, file_obj: BufferedIOBase) -> None:
+        self.client.download_fileobj(
+            self.bucket, key, file_obj, Config=self.transfer_config
+        )
+
+    def _delete_batch(self, keys: List[str]) -> None:
+        self.client.delete_objects(
+            Bucket=self.bucket,
+            Delete={"Objects": [{"Key": key} for key in keys], "Quiet": True},
+        )
+
+
+class LocalImageStorage(ImageStorage):
+    """Stores images in a local directory, for development and tests.
+
+    Files are served from `url_prefix`, e.g. a folder under the static files.
+    """
+
+    def __init__(self, directory: str, url_prefix: str):
+        self.directory = directory
+        self.url_prefix = url_prefix.rstrip("/")
+
+    def public_url(self, key: str) -> str:
+        return f"{self.url_prefix}/{quote(key, safe='/')}"
+
+    def _write(self, chunks: Iterable[bytes], key: str) -> str:
+        path = os.path.join(self.directory, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file first so readers never see a partial image
+        with tempfile.NamedTemporaryFile(
+            dir=os.path.dirname(path), delete=False
+        ) as temp_file:
+            for chunk in chunks:
+                temp_file.write(chunk)
+        os.replace(temp_file.name, path)
+        return self.public_url(key)
+
+    def upload(self, file_obj: BinaryIO, key: str, content_type: str) -> str:
+        return self._write(
+            iter(lambda: file_obj.read(IMAGE_STORAGE_CHUNK_SIZE), b""),
+            key,
+        )
+
+    def upload_multipart(
+        self, chunks: Iterable[bytes], key: str, content_type: str
+    ) -> str:
+        return self._write(chunks, key)
+
+    def delete_many(self, keys: Iterable[str]) -> None:
+        for key in keys:
+            try:
+                os.remove(os.path.join(self.directory, key))
+            except FileNotFoundError:
+                pass
+
+    def download(self, key: str, file_obj: BufferedIOBase) -> None:
+        with open(os.path.join(self.directory, key), "rb") as stored_file:
+            shutil.copyfileobj(stored_file, file_obj, IMAGE_STORAGE_CHUNK_SIZE)
+
+
+def create_image_storage(app: Flask) -> ImageStorage:
+    """Build the configured image storage, defaulting to S3."""
+    if app.config.get(KEY_IMAGE_STORAGE_BACKEND) == KEY_IMAGE_STORAGE_LOCAL:
+        directory = app.config.get(KEY_IMAGE_STORAGE_PATH) or os.path.join(
+            app.static_folder, "uploads"
+        )
+        return LocalImageStorage(directory, app.static_url_path + "/uploads")
+    return S3ImageStorage(
+        app.config[KEY_S3_BUCKET_NAME],
+        endpoint_url=app.config.get("AWS_ENDPOINT_URL"),
+        region_name=app.config.get("AWS_DEFAULT_REGION"),
+        max_pool_connections=app.config[KEY_S3_MAX_POOL_CONNECTIONS],
+    )
+
+
+def init_image_storage(app: Flask) -> None:
+    app.extensions[IMAGE_STORAGE_EXTENSION] = create_image_storage(app)
+
+
+def get_image_storage() -> ImageStorage:
+    return current_app.extensions[IMAGE_STORAGE_EXTENSION]
@@ -0,0 +1,288 @@
+import time
+from datetime import datetime, timedelta, timezone
+from io import BytesIO
+from typing import BinaryIO, Callable, Optional
+
+from flask import current_app
+from sqlalchemy import and_, or_
+from sqlalchemy.exc import IntegrityError
+
+from OpenOversight.app.models.database import Face, Image, UploadJob, db
+from OpenOversight.app.utils.cloud import crop_image, save_image_to_s3_and_db
+from OpenOversight.app.utils.constants import (
+    FACE_CROP_FAILED,
+    FACE_CROP_LEASE,
+    FACE_CROP_MAX_ATTEMPTS,
+    FACE_CROP_PENDING,
+    FACE_CROP_RUNNING,
+    UPLOAD_JOB_DONE,
+    UPLOAD_JOB_FAILED,
+    UPLOAD_JOB_LEASE,
+    UPLOAD_JOB_MAX_ATTEMPTS,
+    UPLOAD_JOB_PENDING,
+    UPLOAD_JOB_RUNNING,
+)
+
+
+def enqueue_upload(
+    file_obj: BinaryIO,
+    user_id: Optional[int],
+    department_id: int,
+    officer_id: Optional[int] = None,
+) -> UploadJob:
+    """Store the uploaded bytes to be processed by `flask ingest-uploads`."""
+    job = UploadJob(
+        data=file_obj.read(),
+        user_id=user_id,
+        department_id=department_id,
+        officer_id=officer_id,
+    )
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+
+def claim_upload_job() -> Optional[UploadJob]:
+    """Take the oldest pending job, skipping jobs claimed by other workers.
+
+    Running jobs whose worker has held them for longer than `UPLOAD_JOB_LEASE`,
+    e.g. because it was killed, are taken again, and fail once they have been
+    taken `UPLOAD_JOB_MAX_ATTEMPTS` times.
+    """
+    now = datetime.now(timezone.utc)
+    while True:
+        job = (
+            UploadJob.query.filter(
+                or_(
+                    UploadJob.status == UPLOAD_JOB_PENDING,
+                    and_(
+                        UploadJob.status == UPLOAD_JOB_RUNNING,
+                        UploadJob.claimed_at
+                        < now - timedelta(seconds=UPLOAD_JOB_LEASE),
+                    ),
+                )
+            )
+            .order_by(UploadJob.created_at)
+            .with_for_update(skip_locked=True)
+            .first()
+        )
+        if job is None:
+            db.session.commit()
+            return None
+        if job.attempts >= UPLOAD_JOB_MAX_ATTEMPTS:
+            _finish_upload_job(
+                job,
+                UPLOAD_JOB_FAILED,
+                error="Server error encountered. Try again later.",
+            )
+            continue
+        job.status = UPLOAD_JOB_RUNNING
+        job.claimed_at = now
+        job.attempts += 1
+        db.session.commit()
+        return job
+
+
+def _finish_upload_job(
+    job: UploadJob,
+    status: str,
+    image: Optional[Image] = None,
+    error: Optional[str] = None,
+) -> None:
+    job.status = status
+    job.image_id = image.id if image else None
+    job.error = error
+    job.data = None
+    job.finished_at = datetime.now(timezone.utc)
+    db.session.commit()
+
+
+def process_upload_job(job: UploadJob) -> None:
+    """Scrub, hash and store the uploaded image, and tag the officer it was
+    uploaded for.
+    """
+    try:
+        image = save_image_to_s3_and_db(
+            BytesIO(job.data), job.user_id, department_id=job.department_id
+        )
+    except ValueError:
+        # Raised if MIME type not allowed
+        current_app.logger.exception("Invalid data type!")
+        _finish_upload_job(job, UPLOAD_JOB_FAILED, error="Invalid data type!")
+        return
+    except Exception:
+        current_app.logger.exception(f"Error processing upload {job.id}")
+        db.session.rollback()
+        _finish_upload_job(
+            job, UPLOAD_JOB_FAILED, error="Server error encountered. Try again later."
+        )
+        return
+
+    if image is None:
+        _finish_upload_job(
+            job, UPLOAD_JOB_FAILED, error="Server error encountered. Try again later."
+        )
+        return
+
+    if job.officer_id:
+        image.is_tagged = True
+        image.contains_cops = True
+        # Photos identical to one the officer is already tagged in are not tagged
+        # again
+        if not Face.query.filter_by(officer_id=job.officer_id, img_id=image.id).first():
+            face = Face(
+                officer_id=job.officer_id,
+                # Assuming photos uploaded with an officer ID are already cropped,
+                # we set both images to the uploaded one
+                img_id=image.id,
+                original_image_id=image.id,
+                created_by=job.user_id,
+                last_updated_by=job.user_id,
+            )
+            db.session.add(face)
+    _finish_upload_job(job, UPLOAD_JOB_DONE, image=image)
+
+
+def claim_pending_face() -> Optional[Face]:
+    """Take the next face waiting to be cropped, skipping faces claimed by other
+    workers. Faces of the same photo come one after the other, so the decoded photo
+    is still cached by `crop_image`.
+
+    Running crops whose worker has held them for longer than `FACE_CROP_LEASE` are
+    taken again, and fail once they have been taken `FACE_CROP_MAX_ATTEMPTS` times.
+    """
+    now = datetime.now(timezone.utc)
+    while True:
+        face = (
+            Face.query.filter(
+                or_(
+                    Face.crop_status == FACE_CROP_PENDING,
+                    and_(
+                        Face.crop_status == FACE_CROP_RUNNING,
+                        Face.crop_claimed_at < now - timedelta(seconds=FACE_CROP_LEASE),
+                    ),
+                )
+            )
+            .order_by(Face.original_image_id, Face.id)
+            .with_for_update(skip_locked=True)
+            .first()
+        )
+        if face is None:
+            db.session.commit()
+            return None
+        if face.crop_attempts >= FACE_CROP_MAX_ATTEMPTS:
+            face.crop_status = FACE_CROP_FAILED
+            db.session.commit()
+            continue
+        face.crop_status = FACE_CROP_RUNNING
+        face.crop_claimed_at = now
+        face.crop_attempts += 1
+        db.session.commit()
+        return face
+
+
+def process_pending_face(face: Face) -> None:
+    """Crop the face out of the photo it was tagged in and show the crop. Crops
+    that could not be stored are tried again, up to `FACE_CROP_MAX_ATTEMPTS` times.
+    """
+    original_image = face.original_image
+    try:
+        cropped_image = crop_image(
+            original_image,
+            crop_data=(
+                face.face_position_x,
+                face.face_position_y,
+                face.face_position_x + face.face_width,
+                face.face_position_y + face.face_height,
+            ),
+            department_id=original_image.department_id,
+            user_id=face.created_by,
+        )
+    except Exception:
+        current_app.logger.exception(f"Error cropping face {face.id}")
+        db.session.rollback()
+        cropped_image = None
+
+    if cropped_image is None:
+        if face.crop_attempts >= FACE_CROP_MAX_ATTEMPTS:
+            face.crop_status = FACE_CROP_FAILED
+        else:
+            face.crop_status = FACE_CROP_PENDING
+        db.session.commit()
+        return
+
+    cropped_image.contains_cops = True
+    cropped_image.is_tagged = True
+    face.img_id = cropped_image.id
+    face.crop_status = None
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # The officer is already tagged with an identical crop
+        current_app.logger.exception(f"Error saving the crop of face {face.id}")
+        db.session.rollback()
+        face.crop_status = FACE_CROP_FAILED
+        db.session.commit()
+
+
+def retry_failed_faces() -> int:
+    """Queue the faces whose crop failed to be cropped again, returning how many."""
+    count = Face.query.filter(Face.crop_status == FACE_CROP_FAILED).update(
+        {Face.crop_status: FACE_CROP_PENDING, Face.crop_attempts: 0},
+        synchronize_session=False,
+    )
+    db.session.commit()
+    return count
+
+
+def _fail_claimed(description: str, fail: Callable[[], None]) -> None:
+    """Roll back the work on an upload or face crop whose processing raised, e.g.
+    at its final commit, and mark it failed so the worker goes on with the next
+    one. If that fails too, e.g. because the database connection dropped, it is
+    taken again once its lease runs out.
+    """
+    current_app.logger.exception(f"Error processing {description}")
+    db.session.rollback()
+    try:
+        fail()
+    except Exception:
+        current_app.logger.exception(f"Error marking {description} as failed")
+        db.session.rollback()
+
+
+def _fail_face_crop(face: Face) -> None:
+    face.crop_status = FACE_CROP_FAILED
+    db.session.commit()
+
+
+def run_upload_worker(poll_interval: float, exit_when_empty: bool = False) -> int:
+    """Process pending uploads and face crops as they come in, returning how many
+    were processed once both queues are empty if `exit_when_empty` is set.
+    """
+    processed = 0
+    while True:
+        if job := claim_upload_job():
+            job_id = job.id
+            try:
+                process_upload_job(job)
+            except Exception:
+                _fail_claimed(
+                    f"upload {job_id}",
+                    lambda: _finish_upload_job(
+                        job,
+                        UPLOAD_JOB_FAILED,
+                        error="Server error encountered. Try again later.",
+                    ),
+                )
+        elif face := claim_pending_face():
+            face_id = face.id
+            try:
+                process_pending_face(face)
+            except Exception:
+                _fail_claimed(f"face crop {face_id}", lambda: _fail_face_crop(face))
+        elif exit_when_empty:
+            return processed
+        else:
+            time.sleep(poll_interval)
+            continue
+        processed += 1
@@ -0,0 +1,51 @@
+"""add current_assignments table
+
+Revision ID: c4f1a2b3d5e6
+Revises: 5865f488470c
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+
+revision = "c4f1a2b3d5e6"
+down_revision = "5865f488470c"
+
+
+def upgrade():
+    op.create_table(
+        "current_assignments",
+        sa.Column("officer_id", sa.Integer(), nullable=False),
+        sa.Column("assignment_id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["officer_id"],
+            ["officers.id"],
+            name="current_assignments_officer_id_fkey",
+            ondelete="CASCADE",
+        ),
+        sa.ForeignKeyConstraint(
+            ["assignment_id"],
+            ["assignments.id"],
+            name="current_assignments_assignment_id_fkey",
+            ondelete="CASCADE",
+        ),
+        sa.PrimaryKeyConstraint("officer_id"),
+        sa.UniqueConstraint("assignment_id"),
+    )
+
+    # Backfill with the latest assignment of every officer
+    op.execute(
+        """
+        INSERT INTO current_assignments (officer_id, assignment_id)
+        SELECT DISTINCT ON (officer_id) officer_id, id
+        FROM assignments
+        WHERE officer_id IS NOT NULL
+        ORDER BY officer_id, start_date DESC NULLS LAST, id
+        """
+    )
+
+
+def downgrade():
+    op.drop_table("current_assignments")
@@ -0,0 +1,39 @@
+"""add trigram search indexes
+
+Revision ID: d7e2b9c4a1f0
+Revises: c4f1a2b3d5e6
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+
+from alembic import op
+
+
+revision = "d7e2b9c4a1f0"
+down_revision = "c4f1a2b3d5e6"
+
+
+TRIGRAM_INDEXES = [
+    ("officers", "last_name"),
+    ("officers", "first_name"),
+    ("officers", "unique_internal_identifier"),
+    ("assignments", "star_no"),
+]
+
+
+def upgrade():
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for table_name, column_name in TRIGRAM_INDEXES:
+        op.create_index(
+            f"ix_{table_name}_{column_name}_trgm",
+            table_name,
+            [column_name],
+            unique=False,
+            postgresql_using="gin",
+            postgresql_ops={column_name: "gin_trgm_ops"},
+        )
+
+
+def downgrade():
+    for table_name, column_name in TRIGRAM_INDEXES:
+        op.drop_index(f"ix_{table_name}_{column_name}_trgm", table_name=table_name)
@@ -0,0 +1,54 @@
+"""add random key to raw_images for the sorting and tagging queues
+
+Revision ID: e3a8c5d2f7b1
+Revises: d7e2b9c4a1f0
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+
+revision = "e3a8c5d2f7b1"
+down_revision = "d7e2b9c4a1f0"
+
+
+UNSORTED_IMAGES = "contains_cops IS NULL"
+UNTAGGED_IMAGES = "contains_cops = true AND is_tagged = false"
+
+
+def upgrade():
+    with op.batch_alter_table("raw_images", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("random_key", sa.Float(), nullable=True))
+
+    op.execute("UPDATE raw_images SET random_key = random()")
+
+    with op.batch_alter_table("raw_images", schema=None) as batch_op:
+        batch_op.alter_column("random_key", existing_type=sa.Float(), nullable=False)
+        batch_op.create_index(
+            "ix_raw_images_sort_queue",
+            ["department_id", "random_key"],
+            unique=False,
+            postgresql_where=sa.text(UNSORTED_IMAGES),
+        )
+        batch_op.create_index(
+            "ix_raw_images_tag_queue",
+            ["department_id", "random_key"],
+            unique=False,
+            postgresql_where=sa.text(UNTAGGED_IMAGES),
+        )
+        batch_op.create_index(
+            "ix_raw_images_all_tag_queue",
+            ["random_key"],
+            unique=False,
+            postgresql_where=sa.text(UNTAGGED_IMAGES),
+        )
+
+
+def downgrade():
+    with op.batch_alter_table("raw_images", schema=None) as batch_op:
+        batch_op.drop_index("ix_raw_images_all_tag_queue")
+        batch_op.drop_index("ix_raw_images_tag_queue")
+        batch_op.drop_index("ix_raw_images_sort_queue")
+        batch_op.drop_column("random_key")
@@ -0,0 +1,36 @@
+"""add sitemap_shards table
+
+Revision ID: f4b9d6e3a2c8
+Revises: e3a8c5d2f7b1
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+
+revision = "f4b9d6e3a2c8"
+down_revision = "e3a8c5d2f7b1"
+
+
+def upgrade():
+    op.create_table(
+        "sitemap_shards",
+        sa.Column("source", sa.String(length=50), nullable=False),
+        sa.Column("number", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("url_count", sa.Integer(), nullable=False),
+        sa.Column("lastmod", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("content", sa.Text(), nullable=False),
+        sa.Column(
+            "built_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint("source", "number"),
+    )
+
+
+def downgrade():
+    op.drop_table("sitemap_shards")
@@ -0,0 +1,70 @@
+"""add upload_jobs table
+
+Revision ID: a5c0e7f4b3d9
+Revises: f4b9d6e3a2c8
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+
+revision = "a5c0e7f4b3d9"
+down_revision = "f4b9d6e3a2c8"
+
+
+def upgrade():
+    op.create_table(
+        "upload_jobs",
+        sa.Column("id", sa.String(length=36), nullable=False),
+        sa.Column("status", sa.String(length=10), nullable=False),
+        sa.Column("data", sa.LargeBinary(), nullable=True),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("department_id", sa.Integer(), nullable=True),
+        sa.Column("officer_id", sa.Integer(), nullable=True),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.Column("image_id", sa.Integer(), nullable=True),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.Column("finished_at", sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["department_id"],
+            ["departments.id"],
+            name="upload_jobs_department_id_fkey",
+        ),
+        sa.ForeignKeyConstraint(
+            ["officer_id"],
+            ["officers.id"],
+            name="upload_jobs_officer_id_fkey",
+            ondelete="CASCADE",
+        ),
+        sa.ForeignKeyConstraint(
+            ["user_id"],
+            ["users.id"],
+            name="upload_jobs_user_id_fkey",
+            ondelete="SET NULL",
+        ),
+        sa.ForeignKeyConstraint(
+            ["image_id"],
+            ["raw_images.id"],
+            name="upload_jobs_image_id_fkey",
+            ondelete="SET NULL",
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_upload_jobs_status_created_at",
+        "upload_jobs",
+        ["status", "created_at"],
+        unique=False,
+    )
+
+
+def downgrade():
+    op.drop_index("ix_upload_jobs_status_created_at", table_name="upload_jobs")
+    op.drop_table("upload_jobs")
@@ -0,0 +1,36 @@
+"""add image_variants table
+
+Revision ID: b6d1f8a5c4e0
+Revises: a5c0e7f4b3d9
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+
+revision = "b6d1f8a5c4e0"
+down_revision = "a5c0e7f4b3d9"
+
+
+def upgrade():
+    op.create_table(
+        "image_variants",
+        sa.Column("image_id", sa.Integer(), nullable=False),
+        sa.Column("size", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("filepath", sa.String(length=255), nullable=False),
+        sa.Column("width", sa.Integer(), nullable=False),
+        sa.Column("height", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["image_id"],
+            ["raw_images.id"],
+            name="image_variants_image_id_fkey",
+            ondelete="CASCADE",
+        ),
+        sa.PrimaryKeyConstraint("image_id", "size"),
+    )
+
+
+def downgrade():
+    op.drop_table("image_variants")
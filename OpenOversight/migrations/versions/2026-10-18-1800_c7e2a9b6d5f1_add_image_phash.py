@@ -0,0 +1,44 @@
+"""add perceptual hashes of images
+
+Revision ID: c7e2a9b6d5f1
+Revises: b6d1f8a5c4e0
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+
+revision = "c7e2a9b6d5f1"
+down_revision = "b6d1f8a5c4e0"
+
+
+def upgrade():
+    with op.batch_alter_table("raw_images", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("phash", sa.BigInteger(), nullable=True))
+        batch_op.create_index(
+            batch_op.f("ix_raw_images_hash_img"), ["hash_img"], unique=False
+        )
+
+    op.create_table(
+        "image_phash_bands",
+        sa.Column("band", sa.SmallInteger(), autoincrement=False, nullable=False),
+        sa.Column("value", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("image_id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["image_id"],
+            ["raw_images.id"],
+            name="image_phash_bands_image_id_fkey",
+            ondelete="CASCADE",
+        ),
+        sa.PrimaryKeyConstraint("band", "value", "image_id"),
+    )
+
+
+def downgrade():
+    op.drop_table("image_phash_bands")
+
+    with op.batch_alter_table("raw_images", schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f("ix_raw_images_hash_img"))
+        batch_op.drop_column("phash")
@@ -0,0 +1,37 @@
+"""add crop_status to faces
+
+Revision ID: d8f3b0c7e6a2
+Revises: c7e2a9b6d5f1
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+
+revision = "d8f3b0c7e6a2"
+down_revision = "c7e2a9b6d5f1"
+
+
+PENDING_FACE_CROPS = "crop_status = 'pending'"
+
+
+def upgrade():
+    with op.batch_alter_table("faces", schema=None) as batch_op:
+        batch_op.add_column(
+            sa.Column("crop_status", sa.String(length=10), nullable=True)
+        )
+        batch_op.create_index(
+            "ix_faces_crop_queue",
+            ["original_image_id", "id"],
+            unique=False,
+            postgresql_where=sa.text(PENDING_FACE_CROPS),
+            sqlite_where=sa.text(PENDING_FACE_CROPS),
+        )
+
+
+def downgrade():
+    with op.batch_alter_table("faces", schema=None) as batch_op:
+        batch_op.drop_index("ix_faces_crop_queue")
+        batch_op.drop_column("crop_status")
@@ -0,0 +1,87 @@
+"""add department_statistics table
+
+Revision ID: e9a4c1d8f7b3
+Revises: d8f3b0c7e6a2
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+
+revision = "e9a4c1d8f7b3"
+down_revision = "d8f3b0c7e6a2"
+
+
+def upgrade():
+    op.create_table(
+        "department_statistics",
+        sa.Column("department_id", sa.Integer(), nullable=False),
+        sa.Column("officer_count", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("assignment_count", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("incident_count", sa.Integer(), server_default="0", nullable=False),
+        sa.Column(
+            "officers_last_updated_at", sa.DateTime(timezone=True), nullable=True
+        ),
+        sa.Column(
+            "assignments_last_updated_at", sa.DateTime(timezone=True), nullable=True
+        ),
+        sa.Column(
+            "incidents_last_updated_at", sa.DateTime(timezone=True), nullable=True
+        ),
+        sa.ForeignKeyConstraint(
+            ["department_id"],
+            ["departments.id"],
+            name="department_statistics_department_id_fkey",
+            ondelete="CASCADE",
+        ),
+        sa.PrimaryKeyConstraint("department_id"),
+    )
+
+    # Backfill the statistics of every department
+    op.execute(
+        """
+        INSERT INTO department_statistics (
+            department_id,
+            officer_count,
+            assignment_count,
+            incident_count,
+            officers_last_updated_at,
+            assignments_last_updated_at,
+            incidents_last_updated_at
+        )
+        SELECT
+            departments.id,
+            COALESCE(officer_stats.count, 0),
+            COALESCE(assignment_stats.count, 0),
+            COALESCE(incident_stats.count, 0),
+            officer_stats.last_updated_at,
+            assignment_stats.last_updated_at,
+            incident_stats.last_updated_at
+        FROM departments
+        LEFT JOIN (
+            SELECT department_id, COUNT(*), MAX(last_updated_at) AS last_updated_at
+            FROM officers
+            GROUP BY department_id
+        ) AS officer_stats ON officer_stats.department_id = departments.id
+        LEFT JOIN (
+            SELECT
+                officers.department_id,
+                COUNT(*),
+                MAX(assignments.last_updated_at) AS last_updated_at
+            FROM assignments
+            JOIN officers ON officers.id = assignments.officer_id
+            GROUP BY officers.department_id
+        ) AS assignment_stats ON assignment_stats.department_id = departments.id
+        LEFT JOIN (
+            SELECT department_id, COUNT(*), MAX(last_updated_at) AS last_updated_at
+            FROM incidents
+            GROUP BY department_id
+        ) AS incident_stats ON incident_stats.department_id = departments.id
+        """
+    )
+
+
+def downgrade():
+    op.drop_table("department_statistics")
@@ -0,0 +1,63 @@
+"""add user_contributions table
+
+Revision ID: f0b5d2e9a8c4
+Revises: e9a4c1d8f7b3
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+
+revision = "f0b5d2e9a8c4"
+down_revision = "e9a4c1d8f7b3"
+
+
+def upgrade():
+    op.create_table(
+        "user_contributions",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("image_count", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("face_count", sa.Integer(), server_default="0", nullable=False),
+        sa.ForeignKeyConstraint(
+            ["user_id"],
+            ["users.id"],
+            name="user_contributions_user_id_fkey",
+            ondelete="CASCADE",
+        ),
+        sa.PrimaryKeyConstraint("user_id"),
+    )
+    with op.batch_alter_table("user_contributions", schema=None) as batch_op:
+        batch_op.create_index(
+            "ix_user_contributions_image_count",
+            ["image_count", "user_id"],
+            unique=False,
+        )
+        batch_op.create_index(
+            "ix_user_contributions_face_count",
+            ["face_count", "user_id"],
+            unique=False,
+        )
+
+    # Backfill the counters of every user
+    op.execute(
+        """
+        INSERT INTO user_contributions (user_id, image_count, face_count)
+        SELECT
+            users.id,
+            COALESCE(image_counts.count, 0),
+            COALESCE(face_counts.count, 0)
+        FROM users
+        LEFT JOIN (
+            SELECT created_by, COUNT(*) FROM raw_images GROUP BY created_by
+        ) AS image_counts ON image_counts.created_by = users.id
+        LEFT JOIN (
+            SELECT created_by, COUNT(*) FROM faces GROUP BY created_by
+        ) AS face_counts ON face_counts.created_by = users.id
+        """
+    )
+
+
+def downgrade():
+    op.drop_table("user_contributions")
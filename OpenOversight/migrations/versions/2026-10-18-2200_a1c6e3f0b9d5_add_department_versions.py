@@ -0,0 +1,33 @@
+"""add version to department_statistics
+
+Revision ID: a1c6e3f0b9d5
+Revises: f0b5d2e9a8c4
+Create Date: 2026-10-18 22:00:00.000000
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+
+revision = "a1c6e3f0b9d5"
+down_revision = "f0b5d2e9a8c4"
+
+
+def upgrade():
+    with op.batch_alter_table("department_statistics", schema=None) as batch_op:
+        batch_op.add_column(
+            sa.Column("version", sa.Integer(), server_default="0", nullable=False)
+        )
+        batch_op.add_column(
+            sa.Column("changed_at", sa.DateTime(timezone=True), nullable=True)
+        )
+
+    # Pages cached by clients before the upgrade carry no version
+    op.execute("UPDATE department_statistics SET changed_at = now()")
+
+
+def downgrade():
+    with op.batch_alter_table("department_statistics", schema=None) as batch_op:
+        batch_op.drop_column("changed_at")
+        batch_op.drop_column("version")
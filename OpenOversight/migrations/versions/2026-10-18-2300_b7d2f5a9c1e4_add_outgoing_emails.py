@@ -0,0 +1,55 @@
+"""add outgoing_emails table
+
+Revision ID: b7d2f5a9c1e4
+Revises: a1c6e3f0b9d5
+Create Date: 2026-10-18 23:00:00.000000
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+
+revision = "b7d2f5a9c1e4"
+down_revision = "a1c6e3f0b9d5"
+
+
+def upgrade():
+    op.create_table(
+        "outgoing_emails",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("status", sa.String(length=10), nullable=False),
+        sa.Column("receiver", sa.String(length=255), nullable=False),
+        sa.Column("subject", sa.String(length=255), nullable=False),
+        sa.Column("body", sa.Text(), nullable=True),
+        sa.Column("html", sa.Text(), nullable=True),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.Column(
+            "next_attempt_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.Column("sent_at", sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_outgoing_emails_status_next_attempt_at",
+        "outgoing_emails",
+        ["status", "next_attempt_at"],
+        unique=False,
+    )
+
+
+def downgrade():
+    op.drop_index(
+        "ix_outgoing_emails_status_next_attempt_at", table_name="outgoing_emails"
+    )
+    op.drop_table("outgoing_emails")
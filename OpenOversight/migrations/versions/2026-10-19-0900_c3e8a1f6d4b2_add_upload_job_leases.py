@@ -0,0 +1,33 @@
+"""add claimed_at and attempts to upload_jobs
+
+Revision ID: c3e8a1f6d4b2
+Revises: b7d2f5a9c1e4
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+
+revision = "c3e8a1f6d4b2"
+down_revision = "b7d2f5a9c1e4"
+
+
+def upgrade():
+    with op.batch_alter_table("upload_jobs", schema=None) as batch_op:
+        batch_op.add_column(
+            sa.Column("claimed_at", sa.DateTime(timezone=True), nullable=True)
+        )
+        batch_op.add_column(
+            sa.Column("attempts", sa.Integer(), server_default="0", nullable=False)
+        )
+
+    # Running jobs are retried once their lease runs out
+    op.execute("UPDATE upload_jobs SET claimed_at = now() WHERE status = 'running'")
+
+
+def downgrade():
+    with op.batch_alter_table("upload_jobs", schema=None) as batch_op:
+        batch_op.drop_column("attempts")
+        batch_op.drop_column("claimed_at")
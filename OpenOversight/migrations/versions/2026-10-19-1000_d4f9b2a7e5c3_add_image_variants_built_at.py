@@ -0,0 +1,35 @@
+"""add variants_built_at to raw_images
+
+Revision ID: d4f9b2a7e5c3
+Revises: c3e8a1f6d4b2
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+
+revision = "d4f9b2a7e5c3"
+down_revision = "c3e8a1f6d4b2"
+
+
+def upgrade():
+    with op.batch_alter_table("raw_images", schema=None) as batch_op:
+        batch_op.add_column(
+            sa.Column("variants_built_at", sa.DateTime(timezone=True), nullable=True)
+        )
+
+    op.execute(
+        """
+        UPDATE raw_images SET variants_built_at = now()
+        WHERE EXISTS (
+            SELECT 1 FROM image_variants WHERE image_variants.image_id = raw_images.id
+        )
+        """
+    )
+
+
+def downgrade():
+    with op.batch_alter_table("raw_images", schema=None) as batch_op:
+        batch_op.drop_column("variants_built_at")
@@ -0,0 +1,36 @@
+"""add near_duplicate_of_id to raw_images
+
+Revision ID: e6a1c3d8f2b9
+Revises: d4f9b2a7e5c3
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+
+revision = "e6a1c3d8f2b9"
+down_revision = "d4f9b2a7e5c3"
+
+
+def upgrade():
+    with op.batch_alter_table("raw_images", schema=None) as batch_op:
+        batch_op.add_column(
+            sa.Column("near_duplicate_of_id", sa.Integer(), nullable=True)
+        )
+        batch_op.create_foreign_key(
+            "raw_images_near_duplicate_of_id_fkey",
+            "raw_images",
+            ["near_duplicate_of_id"],
+            ["id"],
+            ondelete="SET NULL",
+        )
+
+
+def downgrade():
+    with op.batch_alter_table("raw_images", schema=None) as batch_op:
+        batch_op.drop_constraint(
+            "raw_images_near_duplicate_of_id_fkey", type_="foreignkey"
+        )
+        batch_op.drop_column("near_duplicate_of_id")
@@ -0,0 +1,53 @@
+"""add crop_claimed_at and crop_attempts to faces
+
+Revision ID: f2b7d4e9a1c6
+Revises: e6a1c3d8f2b9
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+
+revision = "f2b7d4e9a1c6"
+down_revision = "e6a1c3d8f2b9"
+
+
+PENDING_FACE_CROPS = "crop_status = 'pending'"
+QUEUED_FACE_CROPS = "crop_status IN ('pending', 'running')"
+
+
+def upgrade():
+    with op.batch_alter_table("faces", schema=None) as batch_op:
+        batch_op.add_column(
+            sa.Column("crop_claimed_at", sa.DateTime(timezone=True), nullable=True)
+        )
+        batch_op.add_column(
+            sa.Column("crop_attempts", sa.Integer(), server_default="0", nullable=False)
+        )
+        # Running crops are also taken once their lease runs out
+        batch_op.drop_index("ix_faces_crop_queue")
+        batch_op.create_index(
+            "ix_faces_crop_queue",
+            ["original_image_id", "id"],
+            unique=False,
+            postgresql_where=sa.text(QUEUED_FACE_CROPS),
+            sqlite_where=sa.text(QUEUED_FACE_CROPS),
+        )
+
+    op.execute("UPDATE faces SET crop_claimed_at = now() WHERE crop_status = 'running'")
+
+
+def downgrade():
+    with op.batch_alter_table("faces", schema=None) as batch_op:
+        batch_op.drop_index("ix_faces_crop_queue")
+        batch_op.create_index(
+            "ix_faces_crop_queue",
+            ["original_image_id", "id"],
+            unique=False,
+            postgresql_where=sa.text(PENDING_FACE_CROPS),
+            sqlite_where=sa.text(PENDING_FACE_CROPS),
+        )
+        batch_op.drop_column("crop_attempts")
+        batch_op.drop_column("crop_claimed_at")
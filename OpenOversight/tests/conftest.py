@@ -5,11 +5,12 @@ import random
 import sys
 import threading
 import uuid
+from contextlib import contextmanager
 from datetime import date, datetime, time, timedelta
 from decimal import Decimal
 from io import BytesIO
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 
 import pytest
 from faker import Faker
@@ -18,6 +19,7 @@ from PIL import Image as Pimage
 from selenium.webdriver.firefox.options import Options as FirefoxOptions
 from selenium.webdriver.firefox.service import Service as FirefoxService
 from selenium.webdriver.firefox.webdriver import WebDriver as Firefox
+from sqlalchemy import event
 from sqlalchemy.orm import scoped_session, sessionmaker
 from webdriver_manager.firefox import GeckoDriverManager
 
@@ -40,9 +42,18 @@ from OpenOversight.app.models.database import (
     User,
 )
 from OpenOversight.app.models.database import db as _db
+from OpenOversight.app.models.database import refresh_current_assignments
+from OpenOversight.app.models.database_cache import DB_CACHE
+from OpenOversight.app.models.users import remove_user_snapshots
 from OpenOversight.app.utils.choices import DEPARTMENT_STATE_CHOICES, SUFFIX_CHOICES
-from OpenOversight.app.utils.constants import ENCODING_UTF_8, KEY_NUM_OFFICERS
+from OpenOversight.app.utils.constants import (
+    ENCODING_UTF_8,
+    KEY_NUM_OFFICERS,
+    KEY_USER_SNAPSHOT,
+)
+from OpenOversight.app.utils.fragments import FRAGMENT_CACHE
 from OpenOversight.app.utils.general import merge_dicts
+from OpenOversight.app.utils.storage import IMAGE_STORAGE_EXTENSION, S3ImageStorage
 from OpenOversight.tests.constants import (
     AC_USER_EMAIL,
     AC_USER_PASSWORD,
@@ -319,6 +330,12 @@ def session(db):
             # If an error was raised during test, tx is already rolled back
             if tx.is_active:
                 tx.rollback()
+            # Fragments are keyed by department versions, which the rollback reuses
+            FRAGMENT_CACHE.clear()
+            # Users are cached by uuid, which the rollback may restore
+            remove_user_snapshots(
+                key[0] for key in list(DB_CACHE) if KEY_USER_SNAPSHOT in key
+            )
 
 
 @pytest.fixture
@@ -613,6 +630,7 @@ def add_mockdata(session):
     session.add_all(salaries)
     session.add_all(faces1)
     session.add_all(faces2)
+    refresh_current_assignments()
 
     test_addresses = [
         Location(
@@ -870,6 +888,91 @@ def client(app):
         yield client
 
 
+class FakeS3Client:
+    """In-memory stand-in for the boto3 S3 client calls used by `S3ImageStorage`,
+    so uploads can be tested without an S3 server.
+    """
+
+    def __init__(self, region_name: str = "us-west-2"):
+        self.meta = type("Meta", (), {"region_name": region_name})()
+        self.objects: Dict[Tuple[str, str], dict] = {}
+        self.multipart_uploads: Dict[str, dict] = {}
+        self.calls: List[str] = []
+
+    def upload_fileobj(self, file_obj, bucket, key, ExtraArgs=None, Config=None):
+        self.calls.append("upload_fileobj")
+        self.objects[(bucket, key)] = dict(ExtraArgs or {}, Body=file_obj.read())
+
+    def create_multipart_upload(self, Bucket, Key, **kwargs):
+        self.calls.append("create_multipart_upload")
+        upload_id = str(uuid.uuid4())
+        self.multipart_uploads[upload_id] = dict(kwargs, Key=Key, Parts={})
+        return {"UploadId": upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        self.calls.append("upload_part")
+        self.multipart_uploads[UploadId]["Parts"][PartNumber] = Body
+        return {"ETag": f'"{UploadId}-{PartNumber}"'}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        self.calls.append("complete_multipart_upload")
+        upload = self.multipart_uploads.pop(UploadId)
+        parts = upload.pop("Parts")
+        upload.pop("Key")
+        body = b"".join(parts[part["PartNumber"]] for part in MultipartUpload["Parts"])
+        self.objects[(Bucket, Key)] = dict(upload, Body=body)
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.calls.append("abort_multipart_upload")
+        self.multipart_uploads.pop(UploadId, None)
+
+    def delete_objects(self, Bucket, Delete):
+        self.calls.append("delete_objects")
+        assert len(Delete["Objects"]) <= 1000
+        for obj in Delete["Objects"]:
+            self.objects.pop((Bucket, obj["Key"]), None)
+        return {}
+
+
+@pytest.fixture
+def fake_s3_client():
+    return FakeS3Client()
+
+
+@pytest.fixture
+def s3_storage(fake_s3_client, monkeypatch):
+    """Store uploads in an in-memory S3 bucket for the duration of the test."""
+    storage = S3ImageStorage(
+        "some-bucket", region_name="us-west-2", client=fake_s3_client
+    )
+    monkeypatch.setitem(current_app.extensions, IMAGE_STORAGE_EXTENSION, storage)
+    return storage
+
+
+@pytest.fixture
+def max_sql_statements(session):
+    """Assert that the wrapped block executes at most `limit` SQL statements.
+
+    Yields the list of statements executed, to compare between renders.
+    """
+
+    @contextmanager
+    def _max_sql_statements(limit: int):
+        statements: List[str] = []
+
+        def record_statement(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(_db.engine, "before_cursor_execute", record_statement)
+        try:
+            yield statements
+        finally:
+            event.remove(_db.engine, "before_cursor_execute", record_statement)
+        assert len(statements) <= limit, "\n\n".join(statements)
+
+    return _max_sql_statements
+
+
 @pytest.fixture(scope="session")
 def worker_number(worker_id):
     if len(worker_id) < 2 or worker_id[:2] != "gw":
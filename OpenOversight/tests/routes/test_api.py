@@ -0,0 +1,175 @@
+# Routing and view tests for the data API
+import json
+from datetime import datetime, timedelta, timezone
+from http import HTTPStatus
+
+import pytest
+from flask import current_app, url_for
+
+from OpenOversight.app.models.database import (
+    Assignment,
+    Department,
+    Incident,
+    Officer,
+    Salary,
+)
+from OpenOversight.app.utils.constants import MIMETYPE_NDJSON
+
+
+def _api_url(department_id, resource, **kwargs):
+    return url_for(
+        "api.department_records",
+        department_id=department_id,
+        resource=resource,
+        **kwargs,
+    )
+
+
+@pytest.mark.parametrize(
+    "resource, model, department_column",
+    [
+        ("officers", Officer, Officer.department_id),
+        ("assignments", Assignment, Officer.department_id),
+        ("incidents", Incident, Incident.department_id),
+        ("salaries", Salary, Officer.department_id),
+    ],
+)
+def test_api_pages_through_department_records(
+    resource, model, department_column, mockdata, client, session
+):
+    with current_app.test_request_context():
+        department = Department.query.first()
+        query = model.query.filter(department_column == department.id)
+        if model is not Officer and department_column is Officer.department_id:
+            query = query.join(Officer, Officer.id == model.officer_id)
+        expected_ids = sorted(record.id for record in query)
+
+        ids = []
+        cursor = None
+        while True:
+            rv = client.get(_api_url(department.id, resource, limit=7, cursor=cursor))
+            assert rv.status_code == HTTPStatus.OK
+            assert len(rv.json["data"]) <= 7
+            ids += [record["id"] for record in rv.json["data"]]
+            cursor = rv.json["next_cursor"]
+            if cursor is None:
+                break
+
+        assert ids == expected_ids
+
+
+def test_api_selects_only_requested_fields(
+    mockdata, client, session, max_sql_statements
+):
+    with current_app.test_request_context():
+        department = Department.query.first()
+        url = _api_url(department.id, "officers", fields="last_name,badge_number")
+
+        with max_sql_statements(10) as statements:
+            rv = client.get(url)
+
+        assert rv.status_code == HTTPStatus.OK
+        for record in rv.json["data"]:
+            assert set(record) == {"id", "last_name", "badge_number"}
+            officer = session.get(Officer, record["id"])
+            assert record["last_name"] == officer.last_name
+            assert record["badge_number"] == (
+                officer.current_assignment and officer.current_assignment.star_no
+            )
+        (select,) = [s for s in statements if "FROM officers" in s]
+        assert "first_name" not in select
+        assert "current_assignments" in select
+        assert "jobs" not in select
+
+        rv = client.get(_api_url(department.id, "officers", fields="first_name"))
+        assert set(rv.json["data"][0]) == {"id", "first_name"}
+
+
+def test_api_filters_records_updated_since(mockdata, client, session):
+    with current_app.test_request_context():
+        department = Department.query.first()
+        officers = Officer.query.filter_by(department_id=department.id).all()
+        since = datetime.now(timezone.utc) + timedelta(days=1)
+        for officer in officers[:3]:
+            officer.last_updated_at = since + timedelta(hours=1)
+        session.commit()
+
+        rv = client.get(_api_url(department.id, "officers", since=since.isoformat()))
+
+        assert rv.status_code == HTTPStatus.OK
+        assert [record["id"] for record in rv.json["data"]] == sorted(
+            officer.id for officer in officers[:3]
+        )
+
+
+def test_api_streams_ndjson(mockdata, client, session):
+    with current_app.test_request_context():
+        department = Department.query.first()
+        salaries = (
+            Salary.query.join(Salary.officer)
+            .filter(Officer.department_id == department.id)
+            .order_by(Salary.id)
+            .all()
+        )
+
+        rv = client.get(
+            _api_url(department.id, "salaries", fields="salary,year"),
+            headers={"Accept": MIMETYPE_NDJSON},
+        )
+
+        assert rv.status_code == HTTPStatus.OK
+        assert rv.mimetype == MIMETYPE_NDJSON
+        records = [json.loads(line) for line in rv.data.decode().splitlines()]
+        assert records == [
+            {"id": salary.id, "salary": str(salary.salary), "year": salary.year}
+            for salary in salaries
+        ]
+
+        rv = client.get(
+            _api_url(department.id, "salaries", format="ndjson"), buffered=True
+        )
+        assert rv.mimetype == MIMETYPE_NDJSON
+
+
+@pytest.mark.parametrize(
+    "params, status",
+    [
+        ({"fields": "last_name,password"}, HTTPStatus.BAD_REQUEST),
+        ({"since": "yesterday"}, HTTPStatus.BAD_REQUEST),
+        ({"cursor": "not-a-cursor"}, HTTPStatus.BAD_REQUEST),
+        ({"limit": 0}, HTTPStatus.BAD_REQUEST),
+        ({"department_id": 999999}, HTTPStatus.NOT_FOUND),
+    ],
+)
+def test_api_rejects_invalid_requests(params, status, mockdata, client, session):
+    with current_app.test_request_context():
+        department_id = params.pop("department_id", Department.query.first().id)
+
+        rv = client.get(_api_url(department_id, "officers", **params))
+
+        assert rv.status_code == status
+        assert "error" in rv.json
+
+
+def test_api_answers_conditional_requests(mockdata, client, session):
+    with current_app.test_request_context():
+        department = Department.query.first()
+        url = _api_url(department.id, "incidents")
+
+        rv = client.get(url)
+        etag = rv.headers["ETag"]
+        assert "Accept" in rv.headers["Vary"]
+        rv = client.get(url, headers={"If-None-Match": etag})
+
+        assert rv.status_code == HTTPStatus.NOT_MODIFIED
+        assert "Accept" in rv.headers["Vary"]
+
+        # JSON and NDJSON copies are validated separately
+        rv = client.get(
+            url,
+            headers={"Accept": MIMETYPE_NDJSON, "If-None-Match": etag},
+            buffered=True,
+        )
+        assert rv.status_code == HTTPStatus.OK
+        assert rv.mimetype == MIMETYPE_NDJSON
+        assert rv.headers["ETag"] != etag
@@ -15,7 +15,7 @@ from OpenOversight.app.auth.forms import (
     PasswordResetRequestForm,
     RegistrationForm,
 )
-from OpenOversight.app.models.database import User
+from OpenOversight.app.models.database import OutgoingEmail, User
 from OpenOversight.app.utils.constants import KEY_OO_MAIL_SUBJECT_PREFIX
 from OpenOversight.tests.conftest import AC_DEPT
 from OpenOversight.tests.constants import (
@@ -156,8 +156,9 @@ def test_user_can_register_with_legit_credentials(mockdata, client, session, fak
         TestCase.assertLogs(current_app.logger) as log,
     ):
         diceware_password = "operative hamster persevere verbalize curling"
+        email = faker.ascii_email()
         form = RegistrationForm(
-            email=faker.ascii_email(),
+            email=email,
             username="generic_username",
             password=diceware_password,
             password2=diceware_password,
@@ -171,6 +172,8 @@ def test_user_can_register_with_legit_credentials(mockdata, client, session, fak
             f"{current_app.config[KEY_OO_MAIL_SUBJECT_PREFIX]} Confirm Your Account"
             in str(log.output)
         )
+        assert OutgoingEmail.query.filter_by(receiver=email).count() == 1
+        assert User.by_email(email).count() == 1
 
 
 def test_user_cannot_register_with_weak_password(mockdata, client, session):
@@ -203,6 +206,7 @@ def test_user_can_get_a_confirmation_token_resent(mockdata, client, session):
             f"{current_app.config[KEY_OO_MAIL_SUBJECT_PREFIX]} Confirm Your Account"
             in str(log.output)
         )
+        assert OutgoingEmail.query.filter_by(receiver=GENERAL_USER_EMAIL).count() == 1
 
 
 def test_user_can_get_password_reset_token_sent(mockdata, client, session):
@@ -541,6 +545,28 @@ def test_user_email_update_resets_session_token(mockdata, app, session, faker):
         assert rv.status_code == HTTPStatus.FOUND
 
 
+def test_signed_in_user_is_not_reloaded_on_each_request(
+    mockdata, app, session, max_sql_statements
+):
+    client = current_app.test_client()
+
+    with current_app.app_context(), current_app.test_request_context():
+        login_user(client)
+
+    # Each request gets a new app context, and so loads the user again
+    for _ in range(2):
+        with (
+            current_app.app_context(),
+            current_app.test_request_context(),
+            max_sql_statements(100) as statements,
+        ):
+            rv = client.get(url_for("main.leaderboard"), follow_redirects=False)
+            assert rv.status_code == HTTPStatus.OK
+            assert current_user.is_authenticated
+
+    assert not [s for s in statements if "users._uuid = " in s]
+
+
 def test_user_password_update_resets_session_token(mockdata, app, session):
     client = current_app.test_client()
 
@@ -5,8 +5,8 @@ from unittest.mock import MagicMock, patch
 
 import pytest
 from flask import current_app, url_for
+from sqlalchemy import event, func
 
-from OpenOversight.app.main import views
 from OpenOversight.app.main.forms import FaceTag
 from OpenOversight.app.models.database import (
     Assignment,
@@ -16,8 +16,10 @@ from OpenOversight.app.models.database import (
     Job,
     Officer,
     User,
+    db,
 )
-from OpenOversight.app.utils.constants import ENCODING_UTF_8
+from OpenOversight.app.utils.constants import ENCODING_UTF_8, FACE_CROP_PENDING
+from OpenOversight.app.utils.uploads import run_upload_worker
 from OpenOversight.tests.conftest import AC_DEPT
 from OpenOversight.tests.routes.route_helpers import login_ac, login_admin, login_user
 
@@ -79,6 +81,26 @@ def test_logged_in_user_can_access_sort_form(mockdata, client, session):
         assert b"Do you see uniformed law enforcement officers in the photo" in rv.data
 
 
+def test_sort_form_links_near_duplicate(mockdata, client, session):
+    with current_app.test_request_context():
+        login_user(client)
+        original = Image.query.filter_by(department_id=1).first()
+        original.contains_cops = True
+        Image.query.filter(
+            Image.department_id == 1,
+            Image.contains_cops.is_(None),
+            Image.id != original.id,
+        ).update({Image.near_duplicate_of_id: original.id})
+        session.commit()
+
+        rv = client.get(url_for("main.sort_images", department_id=1))
+
+        assert b"This photo looks like" in rv.data
+        assert (
+            url_for("main.display_submission", image_id=original.id).encode() in rv.data
+        )
+
+
 def test_user_can_view_submission(mockdata, client, session):
     with current_app.test_request_context():
         login_user(client)
@@ -148,36 +170,42 @@ def test_ac_cannot_delete_tag_not_in_their_dept(mockdata, client, session):
         assert deleted_tag is not None
 
 
-@patch(
-    "OpenOversight.app.utils.general.serve_image",
-    MagicMock(return_value=PROJECT_ROOT + "/app/static/images/test_cop1.png"),
-)
 def test_user_can_add_tag(mockdata, client, session):
     with current_app.test_request_context():
-        mock = MagicMock(return_value=Image.query.first())
-        with patch("OpenOversight.app.main.views.crop_image", mock):
-            officer = Officer.query.filter_by(department_id=1).first()
-            image = Image.query.filter_by(department_id=1).first()
-            login_user(client)
-            user = User.query.filter_by(is_administrator=True).first()
-
-            form = FaceTag(
-                department_id=officer.department_id,
-                star_no=officer.assignments[0].star_no,
-                image_id=image.id,
-                dataX=34,
-                dataY=32,
-                dataWidth=3,
-                dataHeight=33,
-                created_by=user.id,
-            )
-            rv = client.post(
-                url_for("main.label_data", image_id=image.id),
-                data=form.data,
-                follow_redirects=True,
-            )
-            views.crop_image.assert_called_once()
-            assert b"Tag added to database" in rv.data
+        officer = Officer.query.filter_by(department_id=1).first()
+        image = Image.query.filter_by(department_id=1).first()
+        login_user(client)
+        user = User.query.filter_by(is_administrator=True).first()
+
+        form = FaceTag(
+            department_id=officer.department_id,
+            star_no=officer.assignments[0].star_no,
+            image_id=image.id,
+            dataX=34,
+            dataY=32,
+            dataWidth=3,
+            dataHeight=33,
+            created_by=user.id,
+        )
+        rv = client.post(
+            url_for("main.label_data", image_id=image.id),
+            data=form.data,
+            follow_redirects=True,
+        )
+        assert b"Tag added to database" in rv.data
+
+    # The face shows the whole photo until it is cropped
+    face = Face.query.filter_by(officer_id=officer.id, original_image_id=image.id).one()
+    assert face.crop_status == FACE_CROP_PENDING
+    assert face.img_id == image.id
+
+    assert run_upload_worker(0, exit_when_empty=True) == 1
+
+    face = session.get(Face, face.id)
+    assert face.crop_status is None
+    assert face.img_id != image.id
+    assert face.image.is_tagged and face.image.contains_cops
+    assert face.image.created_by == face.created_by
 
 
 def test_user_must_disambiguate_serial_number_with_multiple_officers(
@@ -352,6 +380,35 @@ def test_user_can_view_leaderboard(mockdata, client, session):
         assert b"Top Users by Number of Images Sorted" in rv.data
 
 
+def test_leaderboard_reads_contribution_counters(mockdata, client, session):
+    top_taggers = (
+        session.query(User.username, func.count(Face.id))
+        .join(Face, Face.created_by == User.id)
+        .group_by(User.username)
+        .all()
+    )
+    statements = []
+
+    def record_statement(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    with current_app.test_request_context():
+        login_user(client)
+        event.listen(db.engine, "before_cursor_execute", record_statement)
+        try:
+            rv = client.get(url_for("main.leaderboard"))
+        finally:
+            event.remove(db.engine, "before_cursor_execute", record_statement)
+
+    assert rv.status_code == HTTPStatus.OK
+    for username, count in top_taggers:
+        assert f"{username}</a>\n          - {count}" in rv.data.decode(ENCODING_UTF_8)
+    assert not any(
+        "FROM raw_images" in statement or "FROM faces" in statement
+        for statement in statements
+    )
+
+
 def test_user_is_redirected_to_correct_department_after_tagging(
     mockdata, client, session
 ):
@@ -404,25 +461,22 @@ def test_featured_tag_replaces_others(mockdata, client, session):
             .first()
         )
         assert second_image is not None
-        mock = MagicMock(return_value=second_image)
-        with patch("OpenOversight.app.main.views.crop_image", mock):
-            form = FaceTag(
-                department_id=officer.department_id,
-                star_no=officer.assignments[0].star_no,
-                image_id=second_image.id,
-                dataX=34,
-                dataY=32,
-                dataWidth=3,
-                dataHeight=33,
-                created_by=user.id,
-            )
-            rv = client.post(
-                url_for("main.label_data", image_id=second_image.id),
-                data=form.data,
-                follow_redirects=True,
-            )
-            views.crop_image.assert_called_once()
-            assert b"Tag added to database" in rv.data
+        form = FaceTag(
+            department_id=officer.department_id,
+            star_no=officer.assignments[0].star_no,
+            image_id=second_image.id,
+            dataX=34,
+            dataY=32,
+            dataWidth=3,
+            dataHeight=33,
+            created_by=user.id,
+        )
+        rv = client.post(
+            url_for("main.label_data", image_id=second_image.id),
+            data=form.data,
+            follow_redirects=True,
+        )
+        assert b"Tag added to database" in rv.data
 
         tag2 = (
             Face.query.filter(Face.officer_id == tag1.officer_id)
@@ -761,6 +761,26 @@ def test_users_can_view_incidents_by_department(mockdata, client, session):
             )
 
 
+def test_incident_pages_answer_conditional_requests(mockdata, client, session):
+    with current_app.test_request_context():
+        incident = Incident.query.first()
+        detail_url = url_for("main.incident_api", obj_id=incident.id)
+        list_url = url_for("main.incident_api", department_id=incident.department_id)
+        etags = {url: client.get(url).headers["ETag"] for url in (detail_url, list_url)}
+
+        for url, etag in etags.items():
+            rv = client.get(url, headers={"If-None-Match": etag})
+            assert rv.status_code == HTTPStatus.NOT_MODIFIED
+
+        incident.description = "Changed description"
+        session.commit()
+
+        for url, etag in etags.items():
+            rv = client.get(url, headers={"If-None-Match": etag})
+            assert rv.status_code == HTTPStatus.OK
+            assert "Changed description" in rv.data.decode(ENCODING_UTF_8)
+
+
 def test_admins_can_see_who_created_incidents(mockdata, client, session):
     with current_app.test_request_context():
         login_admin(client)
@@ -1,9 +1,11 @@
 import copy
 import csv
+import gzip
 import json
+import os
 import random
 import re
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
 from decimal import Decimal
 from http import HTTPStatus
 from io import BytesIO
@@ -11,9 +13,12 @@ from unittest.mock import MagicMock, patch
 
 import pytest
 from flask import current_app, url_for
+from PIL import Image as Pimage
+from sqlalchemy import event, update
 from sqlalchemy.sql.operators import Operators
 from werkzeug.test import TestResponse
 
+from OpenOversight.app.main.downloads import decompress_csv, stream_csv
 from OpenOversight.app.main.forms import (
     AddOfficerForm,
     AddUnitForm,
@@ -33,13 +38,23 @@ from OpenOversight.app.main.forms import (
 from OpenOversight.app.models.database import (
     Assignment,
     Department,
+    DepartmentStatistics,
+    Description,
     Face,
     Image,
+    ImageVariant,
     Incident,
     Job,
+    LicensePlate,
+    Link,
+    Location,
+    Note,
     Officer,
     Salary,
     Unit,
+    UploadJob,
+    User,
+    db,
 )
 from OpenOversight.app.models.database_cache import (
     has_database_cache_entry,
@@ -52,11 +67,21 @@ from OpenOversight.app.utils.choices import (
 )
 from OpenOversight.app.utils.constants import (
     ENCODING_UTF_8,
+    KEY_DEPT_ALL_ASSIGNMENTS,
+    KEY_DEPT_ALL_INCIDENTS,
     KEY_DEPT_ALL_LINKS,
+    KEY_DEPT_ALL_NOTES,
+    KEY_DEPT_ALL_OFFICERS,
     KEY_DEPT_ALL_SALARIES,
+    KEY_OFFICERS_PER_PAGE,
+    UPLOAD_JOB_DONE,
+    UPLOAD_JOB_FAILED,
+    UPLOAD_JOB_PENDING,
 )
 from OpenOversight.app.utils.db import unit_choices
 from OpenOversight.app.utils.forms import add_new_assignment
+from OpenOversight.app.utils.storage import get_image_storage
+from OpenOversight.app.utils.uploads import process_upload_job, run_upload_worker
 from OpenOversight.tests.conftest import (
     AC_DEPT,
     RANK_CHOICES_1,
@@ -71,6 +96,9 @@ from OpenOversight.tests.routes.route_helpers import (
 )
 
 
+OFFICER_PROFILE_MAX_STATEMENTS = 15
+
+
 @pytest.mark.parametrize(
     "route",
     [
@@ -124,6 +152,165 @@ def test_user_can_access_officer_profile(mockdata, client, session):
         assert "Officer Detail" in rv.data.decode(ENCODING_UTF_8)
 
 
+def test_officer_profile_renders_in_constant_queries(
+    mockdata, client, session, max_sql_statements
+):
+    with current_app.test_request_context():
+        login_admin(client)
+        officer = Officer.query.filter(~Officer.face.any()).first()
+        other_officer = Officer.query.filter(Officer.id != officer.id).first()
+        user = User.query.first()
+        jobs = Job.query.filter_by(department_id=officer.department_id).all()
+        units = Unit.query.filter_by(department_id=officer.department_id).all()
+        url = url_for("main.officer_profile", officer_id=officer.id)
+        # Warm the department metadata cache, then start from the same state as
+        # after the commit below
+        client.get(url)
+        session.expire_all()
+
+        with max_sql_statements(OFFICER_PROFILE_MAX_STATEMENTS) as before:
+            rv = client.get(url)
+        assert rv.status_code == HTTPStatus.OK
+
+        for i in range(50):
+            session.add(
+                Assignment(
+                    officer_id=officer.id,
+                    star_no=str(i),
+                    job_id=jobs[i % len(jobs)].id,
+                    unit_id=units[i % len(units)].id,
+                    start_date=date(2000, 1, 1),
+                    created_by=user.id,
+                )
+            )
+            session.add(Note(officer=officer, text_contents=str(i), created_by=user.id))
+            session.add(
+                Description(officer=officer, text_contents=str(i), created_by=user.id)
+            )
+            session.add(
+                Salary(
+                    officer=officer, salary=1000, year=2000 + i, is_fiscal_year=False
+                )
+            )
+            officer.links.append(Link(url=f"https://example.org/{i}", link_type="link"))
+            officer.incidents.append(
+                Incident(
+                    date=date(2000, 1, 1) + timedelta(days=i),
+                    description=str(i),
+                    department_id=officer.department_id,
+                    address=Location(city="Springfield", state="IL"),
+                    license_plates=[LicensePlate(number=str(i), state="IL")],
+                    links=[Link(url=f"https://example.org/incident/{i}")],
+                    officers=[other_officer],
+                    created_by=user.id,
+                )
+            )
+        session.commit()
+
+        with max_sql_statements(OFFICER_PROFILE_MAX_STATEMENTS) as after:
+            rv = client.get(url)
+        assert rv.status_code == HTTPStatus.OK
+        assert len(after) == len(before)
+
+
+def test_officer_profile_answers_conditional_requests(mockdata, client, session):
+    with current_app.test_request_context():
+        officer = Officer.query.first()
+        url = url_for("main.officer_profile", officer_id=officer.id)
+
+        rv = client.get(url)
+        etag = rv.headers["ETag"]
+        assert rv.status_code == HTTPStatus.OK
+        assert rv.headers["Last-Modified"]
+        assert "no-cache" in rv.headers["Cache-Control"]
+
+        rv = client.get(url, headers={"If-None-Match": etag})
+        assert rv.status_code == HTTPStatus.NOT_MODIFIED
+        assert rv.data == b""
+
+        # Pages differ between visitors
+        login_user(client)
+        rv = client.get(url, headers={"If-None-Match": etag})
+        assert rv.status_code == HTTPStatus.OK
+        assert rv.headers["ETag"] != etag
+        assert "private" in rv.headers["Cache-Control"]
+        etag = rv.headers["ETag"]
+
+        session.add(
+            Salary(officer_id=officer.id, salary=1, year=2020, is_fiscal_year=False)
+        )
+        session.commit()
+
+        rv = client.get(url, headers={"If-None-Match": etag})
+        assert rv.status_code == HTTPStatus.OK
+        assert rv.headers["ETag"] != etag
+
+
+@pytest.mark.parametrize("login", [login_admin, login_ac])
+def test_officer_profile_is_not_versioned_for_editors(login, mockdata, client, session):
+    with current_app.test_request_context():
+        officer = Officer.query.filter_by(department_id=AC_DEPT).first()
+        url = url_for("main.officer_profile", officer_id=officer.id)
+        etag = client.get(url).headers["ETag"]
+
+        # Their pages have forms with CSRF tokens, which would expire in kept copies
+        login(client)
+        rv = client.get(url, headers={"If-None-Match": etag})
+        assert rv.status_code == HTTPStatus.OK
+        assert "ETag" not in rv.headers
+
+
+def test_warm_officer_profile_renders_from_fragments(
+    mockdata, client, session, max_sql_statements
+):
+    with current_app.test_request_context():
+        officer = Officer.query.filter(Officer.salaries.any()).first()
+        url = url_for("main.officer_profile", officer_id=officer.id)
+        cold = client.get(url)
+
+        # The version, the officer and their department
+        with max_sql_statements(3):
+            warm = client.get(url)
+        assert warm.data == cold.data
+
+        session.add(
+            Salary(
+                officer_id=officer.id, salary=123456, year=2020, is_fiscal_year=False
+            )
+        )
+        session.commit()
+
+        rv = client.get(url)
+        assert "$123,456" in rv.data.decode(ENCODING_UTF_8)
+
+        # Administrators see forms, which are never cached
+        login_admin(client)
+        rv = client.get(url)
+        assert "Add Assignment" in rv.data.decode(ENCODING_UTF_8)
+
+
+def test_csv_downloads_answer_conditional_requests(mockdata, client, session):
+    with current_app.test_request_context():
+        department = Department.query.first()
+        url = url_for("main.download_dept_officers_csv", department_id=department.id)
+
+        rv = client.get(url, buffered=True)
+        assert rv.status_code == HTTPStatus.OK
+        headers = {"If-None-Match": rv.headers["ETag"]}
+
+        rv = client.get(url, headers={"If-Modified-Since": rv.headers["Last-Modified"]})
+        assert rv.status_code == HTTPStatus.NOT_MODIFIED
+        rv = client.get(url, headers=headers)
+        assert rv.status_code == HTTPStatus.NOT_MODIFIED
+
+        officer = Officer.query.filter_by(department_id=department.id).first()
+        officer.first_name = "Changed"
+        session.commit()
+
+        rv = client.get(url, headers=headers, buffered=True)
+        assert rv.status_code == HTTPStatus.OK
+
+
 def test_user_can_access_officer_list(mockdata, client, session):
     with current_app.test_request_context():
         rv = client.get(url_for("main.list_officer", department_id=2))
@@ -1827,6 +2014,109 @@ def test_incidents_csv(mockdata, client, session, department, faker):
         assert form.description.data in csv[0]
 
 
+@pytest.mark.parametrize(
+    "endpoint,first_column",
+    [
+        ("main.download_dept_officers_csv", "id,unique identifier"),
+        ("main.download_dept_assignments_csv", "id,officer id"),
+        ("main.download_incidents_csv", "id,report_num"),
+        ("main.download_dept_salaries_csv", "id,officer id"),
+        ("main.download_dept_links_csv", "id,title"),
+        ("main.download_dept_descriptions_csv", "id,text_contents"),
+    ],
+)
+def test_csv_downloads_are_streamed(mockdata, client, session, endpoint, first_column):
+    with current_app.test_request_context():
+        department = Department.query.first()
+        department.remove_database_cache_entries(
+            [
+                KEY_DEPT_ALL_ASSIGNMENTS,
+                KEY_DEPT_ALL_INCIDENTS,
+                KEY_DEPT_ALL_LINKS,
+                KEY_DEPT_ALL_NOTES,
+                KEY_DEPT_ALL_OFFICERS,
+                KEY_DEPT_ALL_SALARIES,
+            ]
+        )
+        rv = client.get(url_for(endpoint, department_id=department.id), buffered=True)
+
+        assert rv.status_code == HTTPStatus.OK
+        assert "Content-Length" not in rv.headers
+        assert rv.data.decode(ENCODING_UTF_8).startswith(first_column)
+
+
+def test_stream_csv_yields_chunks():
+    records = [{"id": i, "name": "x" * 10} for i in range(100)]
+    completed = []
+
+    chunks = list(
+        stream_csv(
+            records, ["id", "name"], lambda r: r, completed.append, chunk_size=100
+        )
+    )
+
+    assert len(chunks) > 1
+    assert all(len(chunk) < 200 for chunk in chunks)
+    assert gzip.decompress(completed[0]) == b"".join(chunks)
+    assert list(csv.DictReader(b"".join(chunks).decode().splitlines()))[-1] == {
+        "id": "99",
+        "name": "x" * 10,
+    }
+
+
+def test_stream_csv_drops_output_too_large_to_cache():
+    records = [{"id": i, "name": os.urandom(8).hex()} for i in range(100)]
+    completed = []
+
+    chunks = list(
+        stream_csv(
+            records,
+            ["id", "name"],
+            lambda r: r,
+            completed.append,
+            chunk_size=100,
+            max_compressed_size=500,
+        )
+    )
+
+    assert len(b"".join(chunks).splitlines()) == 101
+    assert completed == []
+
+
+def test_decompress_csv_yields_chunks():
+    data = b"".join(f"{i},{'x' * 10}\n".encode() for i in range(10000))
+
+    chunks = list(decompress_csv(gzip.compress(data), chunk_size=1000))
+
+    assert all(len(chunk) <= 1000 for chunk in chunks)
+    assert b"".join(chunks) == data
+
+
+def test_csv_download_is_not_cached_after_concurrent_change(mockdata, client, session):
+    with current_app.test_request_context():
+        department = Department.query.first()
+        department.remove_database_cache_entries([KEY_DEPT_ALL_OFFICERS])
+        rv = client.get(
+            url_for("main.download_dept_officers_csv", department_id=department.id)
+        )
+
+        # A commit invalidates the cached CSV before the stream finishes
+        session.execute(
+            update(DepartmentStatistics)
+            .where(DepartmentStatistics.department_id == department.id)
+            .values(version=DepartmentStatistics.version + 1)
+        )
+        assert rv.data.decode(ENCODING_UTF_8).startswith("id,unique identifier")
+
+        assert not has_database_cache_entry(department, KEY_DEPT_ALL_OFFICERS)
+
+        rv = client.get(
+            url_for("main.download_dept_officers_csv", department_id=department.id)
+        )
+        assert rv.data
+        assert has_database_cache_entry(department, KEY_DEPT_ALL_OFFICERS)
+
+
 def test_browse_filtering_filters_bad(client, mockdata, session):
     with current_app.test_request_context():
         race_list = ["BLACK", "WHITE"]
@@ -2022,37 +2312,37 @@ def test_admin_can_upload_photos_of_dept_officers(
         officer = department.officers[3]
         officer_face_count = len(officer.face)
 
-        # Filter out images that the officer is already tagged in
-        officer_faces = Face.query.filter_by(officer_id=officer.id).all()
-        image = Image.query.filter(
-            Image.id.not_in([face.img_id for face in officer_faces])
-        ).first()
+        rv = client.post(
+            url_for(
+                "main.upload",
+                department_id=department.id,
+                officer_id=officer.id,
+            ),
+            content_type="multipart/form-data",
+            data=data,
+        )
+        assert rv.status_code == HTTPStatus.ACCEPTED
+        assert b"Success" in rv.data
+        status_url = rv.json["status_url"]
+        assert client.get(status_url).json["status"] == UPLOAD_JOB_PENDING
+        # The image is only processed by the upload workers
+        assert len(officer.face) == officer_face_count
 
-        crop_mock = MagicMock(return_value=image)
-        upload_mock = MagicMock(return_value=image)
-        with patch(
-            "OpenOversight.app.main.views.save_image_to_s3_and_db",
-            upload_mock,
-        ):
-            with patch("OpenOversight.app.main.views.crop_image", crop_mock):
-                rv = client.post(
-                    url_for(
-                        "main.upload",
-                        department_id=department.id,
-                        officer_id=officer.id,
-                    ),
-                    content_type="multipart/form-data",
-                    data=data,
-                )
-                assert rv.status_code == HTTPStatus.OK
-                assert b"Success" in rv.data
-                # check that Face was added to database
-                assert len(officer.face) == officer_face_count + 1
+        assert run_upload_worker(0, exit_when_empty=True) == 1
 
+        assert client.get(status_url).json["status"] == UPLOAD_JOB_DONE
+        # check that Face was added to database
+        assert len(officer.face) == officer_face_count + 1
+        image = officer.face[-1].image
+        assert image.is_tagged
+        # The image was written to the local stand-in for S3
+        storage = get_image_storage()
+        assert image.filepath.startswith(storage.url_prefix)
+        key = image.filepath[len(storage.url_prefix) + 1 :]
+        assert os.path.isfile(os.path.join(storage.directory, key))
 
-def test_upload_photo_sends_500_on_s3_error(
-    mockdata, client, session, test_png_bytes_io
-):
+
+def test_upload_photo_reports_s3_error(mockdata, client, session, test_png_bytes_io):
     with current_app.test_request_context():
         login_admin(client)
 
@@ -2062,18 +2352,133 @@ def test_upload_photo_sends_500_on_s3_error(
         mock = MagicMock(return_value=None)
         officer = department.officers[0]
         officer_face_count = len(officer.face)
-        with patch("OpenOversight.app.main.views.save_image_to_s3_and_db", mock):
+        rv = client.post(
+            url_for("main.upload", department_id=department.id, officer_id=officer.id),
+            content_type="multipart/form-data",
+            data=data,
+        )
+        assert rv.status_code == HTTPStatus.ACCEPTED
+        with patch("OpenOversight.app.utils.uploads.save_image_to_s3_and_db", mock):
+            run_upload_worker(0, exit_when_empty=True)
+
+        rv = client.get(rv.json["status_url"])
+        assert rv.json["status"] == UPLOAD_JOB_FAILED
+        assert "error" in rv.json["error"]
+        # check that Face was not added to database
+        assert len(officer.face) == officer_face_count
+
+
+def test_upload_photo_twice_tags_officer_once(
+    mockdata, client, session, test_png_bytes_io
+):
+    with current_app.test_request_context():
+        login_admin(client)
+        department = session.get(Department, AC_DEPT)
+        officer = department.officers[0]
+        officer_face_count = len(officer.face)
+
+        status_urls = []
+        for _ in range(2):
             rv = client.post(
                 url_for(
                     "main.upload", department_id=department.id, officer_id=officer.id
                 ),
                 content_type="multipart/form-data",
-                data=data,
+                data={"file": (BytesIO(test_png_bytes_io.getvalue()), "204Cat.png")},
+            )
+            status_urls.append(rv.json["status_url"])
+        assert run_upload_worker(0, exit_when_empty=True) == 2
+
+        for status_url in status_urls:
+            assert client.get(status_url).json["status"] == UPLOAD_JOB_DONE
+        assert len(officer.face) == officer_face_count + 1
+
+
+def test_upload_worker_survives_failing_jobs(
+    mockdata, client, session, test_png_bytes_io
+):
+    def fail_first_job(job):
+        if process_mock.call_count == 1:
+            raise RuntimeError("Connection dropped")
+        process_upload_job(job)
+
+    process_mock = MagicMock(side_effect=fail_first_job)
+    with current_app.test_request_context():
+        login_admin(client)
+        department = session.get(Department, AC_DEPT)
+        status_urls = []
+        for size in ((300, 240), (240, 300)):
+            data = BytesIO()
+            Pimage.open(test_png_bytes_io).resize(size).save(data, "png")
+            data.seek(0)
+            rv = client.post(
+                url_for("main.upload", department_id=department.id),
+                content_type="multipart/form-data",
+                data={"file": (data, "204Cat.png")},
+            )
+            status_urls.append(rv.json["status_url"])
+
+        # Rolling back the test session would undo the uploads, and the failing
+        # job wrote nothing to roll back
+        with (
+            patch("OpenOversight.app.utils.uploads.process_upload_job", process_mock),
+            patch.object(session, "rollback") as rollback_mock,
+        ):
+            assert run_upload_worker(0, exit_when_empty=True) == 2
+
+        rollback_mock.assert_called_once()
+        failed, done = (client.get(status_url).json for status_url in status_urls)
+        assert failed["status"] == UPLOAD_JOB_FAILED
+        assert done["status"] == UPLOAD_JOB_DONE
+
+
+def test_upload_status_is_private_to_uploader(
+    mockdata, client, session, test_png_bytes_io
+):
+    with current_app.test_request_context():
+        login_admin(client)
+        department = session.get(Department, AC_DEPT)
+        rv = client.post(
+            url_for("main.upload", department_id=department.id),
+            content_type="multipart/form-data",
+            data={"file": (test_png_bytes_io, "204Cat.png")},
+        )
+        status_url = rv.json["status_url"]
+        assert client.get(status_url).status_code == HTTPStatus.OK
+
+        login_user(client)
+        assert client.get(status_url).status_code == HTTPStatus.NOT_FOUND
+
+
+def test_upload_status_links_near_duplicate(
+    mockdata, client, session, test_png_bytes_io
+):
+    resized = BytesIO()
+    Pimage.open(test_png_bytes_io).convert("RGB").resize((300, 240)).save(
+        resized, "jpeg", quality=70
+    )
+    test_png_bytes_io.seek(0)
+    resized.seek(0)
+    with current_app.test_request_context():
+        login_admin(client)
+        department = session.get(Department, AC_DEPT)
+        jobs = []
+        for data in (test_png_bytes_io, resized):
+            rv = client.post(
+                url_for("main.upload", department_id=department.id),
+                content_type="multipart/form-data",
+                data={"file": (data, "204Cat.png")},
             )
-            assert rv.status_code == HTTPStatus.INTERNAL_SERVER_ERROR
-            assert b"error" in rv.data
-            # check that Face was not added to database
-            assert len(officer.face) == officer_face_count
+            jobs.append(rv.json)
+            run_upload_worker(0, exit_when_empty=True)
+
+        original, near_duplicate = (client.get(job["status_url"]).json for job in jobs)
+        assert original["near_duplicate_of"] is None
+        assert near_duplicate["status"] == UPLOAD_JOB_DONE
+        original_image_id = session.get(UploadJob, jobs[0]["job_id"]).image_id
+        assert near_duplicate["near_duplicate_of"] == url_for(
+            "main.display_submission", image_id=original_image_id
+        )
 
 
 def test_upload_photo_sends_415_for_bad_file_type(mockdata, client, session):
@@ -2128,26 +2533,25 @@ def test_ac_can_upload_photos_of_dept_officers(
             Image.id.not_in([face.img_id for face in officer_faces])
         ).first()
 
-        crop_mock = MagicMock(return_value=image)
         upload_mock = MagicMock(return_value=image)
+        rv = client.post(
+            url_for(
+                "main.upload",
+                department_id=department.id,
+                officer_id=officer.id,
+            ),
+            content_type="multipart/form-data",
+            data=data,
+        )
+        assert rv.status_code == HTTPStatus.ACCEPTED
+        assert b"Success" in rv.data
         with patch(
-            "OpenOversight.app.main.views.save_image_to_s3_and_db",
+            "OpenOversight.app.utils.uploads.save_image_to_s3_and_db",
             upload_mock,
         ):
-            with patch("OpenOversight.app.main.views.crop_image", crop_mock):
-                rv = client.post(
-                    url_for(
-                        "main.upload",
-                        department_id=department.id,
-                        officer_id=officer.id,
-                    ),
-                    content_type="multipart/form-data",
-                    data=data,
-                )
-                assert rv.status_code == HTTPStatus.OK
-                assert b"Success" in rv.data
-                # check that Face was added to database
-                assert len(officer.face) == officer_face_count + 1
+            run_upload_worker(0, exit_when_empty=True)
+        # check that Face was added to database
+        assert len(officer.face) == officer_face_count + 1
 
 
 def test_edit_officers_with_blank_uids(mockdata, client, session):
@@ -2850,3 +3254,107 @@ def test_browse_displays_last_updated_dates(mockdata, client, session):
             f"{tag}Incidents Updated: {dept.latest_incident_update()}"
             in rv.data.decode("utf-8")
         )
+
+
+@pytest.mark.parametrize("endpoint", ["main.browse", "main.all_data"])
+def test_department_listings_use_one_query(mockdata, client, session, endpoint):
+    departments = Department.query.filter(Department.officers.any()).all()
+    statements = []
+
+    def record_statement(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    with current_app.test_request_context():
+        event.listen(db.engine, "before_cursor_execute", record_statement)
+        try:
+            rv = client.get(url_for(endpoint))
+        finally:
+            event.remove(db.engine, "before_cursor_execute", record_statement)
+
+    assert rv.status_code == HTTPStatus.OK
+    assert len(statements) == 1
+    for department in departments:
+        assert department.name in rv.data.decode(ENCODING_UTF_8)
+
+
+def test_list_officer_pages_with_cursors(mockdata, client, session):
+    department = Department.query.first()
+    officers = (
+        Officer.query.filter_by(department_id=department.id)
+        .order_by(
+            Officer.last_name.asc().nulls_last(),
+            Officer.first_name.asc().nulls_last(),
+            Officer.id,
+        )
+        .all()
+    )
+    per_page = current_app.config[KEY_OFFICERS_PER_PAGE]
+
+    with current_app.test_request_context():
+        url = url_for("main.list_officer", department_id=department.id)
+        seen = []
+        while url:
+            rv = client.get(url)
+            assert rv.status_code == HTTPStatus.OK
+            html = rv.data.decode(ENCODING_UTF_8)
+            seen += [
+                int(officer_id)
+                for officer_id in re.findall(r'href="/officers/(\d+)"\s+id=', html)
+            ]
+            next_link = re.search(r'<li class="next">\s*<a [^>]*href="([^"]+)"', html)
+            url = next_link.group(1).replace("&amp;", "&") if next_link else None
+            assert url is None or "cursor=" in url
+
+        assert seen == [officer.id for officer in officers]
+        assert len(officers) > per_page
+        assert f"of {len(officers)}" in html
+
+        rv = client.get(
+            url_for("main.list_officer", department_id=department.id, cursor="bad")
+        )
+        assert rv.status_code == HTTPStatus.BAD_REQUEST
+
+
+def test_list_officer_serves_image_variants(mockdata, client, session):
+    officer = Officer.query.filter(Officer.face.any()).first()
+    face = sorted(officer.face, key=lambda face: face.featured, reverse=True)[0]
+    variant = ImageVariant(
+        image_id=face.img_id,
+        size=320,
+        width=240,
+        height=320,
+        filepath="https://s3-some-bucket/variants/320.webp",
+    )
+    session.add(variant)
+    session.commit()
+
+    with current_app.test_request_context():
+        rv = client.get(
+            url_for(
+                "main.list_officer",
+                department_id=officer.department_id,
+                last_name=officer.last_name,
+            )
+        )
+
+    assert rv.status_code == HTTPStatus.OK
+    assert variant.filepath in rv.data.decode(ENCODING_UTF_8)
+
+
+def test_list_officer_ranks_closest_names_first(mockdata, client, session):
+    department = Department.query.first()
+    for last_name in ["Goldzyxw", "Zyxwson", "Zyxw"]:
+        officer = Officer(
+            last_name=last_name, first_name="Pat", department_id=department.id
+        )
+        session.add(officer)
+    session.flush()
+
+    with current_app.test_request_context():
+        rv = client.get(
+            url_for("main.list_officer", department_id=department.id, last_name="zyxw")
+        )
+    names = re.findall(
+        r'id="officer-profile-\d+">([^<]+)</a>', rv.data.decode(ENCODING_UTF_8)
+    )
+    assert names == ["Pat Zyxw", "Pat Zyxwson", "Pat Goldzyxw"]
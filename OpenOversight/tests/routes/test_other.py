@@ -4,7 +4,9 @@ from http import HTTPStatus
 import pytest
 from flask import current_app, url_for
 
+from OpenOversight.app.models.database import Officer
 from OpenOversight.app.utils.constants import ENCODING_UTF_8, KEY_TIMEZONE
+from OpenOversight.app.utils.sitemaps import refresh_sitemap_shards
 from OpenOversight.tests.constants import GENERAL_USER_USERNAME
 from OpenOversight.tests.routes.route_helpers import login_user
 
@@ -83,3 +85,29 @@ def test_timezone_setting_empty_string(client):
         assert rv.status_code == HTTPStatus.OK
         with client.session_transaction() as session:
             assert session[KEY_TIMEZONE] == current_app.config.get(KEY_TIMEZONE)
+
+
+def test_sitemap_is_served_from_stored_shards(mockdata, client, session):
+    with current_app.test_request_context():
+        refresh_sitemap_shards()
+        index_url = url_for("main.sitemap_index")
+        shard_url = url_for("main.sitemap_shard", source="officers", number=0)
+
+    rv = client.get(index_url)
+    assert rv.status_code == HTTPStatus.OK
+    assert rv.mimetype == "application/xml"
+    index = rv.data.decode(ENCODING_UTF_8)
+    assert "/sitemaps/pages.xml</loc>" in index
+    assert f"{shard_url}</loc>" in index
+    assert "/sitemaps/incidents-0.xml</loc>" in index
+
+    rv = client.get(shard_url)
+    assert rv.status_code == HTTPStatus.OK
+    assert rv.data.decode(ENCODING_UTF_8).count("<url>") == Officer.query.count()
+
+    rv = client.get("/sitemaps/pages.xml")
+    assert rv.status_code == HTTPStatus.OK
+    assert "/about</loc>" in rv.data.decode(ENCODING_UTF_8)
+
+    rv = client.get("/sitemaps/officers-1.xml")
+    assert rv.status_code == HTTPStatus.NOT_FOUND
@@ -83,6 +83,8 @@ def test_redirect_with_department_id(client, session, source_route, target_route
         resp_redirect = client.get(
             url_for(source_route, department_id=AC_DEPT),
             follow_redirects=True,
+            # Read streamed CSVs, which keep the request context until closed
+            buffered=True,
         )
         assert resp_redirect.status_code == HTTPStatus.OK
         assert resp_redirect.request.path == url_for(
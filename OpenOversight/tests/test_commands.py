@@ -4,34 +4,69 @@ import os
 import random
 import traceback
 import uuid
-from datetime import date, time
+from datetime import date, datetime, time, timedelta, timezone
 from decimal import Decimal
+from io import BytesIO
 
 import pandas as pd
 import pytest
 from click.testing import CliRunner
+from sqlalchemy import event, update
 from sqlalchemy.orm.exc import MultipleResultsFound
 
 from OpenOversight.app.commands import (
     add_department,
     add_job_title,
     advanced_csv_import,
+    backfill_image_variants_command,
     bulk_add_officers,
     create_officer_from_row,
+    failed_face_crops,
+    find_duplicate_images,
+    ingest_uploads,
+    reconcile_leaderboard,
+    refresh_department_statistics_command,
+    refresh_sitemaps,
+    send_emails,
 )
+from OpenOversight.app.email_client import EmailClient
 from OpenOversight.app.models.database import (
     Assignment,
     Department,
+    DepartmentStatistics,
+    Face,
+    Image,
+    ImageVariant,
     Incident,
     Job,
     Link,
     Officer,
+    OutgoingEmail,
     Salary,
+    SitemapShard,
     Unit,
+    UploadJob,
     User,
+    UserContributions,
+    db,
 )
+from OpenOversight.app.models.emails import Email
 from OpenOversight.app.utils.choices import DEPARTMENT_STATE_CHOICES
+from OpenOversight.app.utils.constants import (
+    FACE_CROP_FAILED,
+    FACE_CROP_LEASE,
+    FACE_CROP_MAX_ATTEMPTS,
+    FACE_CROP_PENDING,
+    FACE_CROP_RUNNING,
+    OUTGOING_EMAIL_SENT,
+    UPLOAD_JOB_DONE,
+    UPLOAD_JOB_FAILED,
+    UPLOAD_JOB_LEASE,
+    UPLOAD_JOB_MAX_ATTEMPTS,
+    UPLOAD_JOB_RUNNING,
+)
 from OpenOversight.app.utils.db import get_officer
+from OpenOversight.app.utils.uploads import enqueue_upload
 from OpenOversight.tests.conftest import (
     AC_DEPT,
     RANK_CHOICES_1,
@@ -832,7 +867,8 @@ def test_bulk_add_officers__no_create_flag(
     assert officer.gender == officer_gender_updated
 
 
-def test_advanced_csv_import__success(session, department, test_csv_dir):
+@pytest.mark.parametrize("extra_args", [[], ["--bulk"]])
+def test_advanced_csv_import__success(session, department, test_csv_dir, extra_args):
     user = User.query.filter_by(email=GENERAL_USER_EMAIL).first()
     # make sure department name aligns with the csv files
     assert department.name == SPRINGFIELD_PD.name
@@ -910,6 +946,7 @@ def test_advanced_csv_import__success(session, department, test_csv_dir):
             os.path.join(test_csv_dir, "links.csv"),
             "--incidents-csv",
             os.path.join(test_csv_dir, "incidents.csv"),
+            *extra_args,
         ],
     )
 
@@ -1173,7 +1210,10 @@ def test_advanced_csv_import__force_create(session, department, tmp_path):
     assert cop1.links[0] == link
 
 
-def test_advanced_csv_import__overwrite_assignments(session, department, tmp_path):
+@pytest.mark.parametrize("extra_args", [[], ["--bulk"]])
+def test_advanced_csv_import__overwrite_assignments(
+    session, department, tmp_path, extra_args
+):
     tmp_path = str(tmp_path)
     user = User.query.filter_by(email=GENERAL_USER_EMAIL).first()
 
@@ -1263,6 +1303,7 @@ def test_advanced_csv_import__overwrite_assignments(session, department, tmp_pat
             "--assignments-csv",
             assignments_csv,
             "--overwrite-assignments",
+            *extra_args,
         ],
     )
 
@@ -1285,6 +1326,54 @@ def test_advanced_csv_import__overwrite_assignments(session, department, tmp_pat
     assert cop3.assignments[0].job.job_title == "Police Officer"
 
 
+def test_advanced_csv_import__bulk_writes_in_batches(session, department, tmp_path):
+    officers_data = [
+        {
+            "id": f"#{i}",
+            "department_name": department.name,
+            "department_state": department.state,
+            "first_name": "Bulk",
+            "last_name": f"Officer{i}",
+        }
+        for i in range(50)
+    ]
+    salaries_data = [
+        {"id": "", "officer_id": f"#{i}", "salary": "1000.50", "year": "2020"}
+        for i in range(50)
+    ]
+    officers_csv = _create_csv(officers_data, str(tmp_path), "officers.csv")
+    salaries_csv = _create_csv(salaries_data, str(tmp_path), "salaries.csv")
+
+    statements = []
+
+    def count_statement(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", count_statement)
+    try:
+        result = run_command_print_output(
+            advanced_csv_import,
+            [
+                str(department.name),
+                str(department.state),
+                "--officers-csv",
+                officers_csv,
+                "--salaries-csv",
+                salaries_csv,
+                "--bulk",
+            ],
+        )
+    finally:
+        event.remove(db.engine, "before_cursor_execute", count_statement)
+
+    assert result.exit_code == 0
+    # SQLite cannot batch inserts that return the new rows in order, PostgreSQL can
+    assert len([s for s in statements if s.startswith("INSERT INTO salaries")]) == 1
+    officers = Officer.query.filter_by(first_name="Bulk").all()
+    assert len(officers) == 50
+    assert all(officer.salaries[0].salary == Decimal("1000.50") for officer in officers)
+
+
 def test_advanced_csv_import__extra_fields_officers(session, department, tmp_path):
     # create csv with invalid field 'name'
     officers_data = [
@@ -1471,3 +1560,337 @@ def test_create_officer_from_row_adds_new_officer_and_normalizes_gender(
         assert lookup_officer is not None
         # Was the gender properly normalized?
         assert lookup_officer.gender == "F"
+
+
+def test_bulk_add_officers__matches_officers_from_earlier_rows(
+    session, department_without_officers, csv_path, monkeypatch
+):
+    monkeypatch.setattr("OpenOversight.app.commands.BULK_ADD_PROGRESS_INTERVAL", 2)
+    field_names = ["department_id", "first_name", "last_name", "star_no", "gender"]
+    with open(csv_path, FILE_MODE_WRITE) as f:
+        csv_writer = csv.DictWriter(f, fieldnames=field_names)
+        csv_writer.writeheader()
+        for star_no in ["100", "200"]:
+            csv_writer.writerow(
+                {
+                    "department_id": department_without_officers.id,
+                    "first_name": "Jane",
+                    "last_name": f"Doe{star_no}",
+                    "star_no": star_no,
+                    "gender": "",
+                }
+            )
+        # Refers to the officer created by the first row
+        csv_writer.writerow(
+            {
+                "department_id": department_without_officers.id,
+                "first_name": "Jane",
+                "last_name": "Doe100",
+                "star_no": "100",
+                "gender": "F",
+            }
+        )
+
+    result = run_command_print_output(bulk_add_officers, [csv_path])
+
+    assert result.exit_code == 0
+    assert "Processed 2 rows (" in result.output
+    officers = Officer.query.filter_by(
+        department_id=department_without_officers.id
+    ).order_by(Officer.last_name)
+    assert [(o.last_name, o.gender) for o in officers] == [
+        ("Doe100", "F"),
+        ("Doe200", None),
+    ]
+    assert [a.star_no for a in officers[0].assignments] == ["100"]
+
+
+def test_refresh_sitemaps__rebuilds_only_changed_shards(session, monkeypatch):
+    monkeypatch.setattr("OpenOversight.app.utils.sitemaps.SITEMAP_SHARD_SIZE", 10)
+    args = ["--base-url", "https://openoversight.example.org"]
+
+    result = run_command_print_output(refresh_sitemaps, args)
+
+    assert result.exit_code == 0
+    officer_shards = SitemapShard.query.filter_by(source="officers").all()
+    assert sum(shard.url_count for shard in officer_shards) == Officer.query.count()
+    assert len(officer_shards) == len({officer.id // 10 for officer in Officer.query})
+    first_shard = officer_shards[0]
+    assert first_shard.content.count("<url>") == first_shard.url_count
+    assert "://openoversight.example.org/officers/" in first_shard.content
+
+    result = run_command_print_output(refresh_sitemaps, args)
+    assert "Rebuilt 0 sitemap files" in result.output
+
+    officer = Officer.query.filter(Officer.id >= 10, Officer.id < 20).first()
+    officer.last_updated_at = datetime(2100, 1, 1)
+    db.session.commit()
+    result = run_command_print_output(refresh_sitemaps, args)
+
+    assert result.exit_code == 0
+    assert "Rebuilt officers sitemap 1 (" in result.output
+    assert "Rebuilt 1 sitemap files" in result.output
+    shard = db.session.get(SitemapShard, ("officers", 1))
+    assert shard.lastmod.year == 2100
+    assert "<lastmod>2100-01-01</lastmod>" in shard.content
+
+
+def test_refresh_sitemaps__base_url_missing_argument(session):
+    result = run_command_print_output(refresh_sitemaps, [])
+
+    assert result.exit_code != 0
+    assert SitemapShard.query.count() == 0
+
+
+def test_ingest_uploads__processes_pending_uploads(
+    session, department, test_png_bytes_io
+):
+    user = User.query.first()
+    image_count = Image.query.count()
+    valid = enqueue_upload(test_png_bytes_io, user.id, department.id)
+    invalid = enqueue_upload(BytesIO(b"invalid-image"), user.id, department.id)
+
+    result = run_command_print_output(ingest_uploads, ["--exit-when-empty"])
+
+    assert result.exit_code == 0
+    assert "Processed 2 uploads and face crops" in result.output
+    valid = db.session.get(UploadJob, valid.id)
+    invalid = db.session.get(UploadJob, invalid.id)
+    assert valid.status == UPLOAD_JOB_DONE
+    assert db.session.get(Image, valid.image_id).department_id == department.id
+    assert valid.data is None
+    assert invalid.status == UPLOAD_JOB_FAILED
+    assert invalid.error == "Invalid data type!"
+    assert invalid.data is None
+    assert Image.query.count() == image_count + 1
+
+
+def test_ingest_uploads__retries_jobs_of_stopped_workers(
+    session, department, test_png_bytes_io
+):
+    user = User.query.first()
+    stale = enqueue_upload(test_png_bytes_io, user.id, department.id)
+    exhausted = enqueue_upload(BytesIO(b"unused"), user.id, department.id)
+    running = enqueue_upload(BytesIO(b"unused"), user.id, department.id)
+    long_ago = datetime.now(timezone.utc) - timedelta(seconds=UPLOAD_JOB_LEASE + 1)
+    stale.status = exhausted.status = running.status = UPLOAD_JOB_RUNNING
+    stale.claimed_at = exhausted.claimed_at = long_ago
+    stale.attempts = 1
+    exhausted.attempts = UPLOAD_JOB_MAX_ATTEMPTS
+    running.claimed_at = datetime.now(timezone.utc)
+    db.session.commit()
+
+    result = run_command_print_output(ingest_uploads, ["--exit-when-empty"])
+
+    assert result.exit_code == 0
+    assert "Processed 1 uploads and face crops" in result.output
+    stale = db.session.get(UploadJob, stale.id)
+    assert stale.status == UPLOAD_JOB_DONE
+    assert stale.attempts == 2
+    exhausted = db.session.get(UploadJob, exhausted.id)
+    assert exhausted.status == UPLOAD_JOB_FAILED
+    assert exhausted.data is None
+    assert db.session.get(UploadJob, running.id).status == UPLOAD_JOB_RUNNING
+
+
+def _queued_face(officer, image, user, status):
+    face = Face(
+        officer_id=officer.id,
+        img_id=image.id,
+        original_image_id=image.id,
+        face_position_x=10,
+        face_position_y=10,
+        face_width=40,
+        face_height=40,
+        crop_status=status,
+        created_by=user.id,
+    )
+    db.session.add(face)
+    return face
+
+
+def test_ingest_uploads__retries_face_crops_of_stopped_workers(session, department):
+    user = User.query.first()
+    image = Image.query.filter_by(department_id=department.id).first()
+    officers = Officer.query.filter_by(department_id=department.id).limit(3).all()
+    stale, exhausted, running = (
+        _queued_face(officer, image, user, FACE_CROP_RUNNING) for officer in officers
+    )
+    long_ago = datetime.now(timezone.utc) - timedelta(seconds=FACE_CROP_LEASE + 1)
+    stale.crop_claimed_at = exhausted.crop_claimed_at = long_ago
+    stale.crop_attempts = 1
+    exhausted.crop_attempts = FACE_CROP_MAX_ATTEMPTS
+    running.crop_claimed_at = datetime.now(timezone.utc)
+    db.session.commit()
+
+    result = run_command_print_output(ingest_uploads, ["--exit-when-empty"])
+
+    assert result.exit_code == 0
+    assert "Processed 1 uploads and face crops" in result.output
+    stale = db.session.get(Face, stale.id)
+    assert stale.crop_status is None
+    assert stale.img_id != image.id
+    assert stale.crop_attempts == 2
+    assert db.session.get(Face, exhausted.id).crop_status == FACE_CROP_FAILED
+    assert db.session.get(Face, running.id).crop_status == FACE_CROP_RUNNING
+
+
+def test_ingest_uploads__fails_face_crops_after_max_attempts(
+    session, department, monkeypatch
+):
+    monkeypatch.setattr(
+        "OpenOversight.app.utils.uploads.crop_image", lambda *args, **kwargs: None
+    )
+    user = User.query.first()
+    image = Image.query.filter_by(department_id=department.id).first()
+    officer = Officer.query.filter_by(department_id=department.id).first()
+    face = _queued_face(officer, image, user, FACE_CROP_PENDING)
+    db.session.commit()
+
+    result = run_command_print_output(ingest_uploads, ["--exit-when-empty"])
+
+    assert f"Processed {FACE_CROP_MAX_ATTEMPTS} uploads and face crops" in result.output
+    face = db.session.get(Face, face.id)
+    assert face.crop_status == FACE_CROP_FAILED
+    assert face.crop_attempts == FACE_CROP_MAX_ATTEMPTS
+    assert face.img_id == image.id
+
+
+def test_failed_face_crops__lists_and_retries_failed_crops(session, department):
+    user = User.query.first()
+    image = Image.query.filter_by(department_id=department.id).first()
+    officer = Officer.query.filter_by(department_id=department.id).first()
+    face = _queued_face(officer, image, user, FACE_CROP_FAILED)
+    face.crop_attempts = FACE_CROP_MAX_ATTEMPTS
+    db.session.commit()
+
+    result = run_command_print_output(failed_face_crops)
+
+    assert result.exit_code == 0
+    assert (
+        f"Face {face.id} of officer {officer.id} in image {image.id}" in result.output
+    )
+    assert "Found 1 failed face crops" in result.output
+    assert db.session.get(Face, face.id).crop_status == FACE_CROP_FAILED
+
+    result = run_command_print_output(failed_face_crops, ["--retry"])
+
+    assert "Queued 1 face crops to be tried again" in result.output
+    face = db.session.get(Face, face.id)
+    assert face.crop_status == FACE_CROP_PENDING
+    assert face.crop_attempts == 0
+
+
+def test_send_emails__sends_queued_emails(session, faker):
+    receivers = [faker.ascii_email() for _ in range(3)]
+    for receiver in receivers:
+        EmailClient.send_email(Email("Body", "<p>Body</p>", "Subject", receiver))
+    db.session.commit()
+
+    result = run_command_print_output(send_emails, ["--exit-when-empty"])
+
+    assert result.exit_code == 0
+    assert "Sent 3 emails" in result.output
+    emails = OutgoingEmail.query.order_by(OutgoingEmail.id).all()
+    assert [email.receiver for email in emails] == receivers
+    for email in emails:
+        assert email.status == OUTGOING_EMAIL_SENT
+        assert email.sent_at is not None
+        assert email.body is None and email.html is None
+
+
+def test_backfill_image_variants__creates_missing_variants(session):
+    image_count = Image.query.count()
+
+    result = run_command_print_output(backfill_image_variants_command)
+
+    assert result.exit_code == 0
+    assert f"Created variants of {image_count} images, 0 failed" in result.output
+    for image in Image.query:
+        assert [variant.size for variant in image.variants] == [64, 320, 640, 1000]
+        assert all(max(v.width, v.height) == v.size for v in image.variants)
+
+    result = run_command_print_output(backfill_image_variants_command)
+    assert "Created variants of 0 images, 0 failed" in result.output
+    assert ImageVariant.query.count() == 4 * image_count
+
+
+def test_backfill_image_variants__skips_processed_small_images(session):
+    image = Image(filepath="/static/images/lplfavicon.png")
+    db.session.add(image)
+    db.session.commit()
+    image_id = image.id
+    image_count = Image.query.count()
+
+    result = run_command_print_output(backfill_image_variants_command)
+    assert f"Created variants of {image_count} images, 0 failed" in result.output
+    image = db.session.get(Image, image_id)
+    assert image.variants == []
+    assert image.variants_built_at is not None
+
+    result = run_command_print_output(backfill_image_variants_command)
+    assert "Created variants of 0 images, 0 failed" in result.output
+
+
+def test_find_duplicate_images__hashes_images_and_reports_clusters(session):
+    image_count = Image.query.count()
+
+    result = run_command_print_output(find_duplicate_images)
+
+    assert result.exit_code == 0
+    assert f"Hashed {image_count} images, 0 failed" in result.output
+    assert Image.query.filter(Image.phash.is_(None)).count() == 0
+    # The mock images of both departments are copies of the same files
+    for image in Image.query.filter(Image.department_id == 1):
+        copies = Image.query.filter(Image.filepath == image.filepath).all()
+        assert f"Near-duplicate images: {', '.join(str(i.id) for i in copies)}" in (
+            result.output
+        )
+
+    result = run_command_print_output(find_duplicate_images, ["--max-distance", "0"])
+    assert "Hashed 0 images, 0 failed" in result.output
+
+
+def test_refresh_department_statistics__recomputes_every_department(session):
+    session.execute(
+        update(DepartmentStatistics).values(officer_count=0, assignment_count=0)
+    )
+
+    result = run_command_print_output(refresh_department_statistics_command)
+
+    assert result.exit_code == 0
+    assert "Refreshed department statistics" in result.output
+    for department in Department.query:
+        officers = Officer.query.filter_by(department_id=department.id)
+        assignments = Assignment.query.join(Assignment.base_officer).filter(
+            Officer.department_id == department.id
+        )
+        assert department.statistics.officer_count == officers.count()
+        assert department.statistics.assignment_count == assignments.count()
+
+
+def test_reconcile_leaderboard__corrects_drifted_counters(session):
+    run_command_print_output(reconcile_leaderboard)
+    session.execute(update(UserContributions).values(image_count=0, face_count=0))
+
+    result = run_command_print_output(reconcile_leaderboard)
+
+    assert result.exit_code == 0
+    contributors = {
+        user_id
+        for model in (Image, Face)
+        for (user_id,) in session.query(model.created_by).distinct()
+        if user_id is not None
+    }
+    assert f"Corrected the leaderboard counters of {len(contributors)} users" in (
+        result.output
+    )
+    for contributions in UserContributions.query:
+        user_id = contributions.user_id
+        assert (
+            contributions.image_count
+            == Image.query.filter_by(created_by=user_id).count()
+        )
+        assert (
+            contributions.face_count == Face.query.filter_by(created_by=user_id).count()
+        )
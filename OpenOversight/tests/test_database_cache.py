@@ -1,36 +1,58 @@
+import gzip
 import random
 from datetime import date, datetime
 from http import HTTPStatus
 
-from flask import current_app, url_for
+import pytest
+from flask import current_app, g, url_for
+from sqlalchemy import event, insert, update
 
+from OpenOversight.app.main.downloads import CsvPayload
 from OpenOversight.app.main.forms import (
     AddOfficerForm,
+    AddUnitForm,
     AssignmentForm,
     IncidentForm,
     LicensePlateForm,
     LinkForm,
     LocationForm,
 )
-from OpenOversight.app.models.database import Department, Incident, Job, Officer
+from OpenOversight.app.models.database import (
+    Department,
+    DepartmentStatistics,
+    Incident,
+    Job,
+    Officer,
+    Unit,
+    db,
+)
 from OpenOversight.app.models.database_cache import (
     DB_CACHE,
+    InProcessCacheBackend,
+    SQLiteCacheBackend,
+    create_cache_backend,
     get_database_cache_entry,
     get_model_cache_key,
     has_database_cache_entry,
     put_database_cache_entry,
+    remove_database_cache_entries,
 )
 from OpenOversight.app.utils.choices import GENDER_CHOICES, RACE_CHOICES, STATE_CHOICES
 from OpenOversight.app.utils.constants import (
     ENCODING_UTF_8,
+    KEY_DB_CACHE_MEMORY,
+    KEY_DB_CACHE_SQLITE,
     KEY_DEPT_ALL_ASSIGNMENTS,
     KEY_DEPT_ALL_INCIDENTS,
     KEY_DEPT_ALL_OFFICERS,
-    KEY_DEPT_ASSIGNMENTS_LAST_UPDATED,
-    KEY_DEPT_INCIDENTS_LAST_UPDATED,
-    KEY_DEPT_OFFICERS_LAST_UPDATED,
+    KEY_DEPT_METADATA,
+    MEGABYTE,
+)
+from OpenOversight.app.utils.db import (
+    department_units,
+    get_department_metadata,
+    unit_choices,
 )
-from OpenOversight.app.utils.db import unit_choices
 from OpenOversight.tests.routes.route_helpers import login_admin, process_form_data
 
 
@@ -67,19 +89,106 @@ def test_model_key(mockdata, faker):
     assert has_database_cache_entry(test_incident, test_key)
 
 
-def test_latest_assignment_update(mockdata, client, faker):
+def test_create_cache_backend(tmp_path):
+    assert isinstance(
+        create_cache_backend(KEY_DB_CACHE_MEMORY, None, maxsize=8, ttl=60),
+        InProcessCacheBackend,
+    )
+    assert isinstance(
+        create_cache_backend(
+            KEY_DB_CACHE_SQLITE, str(tmp_path / "cache.sqlite"), maxsize=8, ttl=60
+        ),
+        SQLiteCacheBackend,
+    )
+    with pytest.raises(ValueError):
+        create_cache_backend(KEY_DB_CACHE_SQLITE, None, maxsize=8, ttl=60)
+
+
+def test_sqlite_cache_backend_shared_between_workers(tmp_path, faker):
+    """Two backends on the same file behave like two workers sharing the cache."""
+    path = str(tmp_path / "cache.sqlite")
+    worker_a = SQLiteCacheBackend(path, maxsize=MEGABYTE, ttl=60)
+    worker_b = SQLiteCacheBackend(path, maxsize=MEGABYTE, ttl=60)
+
+    test_department = Department(id=faker.random_number(digits=3))
+    key = get_model_cache_key(test_department, KEY_DEPT_ALL_OFFICERS)
+    worker_a[key] = [1, 2, 3]
+
+    assert key in worker_b
+    assert worker_b[key] == [1, 2, 3]
+    assert list(worker_b.keys()) == [tuple(key)]
+
+    del worker_b[key]
+    assert key not in worker_a
+    with pytest.raises(KeyError):
+        worker_a[key]
+
+
+def test_sqlite_cache_backend_expiry_and_eviction(tmp_path):
+    backend = SQLiteCacheBackend(str(tmp_path / "cache.sqlite"), maxsize=250, ttl=60)
+    for i in range(3):
+        backend[("key", i)] = bytes(100)
+    assert len(backend) == 2
+    assert ("key", 0) not in backend
+    assert backend[("key", 2)] == bytes(100)
+
+    with pytest.raises(ValueError):
+        backend["too large"] = bytes(300)
+
+    expired = SQLiteCacheBackend(str(tmp_path / "expired.sqlite"), maxsize=250, ttl=0)
+    expired["key"] = 1
+    assert "key" not in expired
+    assert expired.get("key") is None
+
+
+def test_in_process_cache_backend_charges_bytes():
+    backend = InProcessCacheBackend(maxsize=400, ttl=60)
+    backend["small"] = CsvPayload("small.csv", bytes(50))
+    backend["large"] = CsvPayload("large.csv", bytes(150))
+    assert "small" in backend
+
+    backend["larger"] = CsvPayload("larger.csv", bytes(150))
+    assert "larger" in backend
+    assert len(backend) == 1
+
+
+def test_warm_csv_download_is_served_from_cache(mockdata, client, session):
+    with current_app.test_request_context():
+        department = Department.query.first()
+        remove_database_cache_entries(department, [KEY_DEPT_ALL_OFFICERS])
+        url = url_for("main.download_dept_officers_csv", department_id=department.id)
+
+        cold = client.get(url, buffered=True)
+        assert cold.status_code == HTTPStatus.OK
+        assert "Content-Length" not in cold.headers
+        payload = get_database_cache_entry(department, KEY_DEPT_ALL_OFFICERS)
+        assert isinstance(payload, CsvPayload)
+
+        statements = []
+
+        def count_statement(*args):
+            statements.append(args)
+
+        event.listen(db.engine, "before_cursor_execute", count_statement)
+        try:
+            warm = client.get(url, headers={"Accept-Encoding": "gzip"})
+        finally:
+            event.remove(db.engine, "before_cursor_execute", count_statement)
+
+        # Only the version of the department is read, for conditional requests
+        assert len(statements) == 1
+        assert warm.headers["Content-Encoding"] == "gzip"
+        assert warm.data == payload.data
+        assert gzip.decompress(warm.data) == cold.data
+
+
+def test_add_assignment_removes_department_cache_entry(mockdata, client, faker):
     with current_app.test_request_context():
         login_admin(client)
         department = Department.query.first()
-        department.latest_assignment_update()
-        department.latest_incident_update()
-        department.latest_officer_update()
         put_database_cache_entry(department, KEY_DEPT_ALL_ASSIGNMENTS, 1)
 
         assert has_database_cache_entry(department, KEY_DEPT_ALL_ASSIGNMENTS)
-        assert has_database_cache_entry(department, KEY_DEPT_ASSIGNMENTS_LAST_UPDATED)
-        assert has_database_cache_entry(department, KEY_DEPT_INCIDENTS_LAST_UPDATED)
-        assert has_database_cache_entry(department, KEY_DEPT_OFFICERS_LAST_UPDATED)
 
         officer = Officer.query.first()
         job = Job.query.filter_by(
@@ -101,27 +210,15 @@ def test_latest_assignment_update(mockdata, client, faker):
 
         assert "Added new assignment" in rv.data.decode(ENCODING_UTF_8)
         assert has_database_cache_entry(department, KEY_DEPT_ALL_ASSIGNMENTS) is False
-        assert (
-            has_database_cache_entry(department, KEY_DEPT_ASSIGNMENTS_LAST_UPDATED)
-            is False
-        )
-        assert has_database_cache_entry(department, KEY_DEPT_INCIDENTS_LAST_UPDATED)
-        assert has_database_cache_entry(department, KEY_DEPT_OFFICERS_LAST_UPDATED)
 
 
-def test_latest_incident_update(mockdata, client, faker):
+def test_add_incident_removes_department_cache_entry(mockdata, client, faker):
     with current_app.test_request_context():
         login_admin(client)
         department = Department.query.first()
-        department.latest_assignment_update()
-        department.latest_incident_update()
-        department.latest_officer_update()
         put_database_cache_entry(department, KEY_DEPT_ALL_INCIDENTS, 1)
 
         assert has_database_cache_entry(department, KEY_DEPT_ALL_INCIDENTS)
-        assert has_database_cache_entry(department, KEY_DEPT_ASSIGNMENTS_LAST_UPDATED)
-        assert has_database_cache_entry(department, KEY_DEPT_INCIDENTS_LAST_UPDATED)
-        assert has_database_cache_entry(department, KEY_DEPT_OFFICERS_LAST_UPDATED)
 
         test_date = datetime(2000, 5, 25, 1, 45)
 
@@ -156,27 +253,15 @@ def test_latest_incident_update(mockdata, client, faker):
         assert rv.status_code == HTTPStatus.OK
         assert "created" in rv.data.decode(ENCODING_UTF_8)
         assert has_database_cache_entry(department, KEY_DEPT_ALL_INCIDENTS) is False
-        assert has_database_cache_entry(department, KEY_DEPT_ASSIGNMENTS_LAST_UPDATED)
-        assert (
-            has_database_cache_entry(department, KEY_DEPT_INCIDENTS_LAST_UPDATED)
-            is False
-        )
-        assert has_database_cache_entry(department, KEY_DEPT_OFFICERS_LAST_UPDATED)
 
 
-def test_latest_officer_update(mockdata, client, faker):
+def test_add_officer_removes_department_cache_entry(mockdata, client, faker):
     with current_app.test_request_context():
         login_admin(client)
         department = Department.query.first()
-        department.latest_assignment_update()
-        department.latest_incident_update()
-        department.latest_officer_update()
         put_database_cache_entry(department, KEY_DEPT_ALL_OFFICERS, 1)
 
         assert has_database_cache_entry(department, KEY_DEPT_ALL_OFFICERS)
-        assert has_database_cache_entry(department, KEY_DEPT_ASSIGNMENTS_LAST_UPDATED)
-        assert has_database_cache_entry(department, KEY_DEPT_INCIDENTS_LAST_UPDATED)
-        assert has_database_cache_entry(department, KEY_DEPT_OFFICERS_LAST_UPDATED)
 
         links = [
             LinkForm(url=faker.url(), link_type="link").data,
@@ -206,9 +291,89 @@ def test_latest_officer_update(mockdata, client, faker):
 
         assert f"New Officer {last_name} added" in rv.data.decode(ENCODING_UTF_8)
         assert has_database_cache_entry(department, KEY_DEPT_ALL_OFFICERS) is False
-        assert has_database_cache_entry(department, KEY_DEPT_ASSIGNMENTS_LAST_UPDATED)
-        assert has_database_cache_entry(department, KEY_DEPT_INCIDENTS_LAST_UPDATED)
-        assert (
-            has_database_cache_entry(department, KEY_DEPT_OFFICERS_LAST_UPDATED)
-            is False
+
+
+def test_department_metadata_is_read_once_across_requests(mockdata):
+    department = Department.query.first()
+    remove_database_cache_entries(department, [KEY_DEPT_METADATA])
+
+    statements = []
+
+    def count_statement(*args):
+        statements.append(args)
+
+    event.listen(db.engine, "before_cursor_execute", count_statement)
+    try:
+        with current_app.test_request_context():
+            cold = get_department_metadata(department.id)
+            assert get_department_metadata(department.id) is cold
+        # One query for the department version, one for the jobs and one for the
+        # units
+        assert len(statements) == 3
+
+        with current_app.test_request_context():
+            assert get_department_metadata(department.id) == cold
+        assert len(statements) == 3
+    finally:
+        event.remove(db.engine, "before_cursor_execute", count_statement)
+
+    assert [job["job_title"] for job in cold.jobs] == [
+        job.job_title
+        for job in Job.query.filter_by(department_id=department.id).order_by(
+            Job.order, Job.id
+        )
+    ]
+
+
+def test_department_metadata_follows_changes_of_other_processes(mockdata, session):
+    department = Department.query.first()
+    with current_app.test_request_context():
+        get_department_metadata(department.id)
+
+    # Another worker adds a unit, dropping only its own cached metadata
+    session.execute(
+        insert(Unit).values(description="Other Process", department_id=department.id)
+    )
+    session.execute(
+        update(DepartmentStatistics)
+        .where(DepartmentStatistics.department_id == department.id)
+        .values(version=DepartmentStatistics.version + 1)
+    )
+
+    with current_app.test_request_context():
+        g.pop("department_metadata", None)
+        metadata = get_department_metadata(department.id)
+    assert "Other Process" in [unit["description"] for unit in metadata.units]
+
+
+def test_department_metadata_is_read_from_uncommitted_changes(mockdata, session):
+    department = Department.query.first()
+    with current_app.test_request_context():
+        cached = get_department_metadata(department.id)
+        unit = Unit.query.filter_by(department_id=department.id).first()
+        session.delete(unit)
+        session.flush()
+
+        # The unit deleted by the transaction is not attached again
+        assert unit.id not in [unit.id for unit in department_units(department.id)]
+        assert get_database_cache_entry(department, KEY_DEPT_METADATA) == cached
+
+
+def test_add_unit_removes_department_metadata(mockdata, client, session):
+    with current_app.test_request_context():
+        login_admin(client)
+        department = Department.query.first()
+        get_department_metadata(department.id)
+
+        assert has_database_cache_entry(department, KEY_DEPT_METADATA)
+
+        form = AddUnitForm(description="Metadata Test", department=department.id)
+        rv = client.post(
+            url_for("main.add_unit"), data=form.data, follow_redirects=True
         )
+
+        assert "New unit" in rv.data.decode(ENCODING_UTF_8)
+        assert has_database_cache_entry(department, KEY_DEPT_METADATA) is False
+        assert "Metadata Test" in [
+            unit.description for unit in department_units(department.id)
+        ]
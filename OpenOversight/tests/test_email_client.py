@@ -1,6 +1,9 @@
-import time
+import socketserver
+from datetime import datetime, timedelta, timezone
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
+from smtplib import SMTPException
+from threading import Thread
 from unittest.mock import MagicMock, patch
 
 import pytest
@@ -12,16 +15,63 @@ from OpenOversight.app.email_client import (
     SimulatedEmailProvider,
     SMTPEmailProvider,
 )
-from OpenOversight.app.models.database import User
+from OpenOversight.app.models.database import OutgoingEmail, User, db
 from OpenOversight.app.models.emails import ChangePasswordEmail, Email
 from OpenOversight.app.utils.constants import (
+    EMAIL_MAX_ATTEMPTS,
+    EMAIL_RETRY_DELAY,
+    EMAIL_RETRY_MAX_DELAY,
     FILE_TYPE_HTML,
     FILE_TYPE_PLAIN,
+    KEY_MAIL_PASSWORD,
     KEY_MAIL_PORT,
     KEY_MAIL_SERVER,
+    KEY_MAIL_USE_TLS,
+    KEY_MAIL_USERNAME,
     KEY_OO_HELP_EMAIL,
     KEY_OO_SERVICE_EMAIL,
+    OUTGOING_EMAIL_FAILED,
+    OUTGOING_EMAIL_PENDING,
 )
+from OpenOversight.app.utils.outbox import (
+    claim_outgoing_emails,
+    retry_delay,
+    run_email_worker,
+)
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    """Just enough of an SMTP server to accept messages from `smtplib`."""
+
+    def handle(self):
+        self.server.connections += 1
+        self.wfile.write(b"220 localhost ESMTP\r\n")
+        while line := self.rfile.readline():
+            command = line.decode().strip().upper()
+            if command == "DATA":
+                self.wfile.write(b"354 End data with <CR><LF>.<CR><LF>\r\n")
+                data = []
+                while (line := self.rfile.readline()) not in (b".\r\n", b""):
+                    data.append(line)
+                self.server.messages.append(b"".join(data))
+                self.wfile.write(b"250 OK\r\n")
+            elif command == "QUIT":
+                self.wfile.write(b"221 Bye\r\n")
+                return
+            else:
+                self.wfile.write(b"250 OK\r\n")
+
+
+@pytest.fixture
+def smtp_server():
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), SMTPHandler)
+    server.daemon_threads = True
+    server.connections = 0
+    server.messages = []
+    Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
 
 
 def test_email_create_message(faker):
@@ -147,6 +197,89 @@ def test_smtp_email_provider_send_email(app, mockdata):
         provider.mail = mail
         provider.send_email(msg)
 
-        time.sleep(0.5)  # wait for async "sending" of email
-
         mail.send.assert_called_once()
+
+
+def test_email_client_send_email_queues_email(app, session, faker):
+    with app.app_context():
+        receiver = faker.ascii_email()
+        email = Email("Body", "<p>Body</p>", "Subject", receiver)
+        EmailClient.send_email(email)
+
+        # The email is committed with the rest of the request
+        (outgoing,) = [obj for obj in session.new if isinstance(obj, OutgoingEmail)]
+        session.commit()
+        outgoing = OutgoingEmail.query.filter_by(receiver=receiver).one()
+        assert outgoing.status == OUTGOING_EMAIL_PENDING
+        assert (outgoing.subject, outgoing.body, outgoing.html) == (
+            email.subject,
+            email.body,
+            email.html,
+        )
+        assert outgoing.attempts == 0
+
+
+def test_run_email_worker_sends_batch_over_one_smtp_connection(
+    app, mockdata, smtp_server, monkeypatch, faker
+):
+    with app.app_context():
+        monkeypatch.setitem(app.config, KEY_MAIL_SERVER, "127.0.0.1")
+        monkeypatch.setitem(app.config, KEY_MAIL_PORT, smtp_server.server_address[1])
+        monkeypatch.setitem(app.config, KEY_MAIL_USE_TLS, False)
+        monkeypatch.setitem(app.config, KEY_MAIL_USERNAME, None)
+        monkeypatch.setitem(app.config, KEY_MAIL_PASSWORD, None)
+        monkeypatch.setitem(app.config, "MAIL_SUPPRESS_SEND", False)
+        monkeypatch.setitem(app.config, KEY_OO_SERVICE_EMAIL, "service@example.org")
+        monkeypatch.setitem(app.config, KEY_OO_HELP_EMAIL, "help@example.org")
+        monkeypatch.setitem(app.extensions, "mail", app.extensions.get("mail"))
+        provider = SMTPEmailProvider()
+        provider.start()
+        monkeypatch.setattr(EmailClient, "_provider", provider)
+
+        user = User.query.first()
+        receivers = [faker.ascii_email() for _ in range(3)]
+        for receiver in receivers:
+            EmailClient.send_email(ChangePasswordEmail(receiver, user))
+        db.session.commit()
+
+        assert run_email_worker(0, exit_when_empty=True) == 3
+
+    assert smtp_server.connections == 1
+    assert len(smtp_server.messages) == 3
+    for receiver, message in zip(receivers, smtp_server.messages):
+        assert f"To: {receiver}".encode() in message
+
+
+def test_run_email_worker_retries_with_backoff(app, session, monkeypatch):
+    with app.app_context():
+        provider = MagicMock()
+        provider.send_email.side_effect = SMTPException("Service unavailable")
+        monkeypatch.setattr(EmailClient, "_provider", provider)
+        EmailClient.send_email(Email("Body", "<p>Body</p>", "Subject", "a@b.org"))
+        db.session.commit()
+
+        assert run_email_worker(0, exit_when_empty=True) == 0
+        outgoing = OutgoingEmail.query.one()
+        assert outgoing.status == OUTGOING_EMAIL_PENDING
+        assert outgoing.attempts == 1
+        assert outgoing.error == "Service unavailable"
+        # Not retried before the delay is up
+        assert claim_outgoing_emails(10) == []
+        db.session.commit()
+
+        for _ in range(EMAIL_MAX_ATTEMPTS - 1):
+            outgoing.next_attempt_at = datetime.now(timezone.utc)
+            db.session.commit()
+            run_email_worker(0, exit_when_empty=True)
+
+        assert outgoing.status == OUTGOING_EMAIL_FAILED
+        assert outgoing.attempts == EMAIL_MAX_ATTEMPTS
+        assert provider.send_email.call_count == EMAIL_MAX_ATTEMPTS
+        # Failed emails are not kept
+        assert outgoing.body is None and outgoing.html is None
+
+
+def test_retry_delay_doubles_up_to_max():
+    assert retry_delay(1) == timedelta(seconds=EMAIL_RETRY_DELAY)
+    assert retry_delay(2) == timedelta(seconds=2 * EMAIL_RETRY_DELAY)
+    assert retry_delay(100) == timedelta(seconds=EMAIL_RETRY_MAX_DELAY)
@@ -12,6 +12,7 @@ from sqlalchemy.sql.expression import func
 
 from OpenOversight.app.models.database import Department, Incident, Officer, Unit
 from OpenOversight.app.utils.constants import FILE_TYPE_HTML, KEY_OFFICERS_PER_PAGE
+from OpenOversight.app.utils.uploads import run_upload_worker
 from OpenOversight.tests.conftest import AC_DEPT
 from OpenOversight.tests.constants import ADMIN_USER_EMAIL
 
@@ -51,6 +52,8 @@ def submit_image_to_dropzone(browser, img_path):
     upload = browser.find_element(By.CLASS_NAME, "dz-hidden-input")
     upload.send_keys(img_path)
     wait_for_element(browser, By.CLASS_NAME, "dz-success")
+    # Process the upload as `flask ingest-uploads` would
+    run_upload_worker(0, exit_when_empty=True)
 
 
 def wait_for_element(browser, locator, text, timeout=10):
@@ -413,6 +416,7 @@ def test_image_classification_and_tagging(mockdata, browser, server_port):
     wait_for_page_load(browser)
     page_text = browser.find_element(By.TAG_NAME, "body").text
     assert "Tag added to database" in page_text
+    run_upload_worker(0, exit_when_empty=True)
 
     # 6. Log out as admin
     logout(browser, server_port)
@@ -5,13 +5,15 @@ from decimal import Decimal
 from unittest.mock import MagicMock
 
 import pytest
-from sqlalchemy import and_
+from sqlalchemy import and_, delete, insert
 from sqlalchemy.exc import IntegrityError
 
 from OpenOversight.app.models.database import (
     Assignment,
     Currency,
+    CurrentAssignment,
     Department,
+    DepartmentStatistics,
     Face,
     Image,
     Incident,
@@ -23,7 +25,12 @@ from OpenOversight.app.models.database import (
     Salary,
     Unit,
     User,
+    UserContributions,
+    reconcile_user_contributions,
+    refresh_current_assignments,
+    refresh_department_statistics,
 )
+from OpenOversight.app.models.users import get_user_snapshot
 from OpenOversight.app.utils.choices import STATE_CHOICES
 from OpenOversight.tests.conftest import SPRINGFIELD_PD
 
@@ -69,6 +76,137 @@ def test_department_latest_officer_update(mockdata):
     assert latest_update == dept.latest_officer_update()
 
 
+def test_department_statistics_follow_committed_writes(mockdata):
+    department, other_department = Department.query.order_by(Department.id)[:2]
+    stats = department.statistics
+    officer_count, assignment_count = stats.officer_count, stats.assignment_count
+    other_officer_count = other_department.statistics.officer_count
+    assert officer_count == Officer.query.filter_by(department_id=department.id).count()
+
+    officer = Officer(first_name="Test", last_name="Officer", department=department)
+    job = Job.query.filter_by(department_id=department.id).first()
+    officer.assignments.append(Assignment(star_no="12345", job=job))
+    Officer.query.session.add(officer)
+    Officer.query.session.commit()
+
+    assert department.statistics.officer_count == officer_count + 1
+    assert department.statistics.assignment_count == assignment_count + 1
+    assert (
+        department.statistics.officers_last_updated_at.date()
+        == officer.last_updated_at.date()
+    )
+
+    officer.department = other_department
+    Officer.query.session.commit()
+
+    assert department.statistics.officer_count == officer_count
+    assert department.statistics.assignment_count == assignment_count
+    assert other_department.statistics.officer_count == other_officer_count + 1
+
+    Officer.query.session.delete(officer.assignments[0])
+    Officer.query.session.delete(officer)
+    Officer.query.session.commit()
+
+    assert other_department.statistics.officer_count == other_officer_count
+
+
+def test_department_statistics_apply_deltas_at_commit(
+    mockdata, session, max_sql_statements
+):
+    department = Department.query.first()
+    stats = department.statistics
+    incident_count, officer_count = stats.incident_count, stats.officer_count
+    updated_at = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(
+        days=1
+    )
+    officer = Officer.query.filter_by(department_id=department.id).first()
+    officer.last_name = "Updated"
+    officer.last_updated_at = updated_at
+    incident = Incident(department_id=department.id, description="Test incident")
+    session.add(incident)
+
+    with max_sql_statements(20) as statements:
+        session.commit()
+
+    # Counters are incremented rather than recounted
+    assert not [s for s in statements if "count(" in s.lower()]
+    assert department.statistics.incident_count == incident_count + 1
+    assert department.statistics.officer_count == officer_count
+    assert (
+        department.statistics.officers_last_updated_at.replace(
+            tzinfo=datetime.timezone.utc
+        )
+        == updated_at
+    )
+
+    session.delete(incident)
+    session.commit()
+
+    assert department.statistics.incident_count == incident_count
+    assert department.latest_officer_update() == updated_at.date()
+
+
+def test_refresh_department_statistics(mockdata):
+    department = Department.query.first()
+    Officer.query.session.execute(
+        delete(DepartmentStatistics).where(
+            DepartmentStatistics.department_id == department.id
+        )
+    )
+    Officer.query.session.expire_all()
+    assert department.statistics is None
+
+    refresh_department_statistics([department.id])
+
+    incidents = Incident.query.filter_by(department_id=department.id)
+    assert department.statistics.incident_count == incidents.count()
+    assert department.latest_incident_update() == max(
+        incident.last_updated_at.date() for incident in incidents
+    )
+
+
+def test_department_versions_follow_committed_writes(mockdata):
+    session = Officer.query.session
+    officer = Officer.query.filter(Officer.incidents.any()).first()
+    incident = officer.incidents[0]
+    officer_department = officer.department
+    incident_department = incident.department
+    departments = Department.query.order_by(Department.id).all()
+    version = officer_department.statistics.version
+    incident_version = incident_department.statistics.version
+    session.add(Salary(officer=officer, salary=1, year=2020, is_fiscal_year=False))
+    session.commit()
+
+    # The incident lists the officer, and the officer's profile the incident
+    assert officer_department.statistics.version == version + 1
+    assert incident_department.statistics.version > incident_version
+    assert officer_department.statistics.changed_at is not None
+
+    # The incident is listed on the profiles of its officers
+    shown_on = {incident.department_id} | {o.department_id for o in incident.officers}
+    unchanged = [
+        department for department in departments if department.id not in shown_on
+    ]
+    unchanged_versions = [department.statistics.version for department in unchanged]
+    incident_version = incident_department.statistics.version
+    incident.description = "Changed description"
+    session.commit()
+
+    assert incident_department.statistics.version == incident_version + 1
+    assert [
+        department.statistics.version for department in unchanged
+    ] == unchanged_versions
+
+    # Links can be shown on the pages of any department
+    link = Link.query.first()
+    link.title = "Changed title"
+    session.commit()
+
+    assert [department.statistics.version for department in unchanged] == [
+        unchanged_version + 1 for unchanged_version in unchanged_versions
+    ]
+
+
 def test_officer_repr(session):
     officer_uii = Officer.query.filter(
         and_(
@@ -127,6 +265,42 @@ def test_assignment_repr(mockdata):
     )
 
 
+def test_current_assignment_is_latest_assignment(mockdata, officer_no_assignments):
+    officer = officer_no_assignments
+    job = Job.query.filter_by(department_id=officer.department_id).first()
+    assert officer.current_assignment is None
+    assert officer.currently_on_force() == "Uncertain"
+
+    undated, earlier, later = [
+        Assignment(officer_id=officer.id, star_no=star_no, job_id=job.id, **dates)
+        for star_no, dates in [
+            ("1", {}),
+            ("2", {"start_date": datetime.date(2010, 1, 1)}),
+            (
+                "3",
+                {
+                    "start_date": datetime.date(2015, 1, 1),
+                    "resign_date": datetime.date(2016, 1, 1),
+                },
+            ),
+        ]
+    ]
+    Assignment.query.session.add_all([undated, earlier, later])
+    refresh_current_assignments([officer.id])
+
+    assert officer.current_assignment == later
+    assert officer.badge_number() == "3"
+    assert officer.job_title() == job.job_title
+    assert officer.currently_on_force() == "No"
+    assert CurrentAssignment.query.filter_by(officer_id=officer.id).count() == 1
+
+    later.start_date = None
+    refresh_current_assignments(department_id=officer.department_id)
+
+    assert officer.current_assignment == earlier
+    assert officer.currently_on_force() == "Yes"
+
+
 def test_job_repr(mockdata):
     job = Job.query.first()
     assert repr(job) == f"<Job ID {job.id}: {job.job_title}>"
@@ -142,6 +316,79 @@ def test_face_repr(mockdata):
     assert repr(face) == f"<Tag ID {face.id}: {face.officer_id} - {face.img_id}>"
 
 
+def test_user_contributions_follow_committed_writes(mockdata):
+    user = User(username="contributor", email="contributor@example.org")
+    Image.query.session.add(user)
+    Image.query.session.commit()
+    assert user.contributions is None
+
+    image = Image(filepath="/static/contributed.jpg", created_by=user.id)
+    face = Face(
+        officer_id=Officer.query.first().id,
+        original_image=image,
+        created_by=user.id,
+    )
+    Image.query.session.add_all([image, face])
+    Image.query.session.commit()
+
+    assert (user.contributions.image_count, user.contributions.face_count) == (1, 1)
+
+    other_user = User.query.join(User.contributions).filter(User.id != user.id).first()
+    other_face_count = other_user.contributions.face_count
+    face.created_by = other_user.id
+    Image.query.session.commit()
+
+    assert user.contributions.face_count == 0
+    assert other_user.contributions.face_count == other_face_count + 1
+
+    Image.query.session.delete(face)
+    Image.query.session.delete(image)
+    Image.query.session.commit()
+
+    assert user.contributions.image_count == 0
+    assert other_user.contributions.face_count == other_face_count
+
+
+def test_user_contributions_add_to_counters_created_concurrently(
+    mockdata, max_sql_statements
+):
+    user = User(username="contributor", email="contributor@example.org")
+    Image.query.session.add(user)
+    Image.query.session.commit()
+
+    Image.query.session.add(
+        Image(filepath="/static/contributed.jpg", created_by=user.id)
+    )
+    Image.query.session.flush()
+    # Another upload of the user committed its counters in the meantime
+    Image.query.session.execute(
+        insert(UserContributions).values(user_id=user.id, image_count=1)
+    )
+    with max_sql_statements(20) as statements:
+        Image.query.session.commit()
+
+    # The counters are written without being looked up first
+    (statement,) = [s for s in statements if "user_contributions" in s]
+    assert "ON CONFLICT" in statement
+    assert (user.contributions.image_count, user.contributions.face_count) == (2, 0)
+
+
+def test_reconcile_user_contributions(mockdata):
+    user = User.query.join(User.contributions).filter(
+        UserContributions.image_count > 0
+    )[0]
+    image_count = Image.query.filter_by(created_by=user.id).count()
+    # Users without contributions get their counters from the first reconcile
+    reconcile_user_contributions()
+    Image.query.session.execute(
+        delete(UserContributions).where(UserContributions.user_id == user.id)
+    )
+
+    assert reconcile_user_contributions() == 1
+    assert user.contributions.image_count == image_count
+    assert reconcile_user_contributions() == 0
+
+
 def test_unit_repr(mockdata):
     unit = Unit.query.first()
     assert repr(unit) == f"Unit: {unit.description}"
@@ -223,6 +470,39 @@ def test_uuid_setter(mockdata):
         User(uuid="8e9f1393-99b8-466c-80ce-8a56a7d9849d")
 
 
+def test_user_snapshot_is_cached_until_uuid_changes(mockdata, session):
+    user = User.query.filter_by(is_administrator=False).first()
+    original_uuid = user.uuid
+
+    snapshot = get_user_snapshot(original_uuid)
+    assert snapshot.id == user.id
+    assert snapshot.get_id() == original_uuid
+    assert snapshot.is_active == (not user.is_disabled)
+    assert get_user_snapshot(original_uuid) is snapshot
+    assert "password_hash" not in vars(snapshot)
+
+    user.is_disabled = True
+    session.commit()
+    assert get_user_snapshot(original_uuid).is_active is False
+
+    user.password = "pork belly"
+    session.commit()
+    assert get_user_snapshot(original_uuid) is None
+    assert get_user_snapshot(user.uuid).id == user.id
+
+
+def test_user_snapshot_is_read_only(mockdata):
+    user = User.query.filter_by(is_administrator=False).first()
+    snapshot = get_user_snapshot(user.uuid)
+
+    with pytest.raises(AttributeError):
+        snapshot.dept_pref = None
+    assert snapshot.record is user
+    assert snapshot.is_admin_or_coordinator(user.ac_department) == (
+        user.is_admin_or_coordinator(user.ac_department)
+    )
+
+
 def test_valid_confirmation_token(mockdata, session):
     user = User(password="bacon")
     session.add(user)
@@ -1,24 +1,66 @@
+import hashlib
 import random
 import string
+import struct
+from datetime import datetime
 from io import BytesIO
 from unittest.mock import MagicMock, Mock, patch
 
 import pytest
 import us
+from cachetools import LRUCache
 from flask import current_app
 from flask_login import current_user
+from markupsafe import Markup
 from PIL import Image as Pimage
-
-from OpenOversight.app.models.database import Department, Image, Officer, Unit
+from PIL.PngImagePlugin import PngInfo
+from sqlalchemy.dialects import postgresql
+from werkzeug.exceptions import BadRequest
+
+from OpenOversight.app.models.database import (
+    Department,
+    Image,
+    ImageVariant,
+    Officer,
+    Unit,
+    User,
+)
+from OpenOversight.app.utils import cloud
 from OpenOversight.app.utils.cloud import (
+    EXIF_KEY_DATE_TIME_ORIGINAL,
     compute_hash,
     crop_image,
     save_image_to_s3_and_db,
     upload_file_to_s3,
 )
+from OpenOversight.app.utils.constants import CROP_CACHE_MAX_BYTES
 from OpenOversight.app.utils.db import unit_choices
 from OpenOversight.app.utils.forms import filter_by_form, grab_officers
-from OpenOversight.app.utils.general import allowed_file, validate_redirect_url
+from OpenOversight.app.utils.fragments import Fragments
+from OpenOversight.app.utils.general import (
+    allowed_file,
+    serve_image_variant,
+    validate_redirect_url,
+)
+from OpenOversight.app.utils.image_hash import (
+    BKTree,
+    compute_dhash,
+    hamming_distance,
+    phash_bands,
+)
+from OpenOversight.app.utils.image_queue import (
+    claim_random_image,
+    unsorted_images,
+    untagged_images,
+)
+from OpenOversight.app.utils.image_scrub import scrub_image
+from OpenOversight.app.utils.pagination import SortKey, keyset_paginate
+from OpenOversight.app.utils.search import (
+    LikeSearchBackend,
+    TrigramSearchBackend,
+    get_search_backend,
+)
+from OpenOversight.app.utils.storage import LocalImageStorage, S3ImageStorage
 from OpenOversight.tests.routes.route_helpers import login_user
 
 
@@ -194,16 +236,94 @@ def test_compute_hash(mockdata):
         ("webp", "image/webp"),
     ],
 )
-def test_s3_upload_image(mockdata, extension, mime_type):
+def test_s3_upload_image(mockdata, extension, mime_type, s3_storage, fake_s3_client):
     test_img_bytes = create_test_image_bytes_io(extension)
 
-    mocked_connection = Mock()
-    mocked_resource = Mock()
-    with patch("boto3.client", Mock(return_value=mocked_connection)):
-        with patch("boto3.resource", Mock(return_value=mocked_resource)):
-            upload_file_to_s3(test_img_bytes, "test_cop1.png")
+    url = upload_file_to_s3(test_img_bytes, "test_cop1.png")
+
+    [((bucket, key), stored)] = fake_s3_client.objects.items()
+    assert bucket == "some-bucket"
+    assert stored["ContentType"] == mime_type
+    assert stored["ACL"] == "public-read"
+    assert url == f"https://some-bucket.s3.us-west-2.amazonaws.com/{key}"
+
+
+def test_s3_storage_shares_one_client(app):
+    with patch("boto3.client", Mock(side_effect=lambda *a, **kw: Mock())) as client:
+        storage = S3ImageStorage("some-bucket", max_pool_connections=25)
+        for _ in range(3):
+            storage.upload(BytesIO(b"image"), "ab/cdef.png", "image/png")
+
+    client.assert_called_once()
+    assert client.call_args.kwargs["config"].max_pool_connections == 25
+
+
+def test_s3_storage_public_url_uses_endpoint(fake_s3_client):
+    storage = S3ImageStorage(
+        "some-bucket", endpoint_url="http://minio:9000/", client=fake_s3_client
+    )
+
+    assert (
+        storage.public_url("ab/c d.png") == "http://minio:9000/some-bucket/ab/c%20d.png"
+    )
+    assert fake_s3_client.calls == []
+
+
+def test_s3_storage_multipart_upload(s3_storage, fake_s3_client):
+    url = s3_storage.upload_multipart([b"first", b"second"], "ab/cdef.png", "image/png")
+
+    stored = fake_s3_client.objects[("some-bucket", "ab/cdef.png")]
+    assert stored["Body"] == b"firstsecond"
+    assert stored["ContentType"] == "image/png"
+    assert url == s3_storage.public_url("ab/cdef.png")
+    assert fake_s3_client.multipart_uploads == {}
+
+
+def test_s3_storage_multipart_upload_aborts_on_error(s3_storage, fake_s3_client):
+    def chunks():
+        yield b"first"
+        raise OSError
+
+    with pytest.raises(OSError):
+        s3_storage.upload_multipart(chunks(), "ab/cdef.png", "image/png")
+
+    assert "abort_multipart_upload" in fake_s3_client.calls
+    assert fake_s3_client.objects == {}
+    assert fake_s3_client.multipart_uploads == {}
+
+
+def test_s3_storage_deletes_in_batches(s3_storage, fake_s3_client):
+    keys = [f"ab/{i}.png" for i in range(2500)]
+    for key in keys:
+        s3_storage.upload(BytesIO(b"image"), key, "image/png")
+
+    s3_storage.delete_many(keys[:-1])
+
+    assert fake_s3_client.calls.count("delete_objects") == 3
+    assert list(fake_s3_client.objects) == [("some-bucket", keys[-1])]
+
+
+def test_image_storage_downloads_by_url(tmp_path, s3_storage, fake_s3_client):
+    local_storage = LocalImageStorage(str(tmp_path), "/static/uploads/")
+    url = local_storage.upload(BytesIO(b"image"), "ab/c d.png", "image/png")
+    downloaded = BytesIO()
+
+    local_storage.download(local_storage.key_from_url(url), downloaded)
+
+    assert downloaded.getvalue() == b"image"
+    assert local_storage.key_from_url("/static/images/test_cop1.png") is None
+    assert s3_storage.key_from_url(s3_storage.public_url("ab/c d.png")) == "ab/c d.png"
+    assert s3_storage.key_from_url("https://other-bucket/ab/c.png") is None
+
 
-    assert mocked_connection.method_calls[0][2]["ExtraArgs"]["ContentType"] == mime_type
+def test_local_image_storage_writes_files(tmp_path, test_png_bytes_io):
+    storage = LocalImageStorage(str(tmp_path), "/static/uploads/")
+
+    url = storage.upload(test_png_bytes_io, "ab/cdef.png", "image/png")
+
+    assert url == "/static/uploads/ab/cdef.png"
+    test_png_bytes_io.seek(0)
+    assert (tmp_path / "ab" / "cdef.png").read_bytes() == test_png_bytes_io.read()
 
 
 def test_user_can_submit_allowed_file(mockdata):
@@ -227,6 +347,22 @@ def test_user_cannot_submit_invalid_file_extension(mockdata):
     assert allowed_file(file_to_submit) is False
 
 
+def test_fragments_reuse_rendered_html(faker):
+    key = faker.uuid4()
+    fragments = Fragments(key, ["first", "second"])
+    assert fragments("first", lambda: "<p>First</p>") == Markup("<p>First</p>")
+    assert not fragments.complete
+
+    fragments = Fragments(key, ["first", "second"])
+    assert fragments("first", lambda: "<p>Changed</p>") == Markup("<p>First</p>")
+    fragments("second", lambda: "<p>Second</p>")
+    assert Fragments(key, ["first", "second"]).complete
+
+    uncached = Fragments(None, ["first"])
+    assert uncached("first", lambda: "<p>Changed</p>") == Markup("<p>Changed</p>")
+    assert not Fragments(None, ["first"]).complete
+
+
 def test_unit_choices(mockdata):
     unit_choices_result = [str(x) for x in unit_choices()]
     assert "Unit: Bureau of Organized Crime" in unit_choices_result
@@ -269,15 +405,233 @@ def test_save_image_to_s3_and_db_does_not_set_tagged(
 def test_save_image_to_s3_and_db_saves_filename_in_correct_format(
     mockdata, test_png_bytes_io, client
 ):
-    mocked_connection = Mock()
-    mocked_resource = Mock()
+    upload = save_image_to_s3_and_db(test_png_bytes_io, 1, 1)
+    filename = upload.filepath.split("/")[-1]
+    filename_parts = filename.split(".")
+    assert len(filename_parts) == 2
+
+
+def test_save_image_to_s3_and_db_creates_variants(
+    mockdata, test_png_bytes_io, client, s3_storage, fake_s3_client
+):
+    upload = save_image_to_s3_and_db(test_png_bytes_io, 1, 1)
+
+    # The 750x600 image is only shrunk to the sizes smaller than itself
+    assert [(v.size, v.width, v.height) for v in upload.variants] == [
+        (64, 64, 51),
+        (320, 320, 256),
+        (640, 640, 512),
+    ]
+    variant = upload.variants[0]
+    stored = fake_s3_client.objects[("some-bucket", f"variants/{upload.id}/64.webp")]
+    assert stored["ContentType"] == "image/webp"
+    assert Pimage.open(BytesIO(stored["Body"])).size == (64, 51)
+    assert variant.filepath == s3_storage.public_url(f"variants/{upload.id}/64.webp")
+
+
+def create_test_jpeg_with_exif():
+    exif = Pimage.Exif()
+    exif[EXIF_KEY_DATE_TIME_ORIGINAL] = "2020:01:02 03:04:05"
+    exif[0x010F] = "Camera Maker"
+    test_img_bytes = BytesIO()
+    Pimage.new("RGB", (40, 30), "red").save(
+        test_img_bytes, "jpeg", exif=exif, comment=b"Secret comment"
+    )
+    test_img_bytes.seek(0)
+    return test_img_bytes
+
+
+def test_scrub_image_strips_jpeg_metadata_without_reencoding(app):
+    test_img_bytes = create_test_jpeg_with_exif()
+    pimage = Pimage.open(test_img_bytes)
+
+    scrubbed, hash_img = scrub_image(test_img_bytes, pimage)
+
+    data = scrubbed.read()
+    assert b"Camera Maker" not in data
+    assert b"Secret comment" not in data
+    assert hash_img == hashlib.sha256(data).hexdigest()
+    # The compressed image data is copied as is
+    original = test_img_bytes.getvalue()
+    assert data.endswith(original[original.index(b"\xff\xda") :])
+    scrubbed_pimage = Pimage.open(BytesIO(data))
+    assert not scrubbed_pimage.getexif()
+    assert scrubbed_pimage.tobytes() == pimage.tobytes()
+
+
+def _jpeg_segment(code, payload):
+    return struct.pack(">BBH", 0xFF, code, len(payload) + 2) + payload
+
+
+def test_scrub_image_strips_jpeg_app_segments_and_trailers(app):
+    progressive = BytesIO()
+    Pimage.new("RGB", (40, 30), "green").save(
+        progressive, "jpeg", progressive=True, icc_profile=b"Secret profile"
+    )
+    original = progressive.getvalue()
+    # Vendor segments after the SOI, a comment between two scans, and data
+    # appended after the EOI
+    first_scan = original.index(b"\xff\xda")
+    second_scan = original.index(b"\xff\xda", first_scan + 2)
+    test_img_bytes = BytesIO(
+        original[:2]
+        + _jpeg_segment(0xE0, b"JFXX\x00\x10Secret thumbnail")
+        + _jpeg_segment(0xE3, b"Secret vendor data")
+        + original[2:second_scan]
+        + _jpeg_segment(0xFE, b"Secret comment")
+        + original[second_scan:]
+        + b"GPS:41.8781,-87.6298"
+    )
+    pimage = Pimage.open(test_img_bytes)
+
+    scrubbed, hash_img = scrub_image(test_img_bytes, pimage)
+
+    data = scrubbed.read()
+    assert b"Secret" not in data
+    assert b"GPS" not in data
+    assert data.endswith(b"\xff\xd9")
+    assert data.count(b"\xff\xda") == original.count(b"\xff\xda")
+    # The JFIF header is kept
+    assert data[2:6] == b"\xff\xe0\x00\x10" and data[6:11] == b"JFIF\x00"
+    assert hash_img == hashlib.sha256(data).hexdigest()
+    scrubbed_pimage = Pimage.open(BytesIO(data))
+    assert "icc_profile" not in scrubbed_pimage.info
+    assert scrubbed_pimage.tobytes() == pimage.tobytes()
+
+
+def test_scrub_image_strips_png_text_chunks(app):
+    info = PngInfo()
+    info.add_text("Author", "Secret author")
+    info.add_text("Comment", "Secret comment", zip=True)
+    test_img_bytes = BytesIO()
+    Pimage.new("RGB", (40, 30), "blue").save(test_img_bytes, "png", pnginfo=info)
+    test_img_bytes.seek(0)
+    pimage = Pimage.open(test_img_bytes)
+
+    scrubbed, hash_img = scrub_image(test_img_bytes, pimage)
+
+    data = scrubbed.read()
+    assert b"Secret" not in data and b"Comment" not in data
+    assert hash_img == hashlib.sha256(data).hexdigest()
+    assert Pimage.open(BytesIO(data)).tobytes() == pimage.tobytes()
+
+
+def test_scrub_image_reencodes_other_formats(app):
+    test_img_bytes = create_test_image_bytes_io("gif")
+    test_img_bytes.seek(0)
+    pimage = Pimage.open(test_img_bytes)
+
+    scrubbed, hash_img = scrub_image(test_img_bytes, pimage)
+
+    data = scrubbed.read()
+    assert Pimage.open(BytesIO(data)).format == "GIF"
+    assert hash_img == hashlib.sha256(data).hexdigest()
+
+
+def test_scrub_image_spools_large_images_to_disk(app, test_png_bytes_io, monkeypatch):
+    monkeypatch.setattr(
+        "OpenOversight.app.utils.image_scrub.IMAGE_SPOOL_MAX_MEMORY", 1024
+    )
+    pimage = Pimage.open(test_png_bytes_io)
+
+    scrubbed, _ = scrub_image(test_png_bytes_io, pimage)
+
+    assert scrubbed._rolled
+    assert Pimage.open(scrubbed).size == (750, 600)
+
+
+def test_save_image_to_s3_and_db_scrubs_metadata(
+    mockdata, client, s3_storage, fake_s3_client
+):
+    upload = save_image_to_s3_and_db(create_test_jpeg_with_exif(), 1, 1)
+
+    stored = fake_s3_client.objects[("some-bucket", upload.filepath.split(".com/")[1])]
+    assert b"Camera Maker" not in stored["Body"]
+    assert upload.hash_img == hashlib.sha256(stored["Body"]).hexdigest()
+    assert upload.taken_at == datetime(2020, 1, 2, 3, 4, 5)
+
+
+def resized_jpeg_bytes_io(image_bytes_io, size):
+    resized_bytes = BytesIO()
+    Pimage.open(image_bytes_io).convert("RGB").resize(size).save(
+        resized_bytes, "jpeg", quality=70
+    )
+    image_bytes_io.seek(0)
+    resized_bytes.seek(0)
+    return resized_bytes
+
+
+def test_compute_dhash_is_stable_across_resizing(test_png_bytes_io):
+    original = compute_dhash(Pimage.open(test_png_bytes_io))
+    test_png_bytes_io.seek(0)
+    resized = compute_dhash(
+        Pimage.open(resized_jpeg_bytes_io(test_png_bytes_io, (300, 240)))
+    )
+    other = compute_dhash(Pimage.open(create_test_jpeg_with_exif()))
+
+    assert hamming_distance(original, resized) <= 3
+    assert hamming_distance(original, other) > 3
+
+
+def test_phash_bands_match_for_close_hashes():
+    phash = random.getrandbits(64)
+    close = phash ^ (1 << 5) ^ (1 << 40) ^ (1 << 63)
+
+    assert set(enumerate(phash_bands(phash))) & set(enumerate(phash_bands(close)))
+
+
+def test_bk_tree_search_matches_linear_scan():
+    hashes = [random.getrandbits(64) for _ in range(200)]
+    # Add some hashes close to the first one
+    hashes += [hashes[0] ^ (1 << bit) for bit in (1, 20, 50)]
+    tree = BKTree()
+    for item_id, phash in enumerate(hashes):
+        tree.add(phash, item_id)
+
+    for radius in (0, 3, 20):
+        assert sorted(tree.search(hashes[0], radius)) == [
+            item_id
+            for item_id, phash in enumerate(hashes)
+            if hamming_distance(phash, hashes[0]) <= radius
+        ]
+
+
+def test_save_image_to_s3_and_db_links_near_duplicate(
+    mockdata, test_png_bytes_io, client
+):
+    resized_data = resized_jpeg_bytes_io(test_png_bytes_io, (300, 240)).getvalue()
+    image_count = Image.query.count()
+
+    original = save_image_to_s3_and_db(test_png_bytes_io, 1, 1)
+    near_duplicate = save_image_to_s3_and_db(BytesIO(resized_data), 1, 2)
+
+    assert original.phash is not None
+    assert len(original.phash_bands) == 4
+    assert original.near_duplicate_of is None
+    # The upload is stored for its own department
+    assert near_duplicate.id != original.id
+    assert near_duplicate.department_id == 2
+    assert near_duplicate.near_duplicate_of == original
+    assert Image.query.count() == image_count + 2
+
+
+def test_serve_image_variant_picks_smallest_that_fits(app):
+    image = Image(
+        filepath="https://s3-some-bucket/original.png",
+        variants=[
+            ImageVariant(
+                size=size,
+                width=size,
+                height=size * 4 // 5,
+                filepath=f"https://s3-some-bucket/{size}.webp",
+            )
+            for size in (64, 320, 640)
+        ],
+    )
 
-    with patch("boto3.client", Mock(return_value=mocked_connection)):
-        with patch("boto3.resource", Mock(return_value=mocked_resource)):
-            upload = save_image_to_s3_and_db(test_png_bytes_io, 1, 1)
-            filename = upload.filepath.split("/")[-1]
-            filename_parts = filename.split(".")
-            assert len(filename_parts) == 2
+    assert serve_image_variant(image, (100, 100)) == "https://s3-some-bucket/320.webp"
+    assert serve_image_variant(image, (540, 300)) == "https://s3-some-bucket/640.webp"
+    assert serve_image_variant(image, (700, 600)) == image.filepath
 
 
 def test_save_image_to_s3_and_db_invalid_image(mockdata, client):
@@ -323,6 +677,31 @@ def test_crop_image_calls_save_image_to_s3_and_db_with_user_id(mockdata, client)
             assert current_user.id in save_image_to_s3_and_db.call_args[0]
 
 
+def test_crop_image_decodes_each_original_once(mockdata, client, monkeypatch):
+    monkeypatch.setattr(
+        cloud,
+        "ORIGINALS_CACHE",
+        LRUCache(maxsize=CROP_CACHE_MAX_BYTES, getsizeof=cloud._decoded_size),
+    )
+    image = Image.query.first()
+    user = User.query.first()
+
+    with patch.object(
+        cloud, "open_image_file", Mock(wraps=cloud.open_image_file)
+    ) as open_image_file:
+        first = crop_image(image, (0, 0, 40, 50), image.department_id, user.id)
+        second = crop_image(image, (50, 60, 100, 100), image.department_id, user.id)
+
+    open_image_file.assert_called_once_with(image.filepath)
+    assert first.id != second.id
+    assert first.created_by == user.id
+    # The cached original is not changed by cropping
+    assert (
+        cloud.ORIGINALS_CACHE[(image.id, image.filepath)].size
+        == Pimage.open(cloud.open_image_file(image.filepath)).size
+    )
+
+
 @pytest.mark.parametrize(
     "units, has_officers_with_unit, has_officers_with_no_unit",
     [
@@ -366,3 +745,108 @@ def test_validate_redirect_url(url, is_valid):
         assert result == url
     else:
         assert result is None
+
+
+def test_keyset_paginate_walks_forward_and_back(mockdata):
+    department = Department.query.first()
+    query = Officer.query.filter_by(department_id=department.id)
+    sort_keys = [
+        SortKey(Officer.last_name),
+        SortKey(Officer.first_name),
+        SortKey(Officer.id),
+    ]
+    # Give some officers the same name so the id breaks the tie
+    for officer in query.limit(3):
+        officer.last_name = "Smith"
+        officer.first_name = None
+
+    expected = query.order_by(
+        Officer.last_name.asc().nulls_last(),
+        Officer.first_name.asc().nulls_last(),
+        Officer.id,
+    ).all()
+
+    pages = [keyset_paginate(query, sort_keys, per_page=4)]
+    while pages[-1].has_next:
+        pages.append(
+            keyset_paginate(query, sort_keys, per_page=4, cursor=pages[-1].next_cursor)
+        )
+
+    assert [o for page in pages for o in page.items] == expected
+    assert [page.page for page in pages] == list(range(1, len(pages) + 1))
+    assert all(page.total == len(expected) for page in pages)
+    assert not pages[0].has_prev
+
+    previous = keyset_paginate(
+        query, sort_keys, per_page=4, cursor=pages[-1].prev_cursor
+    )
+    assert previous.items == pages[-2].items
+    assert previous.page == pages[-2].page
+
+
+def test_keyset_paginate_without_count(mockdata):
+    page = keyset_paginate(
+        Officer.query, [SortKey(Officer.id, descending=True)], per_page=2, count=False
+    )
+    assert page.total is None
+    assert [o.id for o in page.items] == [
+        o.id for o in Officer.query.order_by(Officer.id.desc()).limit(2)
+    ]
+
+
+def test_keyset_paginate_supports_page_numbers(mockdata):
+    sort_keys = [SortKey(Officer.id)]
+    page = keyset_paginate(Officer.query, sort_keys, per_page=2, page=3)
+    assert page.page == 3
+    assert [o.id for o in page.items] == [
+        o.id for o in Officer.query.order_by(Officer.id).offset(4).limit(2)
+    ]
+    assert page.has_prev
+
+
+def test_keyset_paginate_rejects_bad_cursor(mockdata):
+    with pytest.raises(BadRequest):
+        keyset_paginate(Officer.query, [SortKey(Officer.id)], per_page=2, cursor="abc")
+
+
+def test_search_backend_falls_back_to_like_on_sqlite(mockdata):
+    assert isinstance(get_search_backend(), LikeSearchBackend)
+
+
+def test_trigram_search_backend_uses_similarity_operator():
+    clause = TrigramSearchBackend().similar(Officer.last_name, "smith")
+    sql = str(clause.compile(dialect=postgresql.psycopg2.dialect()))
+    assert "officers.last_name ILIKE" in sql
+    assert "officers.last_name %% " in sql
+
+
+def test_filter_by_form_escapes_like_wildcards(mockdata):
+    assert filter_by_form({"last_name": "%"}, Officer.query).count() == 0
+    assert filter_by_form({"badge": "_"}, Officer.query).count() == 0
+
+
+def test_claim_random_image_only_returns_queued_images(mockdata):
+    department = Department.query.first()
+    unsorted = unsorted_images(department.id)
+    expected = {image.id for image in unsorted}
+    assert expected
+
+    claimed = {claim_random_image(unsorted).id for _ in range(20)}
+    assert claimed <= expected
+
+    for image in Image.query.filter(Image.is_tagged == False):  # noqa: E712
+        image.is_tagged = True
+    assert claim_random_image(untagged_images()) is None
+
+
+def test_claim_random_image_moves_image_in_queue(mockdata):
+    image_query = unsorted_images(Department.query.first().id)
+    image = claim_random_image(image_query)
+    random_key, last_updated_at = image.random_key, image.last_updated_at
+    with patch("OpenOversight.app.utils.image_queue.random.random", return_value=0):
+        claim_random_image(image_query.filter(Image.id == image.id))
+
+    Image.query.session.refresh(image)
+    assert image.random_key == 0
+    assert image.random_key != random_key
+    assert image.last_updated_at == last_updated_at